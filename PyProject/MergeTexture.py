@@ -1,12 +1,3 @@
-import os
-import re
-import sys
-import tkinter as tk
-from tkinter import filedialog
-import cv2
-import numpy as np
-from PIL import Image
-
 """
 纹理合并工具
 
@@ -32,21 +23,77 @@ from PIL import Image
 使用方法：
 1. 将需要处理的文件路径复制到剪贴板，然后运行脚本
 2. 或者直接运行脚本，在弹出的文件选择对话框中选择文件
+3. 目录模式：python MergeTexture.py D:/Foliage -r -j 0
+   扫描目录（-r包括子目录）中的全部Leaf/Trunk贴图组，多个组由进程池并行处理
+   目录模式和并行子进程不会导入tkinter，可以在无界面的构建机上运行
 """
 
+import argparse
+import contextlib
+import io
 import os
 import re
 import sys
-import tkinter as tk
-from tkinter import filedialog
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import cv2
 import numpy as np
 from PIL import Image
 
+import tga_codec
+import texture_index
+import texture_log
+import texture_rules
+import texture_stats
+
+# 默认的通道打包规则
+DEFAULT_RULES = 'foliage_leaf_trunk'
+
+# 组名包含其中任一关键词的贴图组才会处理
+GROUP_KEYWORDS = ("Leaf", "Trunk")
+
+def load_tga_image(file_path):
+    """
+    读取TGA文件为OpenCV格式(BGR或BGRA)的数组
+    优先直接解码TGA，失败时回退到Pillow
+    调色板图像与Pillow的读取结果一致，返回调色板索引而不是颜色
+    """
+    if file_path.lower().endswith('.tga'):
+        try:
+            return tga_codec.read_tga(file_path, palette=False)
+        except Exception as e:
+            print(f"直接解码TGA文件 {file_path} 失败，回退到Pillow: {e}")
+    try:
+        # 使用Pillow读取
+        img_pil = Image.open(file_path)
+        
+        # 转换为numpy数组
+        img_array = np.array(img_pil)
+        
+        # 转换为OpenCV格式
+        if img_array.ndim == 3:
+            # PIL使用RGB，OpenCV使用BGR
+            if img_array.shape[2] == 3:
+                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+            elif img_array.shape[2] == 4:
+                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGRA)
+            else:
+                img_cv = img_array
+        else:
+            img_cv = img_array
+            
+        return img_cv
+    except Exception as e:
+        print(f"读取文件 {file_path} 时出错: {e}")
+        return None
+
 def get_clipboard_files():
     """
     获取剪贴板中的文件路径
     """
+    import tkinter as tk
+    from tkinter import filedialog
+
     try:
         # 创建一个隐藏的根窗口
         root = tk.Tk()
@@ -129,433 +176,307 @@ def identify_leaf_textures(groups):
     
     return leaf_groups
 
-def merge_texture_channels(leaf_groups):
+def merge_texture_group(name, sources, spec, use_stats=False):
+    """
+    按规则合并一个贴图组的通道
+
+    组内每张源贴图最多解码一次，解码结果交给所有用到它的输出，最后一个使用它的输出完成后释放
+    （例如Trunk组的_D同时用于_DA和_DAO，_N同时用于_NRS和_NR）。
+
+    Args:
+        name (str): 组名（基础名称）
+        sources (dict): 源标签 -> 文件路径
+        spec (texture_rules.PackingSpec): 通道打包规则
+        use_stats (bool): 是否使用并更新源贴图目录中的统计索引（常量通道直接填充）
+
+    Returns:
+        dict: {'name', 'written': 生成的文件列表, 'failed': [(输出名称, 原因)], 'seconds': 耗时,
+               'decoded': 实际解码次数, 'source_uses': 各输出用到的源贴图数之和（逐输出加载时的解码次数）}
+    """
+    start = time.perf_counter()
+    print(f"正在处理文件组: {name}")
+    decoded = []
+
+    def load_once(file_path):
+        decoded.append(file_path)
+        return load_tga_image(file_path)
+
+    source_uses = sum(len([label for label in rule.sources if label in sources])
+                      for rule in spec.outputs if rule.applies_to(name, sources))
+    outputs = texture_rules.render_group(spec, sources, load_once, None, name, use_stats=use_stats)
+    written = []
+    failed = []
+    for output in outputs:
+        if output['status'] == 'written':
+            print(f"合并成功: {output['path']}")
+            written.append(output['path'])
+        elif output['status'] == 'failed':
+            print(f"处理文件组 {name} 的{output['name']}贴图时出错: {output['reason']}")
+            failed.append((output['name'], output['reason']))
+    print(f"文件组 {name} 解码 {len(decoded)} 张源贴图（逐输出加载需要 {source_uses} 次）")
+    return {'name': name, 'written': written, 'failed': failed, 'seconds': time.perf_counter() - start,
+            'decoded': len(decoded), 'source_uses': source_uses}
+
+def _group_sources(files, spec):
+    """
+    按后缀确定每个文件对应的源，同一后缀有多个文件时使用最后一个
+    """
+    sources = {}
+    for file in files:
+        file_name = os.path.splitext(os.path.basename(file))[0]
+        classified = spec.classify(file_name)
+        if classified is not None:
+            sources[classified[1]] = file
+    return sources
+
+def merge_texture_channels(leaf_groups, spec=None, dry_run=False, use_stats=False):
     """
     将后缀为"_A"的贴图R通道合并到后缀"_D"的A通道，并存储为新的资源修改后缀名为"_DA"
     同时将_R和_S文件的R通道分别合并到_N文件的BA通道，并存储为后缀名_NRS
+    通道规则定义在packing_rules/foliage_leaf_trunk.json中，每组的每张源贴图只解码一次
+    使用统计索引（texture_stats.py）时，常量通道直接填充
+    输出按行带由各源通道合成后直接写出TGA，不分配整幅输出数组
+    运行前先只解析文件头生成合并计划并校验，有源贴图无法读取或尺寸不一致的组在解码前整组跳过
+
+    Args:
+        leaf_groups (dict): 组名 -> 文件路径列表（identify_leaf_textures的结果）
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        dry_run (bool): 只输出合并计划，不处理像素
+        use_stats (bool): 是否使用并更新源贴图目录中的统计索引
+
+    Returns:
+        dict: 与run_merge_plan相同的汇总
     """
+    spec = spec or texture_rules.load_rule_spec(DEFAULT_RULES)
+    groups = []
     for name, files in leaf_groups.items():
-        # 查找_D和_A文件
-        d_file = None
-        a_file = None
-        
-        # 查找_N、_R和_S文件
-        n_file = None
-        r_file = None
-        s_file = None
-        
-        # 查找Trunk相关的文件
-        ao_file = None
-        
-        for file in files:
-            base_name = os.path.basename(file)
-            file_name, ext = os.path.splitext(base_name)
-            
-            if file_name.endswith("_D"):
-                d_file = file
-            elif file_name.endswith("_A"):
-                a_file = file
-            elif file_name.endswith("_N"):
-                n_file = file
-            elif file_name.endswith("_R"):
-                r_file = file
-            elif file_name.endswith("_S"):
-                s_file = file
-            elif file_name.endswith("_AO"):
-                ao_file = file
-        
-        # 如果同时存在_D和_A文件，则进行合并
-        if d_file and a_file:
-            try:
-                # 读取图像
-                print(f"正在处理: {d_file} 和 {a_file}")
-                
-                # 使用Pillow读取TGA文件
-                def load_tga_image(file_path):
-                    try:
-                        # 使用Pillow读取
-                        img_pil = Image.open(file_path)
-                        
-                        # 转换为numpy数组
-                        img_array = np.array(img_pil)
-                        
-                        # 转换为OpenCV格式
-                        if img_array.ndim == 3:
-                            # PIL使用RGB，OpenCV使用BGR
-                            if img_array.shape[2] == 3:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                            elif img_array.shape[2] == 4:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGRA)
-                            else:
-                                img_cv = img_array
-                        else:
-                            img_cv = img_array
-                            
-                        return img_cv
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 时出错: {e}")
-                        return None
-                
-                img_d = load_tga_image(d_file)
-                img_a = load_tga_image(a_file)
-                
-                # 检查文件是否成功读取
-                if img_d is None:
-                    print(f"警告: 无法读取文件 {d_file}")
-                    continue
-                if img_a is None:
-                    print(f"警告: 无法读取文件 {a_file}")
-                    continue
-                
-                # 确保图像是四通道（RGBA）
-                if len(img_d.shape) == 3 and img_d.shape[2] == 3:
-                    # 添加alpha通道
-                    alpha_channel = np.ones((img_d.shape[0], img_d.shape[1], 1), dtype=img_d.dtype) * 255
-                    img_d = np.concatenate((img_d, alpha_channel), axis=2)
-                elif len(img_d.shape) == 2:
-                    # 灰度图转RGBA
-                    img_d = cv2.cvtColor(img_d, cv2.COLOR_GRAY2RGBA)
-                
-                # 确保A贴图是单通道或获取其R通道
-                if len(img_a.shape) == 3:
-                    if img_a.shape[2] >= 3:
-                        # 获取R通道 (在OpenCV中是第3个通道，索引为2)
-                        r_channel = img_a[:, :, 2]
-                    else:
-                        r_channel = img_a[:, :, 0]
-                else:
-                    r_channel = img_a
-                
-                # 将A贴图的R通道复制到D贴图的Alpha通道
-                img_d[:, :, 3] = r_channel
-                
-                # 生成新文件名，将_D改为_DA
-                new_name = re.sub(r'_D$', '_DA', os.path.splitext(d_file)[0])
-                
-                # 确保输出目录存在
-                output_dir = os.path.join(os.path.dirname(d_file), "Textures")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # 输出为tga格式
-                output_path = os.path.join(output_dir, os.path.basename(new_name) + ".tga")
-                
-                # 保存合并后的图像
-                # 转换回Pillow格式进行保存
-                if len(img_d.shape) == 3 and img_d.shape[2] == 4:
-                    # BGRA转RGBA
-                    img_pil = cv2.cvtColor(img_d, cv2.COLOR_BGRA2RGBA)
-                elif len(img_d.shape) == 3 and img_d.shape[2] == 3:
-                    # BGR转RGB
-                    img_pil = cv2.cvtColor(img_d, cv2.COLOR_BGR2RGB)
-                else:
-                    img_pil = img_d
-                    
-                # 使用Pillow保存
-                Image.fromarray(img_pil).save(output_path)
-                print(f"合并成功: {output_path}")
-                
-            except Exception as e:
-                print(f"处理文件组 {name} 时出错: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # 如果同时存在_N、_R和_S文件，则进行合并
-        if n_file and r_file and s_file:
-            try:
-                # 读取图像
-                print(f"正在处理: {n_file}, {r_file} 和 {s_file}")
-                
-                # 使用Pillow读取TGA文件
-                def load_tga_image(file_path):
-                    try:
-                        # 使用Pillow读取
-                        img_pil = Image.open(file_path)
-                        
-                        # 转换为numpy数组
-                        img_array = np.array(img_pil)
-                        
-                        # 转换为OpenCV格式
-                        if img_array.ndim == 3:
-                            # PIL使用RGB，OpenCV使用BGR
-                            if img_array.shape[2] == 3:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                            elif img_array.shape[2] == 4:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGRA)
-                            else:
-                                img_cv = img_array
-                        else:
-                            img_cv = img_array
-                            
-                        return img_cv
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 时出错: {e}")
-                        return None
-                
-                img_n = load_tga_image(n_file)
-                img_r = load_tga_image(r_file)
-                img_s = load_tga_image(s_file)
-                
-                # 检查文件是否成功读取
-                if img_n is None:
-                    print(f"警告: 无法读取文件 {n_file}")
-                    continue
-                if img_r is None:
-                    print(f"警告: 无法读取文件 {r_file}")
-                    continue
-                if img_s is None:
-                    print(f"警告: 无法读取文件 {s_file}")
-                    continue
-                
-                # 确保_N图像是四通道（RGBA）
-                if len(img_n.shape) == 3 and img_n.shape[2] == 3:
-                    # 添加alpha通道
-                    alpha_channel = np.ones((img_n.shape[0], img_n.shape[1], 1), dtype=img_n.dtype) * 255
-                    img_n = np.concatenate((img_n, alpha_channel), axis=2)
-                elif len(img_n.shape) == 2:
-                    # 灰度图转RGBA
-                    img_n = cv2.cvtColor(img_n, cv2.COLOR_GRAY2RGBA)
-                
-                # 确保_R和_S贴图是单通道或获取其R通道
-                def get_red_channel(img):
-                    if len(img.shape) == 3:
-                        if img.shape[2] >= 3:
-                            # 获取R通道 (在OpenCV中是第3个通道，索引为2)
-                            return img[:, :, 2]
-                        else:
-                            return img[:, :, 0]
-                    else:
-                        return img
-                
-                r_channel = get_red_channel(img_r)
-                s_channel = get_red_channel(img_s)
-                
-                # 将_R贴图的R通道复制到_N贴图的B通道（索引0）
-                # 将_S贴图的R通道复制到_N贴图的A通道（索引3）
-                img_n[:, :, 0] = r_channel  # B通道
-                img_n[:, :, 3] = s_channel  # A通道
-                
-                # 生成新文件名，将_N改为_NRS
-                new_name = re.sub(r'_N$', '_NRS', os.path.splitext(n_file)[0])
-                
-                # 确保输出目录存在
-                output_dir = os.path.join(os.path.dirname(n_file), "Textures")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # 输出为tga格式
-                output_path = os.path.join(output_dir, os.path.basename(new_name) + ".tga")
-                
-                # 保存合并后的图像
-                # 转换回Pillow格式进行保存
-                if len(img_n.shape) == 3 and img_n.shape[2] == 4:
-                    # BGRA转RGBA
-                    img_pil = cv2.cvtColor(img_n, cv2.COLOR_BGRA2RGBA)
-                elif len(img_n.shape) == 3 and img_n.shape[2] == 3:
-                    # BGR转RGB
-                    img_pil = cv2.cvtColor(img_n, cv2.COLOR_BGR2RGB)
-                else:
-                    img_pil = img_n
-                    
-                # 使用Pillow保存为tga格式
-                Image.fromarray(img_pil).save(output_path)
-                print(f"合并成功: {output_path}")
-                
-            except Exception as e:
-                print(f"处理文件组 {name} 时出错: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # 处理Trunk相关的文件
-        # 如果同时存在_D和_AO文件，则进行合并为_DAO
-        if d_file and ao_file and "Trunk" in name:
-            try:
-                # 读取图像
-                print(f"正在处理Trunk文件: {d_file} 和 {ao_file}")
-                
-                # 使用Pillow读取TGA文件
-                def load_tga_image(file_path):
-                    try:
-                        # 使用Pillow读取
-                        img_pil = Image.open(file_path)
-                        
-                        # 转换为numpy数组
-                        img_array = np.array(img_pil)
-                        
-                        # 转换为OpenCV格式
-                        if img_array.ndim == 3:
-                            # PIL使用RGB，OpenCV使用BGR
-                            if img_array.shape[2] == 3:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                            elif img_array.shape[2] == 4:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGRA)
-                            else:
-                                img_cv = img_array
-                        else:
-                            img_cv = img_array
-                            
-                        return img_cv
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 时出错: {e}")
-                        return None
-                
-                img_d = load_tga_image(d_file)
-                img_ao = load_tga_image(ao_file)
-                
-                # 检查文件是否成功读取
-                if img_d is None:
-                    print(f"警告: 无法读取文件 {d_file}")
-                    continue
-                if img_ao is None:
-                    print(f"警告: 无法读取文件 {ao_file}")
-                    continue
-                
-                # 确保图像是四通道（RGBA）
-                if len(img_d.shape) == 3 and img_d.shape[2] == 3:
-                    # 添加alpha通道
-                    alpha_channel = np.ones((img_d.shape[0], img_d.shape[1], 1), dtype=img_d.dtype) * 255
-                    img_d = np.concatenate((img_d, alpha_channel), axis=2)
-                elif len(img_d.shape) == 2:
-                    # 灰度图转RGBA
-                    img_d = cv2.cvtColor(img_d, cv2.COLOR_GRAY2RGBA)
-                
-                # 确保AO贴图是单通道或获取其R通道
-                if len(img_ao.shape) == 3:
-                    if img_ao.shape[2] >= 3:
-                        # 获取R通道 (在OpenCV中是第3个通道，索引为2)
-                        r_channel = img_ao[:, :, 2]
-                    else:
-                        r_channel = img_ao[:, :, 0]
-                else:
-                    r_channel = img_ao
-                
-                # 将AO贴图的R通道复制到D贴图的Alpha通道
-                img_d[:, :, 3] = r_channel
-                
-                # 生成新文件名，将_D改为_DAO
-                new_name = re.sub(r'_D$', '_DAO', os.path.splitext(d_file)[0])
-                
-                # 确保输出目录存在
-                output_dir = os.path.join(os.path.dirname(d_file), "Textures")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # 输出为tga格式
-                output_path = os.path.join(output_dir, os.path.basename(new_name) + ".tga")
-                
-                # 保存合并后的图像
-                # 转换回Pillow格式进行保存
-                if len(img_d.shape) == 3 and img_d.shape[2] == 4:
-                    # BGRA转RGBA
-                    img_pil = cv2.cvtColor(img_d, cv2.COLOR_BGRA2RGBA)
-                elif len(img_d.shape) == 3 and img_d.shape[2] == 3:
-                    # BGR转RGB
-                    img_pil = cv2.cvtColor(img_d, cv2.COLOR_BGR2RGB)
-                else:
-                    img_pil = img_d
-                    
-                # 使用Pillow保存
-                Image.fromarray(img_pil).save(output_path)
-                print(f"Trunk合并成功: {output_path}")
-                
-            except Exception as e:
-                print(f"处理Trunk文件组 {name} 时出错: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # 如果同时存在_N和_R文件（Trunk相关），则进行合并为_NR
-        if n_file and r_file and "Trunk" in name:
-            try:
-                # 读取图像
-                print(f"正在处理Trunk文件: {n_file} 和 {r_file}")
-                
-                # 使用Pillow读取TGA文件
-                def load_tga_image(file_path):
-                    try:
-                        # 使用Pillow读取
-                        img_pil = Image.open(file_path)
-                        
-                        # 转换为numpy数组
-                        img_array = np.array(img_pil)
-                        
-                        # 转换为OpenCV格式
-                        if img_array.ndim == 3:
-                            # PIL使用RGB，OpenCV使用BGR
-                            if img_array.shape[2] == 3:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                            elif img_array.shape[2] == 4:
-                                img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGRA)
-                            else:
-                                img_cv = img_array
-                        else:
-                            img_cv = img_array
-                            
-                        return img_cv
-                    except Exception as e:
-                        print(f"读取文件 {file_path} 时出错: {e}")
-                        return None
-                
-                img_n = load_tga_image(n_file)
-                img_r = load_tga_image(r_file)
-                
-                # 检查文件是否成功读取
-                if img_n is None:
-                    print(f"警告: 无法读取文件 {n_file}")
-                    continue
-                if img_r is None:
-                    print(f"警告: 无法读取文件 {r_file}")
-                    continue
-                
-                # 确保_N图像是四通道（RGBA）
-                if len(img_n.shape) == 3 and img_n.shape[2] == 3:
-                    # 添加alpha通道
-                    alpha_channel = np.ones((img_n.shape[0], img_n.shape[1], 1), dtype=img_n.dtype) * 255
-                    img_n = np.concatenate((img_n, alpha_channel), axis=2)
-                elif len(img_n.shape) == 2:
-                    # 灰度图转RGBA
-                    img_n = cv2.cvtColor(img_n, cv2.COLOR_GRAY2RGBA)
-                
-                # 确保_R贴图是单通道或获取其R通道
-                if len(img_r.shape) == 3:
-                    if img_r.shape[2] >= 3:
-                        # 获取R通道 (在OpenCV中是第3个通道，索引为2)
-                        r_channel = img_r[:, :, 2]
-                    else:
-                        r_channel = img_r[:, :, 0]
-                else:
-                    r_channel = img_r
-                
-                # 将_R贴图的R通道复制到_N贴图的B通道（索引0）
-                img_n[:, :, 0] = r_channel  # B通道
-                
-                # 生成新文件名，将_N改为_NR
-                new_name = re.sub(r'_N$', '_NR', os.path.splitext(n_file)[0])
-                
-                # 确保输出目录存在
-                output_dir = os.path.join(os.path.dirname(n_file), "Textures")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # 输出为tga格式
-                output_path = os.path.join(output_dir, os.path.basename(new_name) + ".tga")
-                
-                # 保存合并后的图像
-                # 转换回Pillow格式进行保存
-                if len(img_n.shape) == 3 and img_n.shape[2] == 4:
-                    # BGRA转RGBA
-                    img_pil = cv2.cvtColor(img_n, cv2.COLOR_BGRA2RGBA)
-                elif len(img_n.shape) == 3 and img_n.shape[2] == 3:
-                    # BGR转RGB
-                    img_pil = cv2.cvtColor(img_n, cv2.COLOR_BGR2RGB)
-                else:
-                    img_pil = img_n
-                    
-                # 使用Pillow保存为tga格式
-                Image.fromarray(img_pil).save(output_path)
-                print(f"Trunk合并成功: {output_path}")
-                
-            except Exception as e:
-                print(f"处理Trunk文件组 {name} 时出错: {e}")
-                import traceback
-                traceback.print_exc()
+        sources = _group_sources(files, spec)
+        if sources:
+            groups.append({'root': os.path.dirname(files[0]), 'name': name, 'sources': sources})
+    plans = plan_merge(groups, spec)
+    print_merge_plan(plans)
+    return run_merge_plan(plans, 1, spec, dry_run, use_stats)
+
+def collect_leaf_groups(base_directory, spec=None, recursive=True):
+    """
+    用scandir目录索引收集目录中的Leaf/Trunk贴图组，每个目录中的组互相独立
+    缺少部分源贴图的组也会收集，由plan_merge在计划中报告
+
+    Args:
+        base_directory (str): 基础目录
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        recursive (bool): 是否包括子目录
+
+    Returns:
+        list: 贴图组列表，每项为 {'root': 目录, 'name': 组名, 'sources': {源标签: 文件路径}}
+    """
+    spec = spec or texture_rules.load_rule_spec(DEFAULT_RULES)
+    if recursive:
+        directory_indexes = texture_index.iter_texture_directories(base_directory, spec.suffixes)
+    else:
+        directory_indexes = [texture_index.index_directory(base_directory, spec.suffixes)]
+
+    groups = []
+    for directory_index in directory_indexes:
+        for name, sources in directory_index['groups'].items():
+            if any(keyword in name for keyword in GROUP_KEYWORDS):
+                groups.append({'root': directory_index['root'], 'name': name, 'sources': sources})
+    return groups
+
+def plan_merge(groups, spec):
+    """
+    只解析文件头，为每个贴图组规划全部输出（DA、NRS、DAO、NR）并校验
+
+    Args:
+        groups (list): collect_leaf_groups返回的贴图组列表
+        spec (texture_rules.PackingSpec): 通道打包规则
+
+    Returns:
+        list: 每个组的计划 {'root', 'name', 'sources', 'outputs': texture_rules.plan_group的结果,
+              'valid': 没有无法读取或尺寸不一致的源, 'runnable': 校验通过且至少有一个可以生成的输出}
+    """
+    plans = []
+    for group in groups:
+        outputs = texture_rules.plan_group(spec, group['sources'], group['name'])
+        valid = all(output['status'] != 'invalid' for output in outputs)
+        plans.append(dict(group, outputs=outputs, valid=valid,
+                          runnable=valid and any(output['status'] == 'ok' for output in outputs)))
+    return plans
+
+def _format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}MB"
+    return f"{size / 1024:.1f}KB"
+
+def print_merge_plan(plans):
+    """
+    输出合并计划（预演报告）：每个输出的尺寸、输入字节数和预计输出字节数，以及被拒绝的组
+    """
+    print(f"合并计划: {len(plans)} 个贴图组")
+    input_total = 0
+    output_total = 0
+    output_count = 0
+    for plan in plans:
+        state = '' if plan['runnable'] else ('  [已拒绝]' if not plan['valid'] else '  [无可生成的输出]')
+        print(f"  {os.path.join(plan['root'], plan['name'])}{state}")
+        for output in plan['outputs']:
+            if output['status'] == 'ok':
+                print(f"    {output['suffix']:<6} {output['width']}x{output['height']} "
+                      f"输入 {_format_bytes(output['input_bytes'])} 预计输出 {_format_bytes(output['output_bytes'])}")
+                if plan['valid']:
+                    input_total += output['input_bytes']
+                    output_total += output['output_bytes']
+                    output_count += 1
+            else:
+                print(f"    {output['suffix']:<6} {'跳过' if output['status'] == 'missing' else '错误'}: {output['reason']}")
+    rejected = sum(1 for plan in plans if not plan['valid'])
+    print(f"计划生成 {output_count} 个文件, 读取 {_format_bytes(input_total)}, 预计写出 {_format_bytes(output_total)}, "
+          f"拒绝 {rejected} 个贴图组")
+
+def _merge_group_in_worker(group, spec, use_stats, log_level):
+    """
+    在子进程中合并一个贴图组，捕获该组的全部输出，由主进程整体打印，避免多进程日志交错
+    """
+    if log_level is not None:
+        texture_log.configure(log_level)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            result = merge_texture_group(group['name'], group['sources'], spec, use_stats)
+        except Exception as e:
+            print(f"处理文件组 {group['name']} 时出错: {e}")
+            result = {'name': group['name'], 'written': [], 'failed': [('*', str(e))], 'seconds': 0.0,
+                      'decoded': 0, 'source_uses': 0}
+    result['log'] = log.getvalue()
+    # 统计索引由主进程统一保存，子进程只传回新增的记录
+    result['stats_entries'] = texture_stats.take_new_entries()
+    return result
+
+def run_merge_plan(plans, jobs=1, spec=None, dry_run=False, use_stats=False):
+    """
+    执行校验通过的合并计划，jobs大于1时分发到进程池并行处理；被拒绝的组不做任何像素处理
+
+    Args:
+        plans (list): plan_merge返回的计划
+        jobs (int): 并行进程数，1表示在当前进程中串行处理
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        dry_run (bool): 只汇总计划，不处理像素
+        use_stats (bool): 是否使用并更新源贴图目录中的统计索引
+
+    Returns:
+        dict: {'groups': 执行的贴图组数, 'rejected': 被拒绝的组数, 'written': 生成的文件列表,
+               'failed': [(组的路径, 输出名称, 原因)], 'decoded': 解码次数合计,
+               'source_uses': 逐输出加载时的解码次数合计, 'results': 与执行顺序一致的每组结果, 'plan': 合并计划}
+    """
+    spec = spec or texture_rules.load_rule_spec(DEFAULT_RULES)
+    groups = [plan for plan in plans if plan['runnable']]
+    failed = [(os.path.join(plan['root'], plan['name']), output['name'], output['reason'])
+              for plan in plans if not plan['valid']
+              for output in plan['outputs'] if output['status'] == 'invalid']
+    summary = {'groups': len(groups), 'rejected': sum(1 for plan in plans if not plan['valid']),
+               'written': [], 'failed': failed, 'decoded': 0, 'source_uses': 0, 'results': [], 'plan': plans}
+    if dry_run or not groups:
+        return summary
+
+    results = [None] * len(groups)
+    if jobs <= 1 or len(groups) <= 1:
+        with texture_log.ProgressLine(len(groups)) as progress:
+            for index, group in enumerate(groups):
+                results[index] = merge_texture_group(group['name'], group['sources'], spec, use_stats)
+                progress.update(index + 1, group['name'])
+    else:
+        print(f"使用 {jobs} 个进程并行处理")
+        log_level = texture_log.console_level()
+        with ProcessPoolExecutor(max_workers=jobs) as executor, \
+                texture_log.ProgressLine(len(groups)) as progress:
+            futures = {executor.submit(_merge_group_in_worker, group, spec, use_stats, log_level): index
+                       for index, group in enumerate(groups)}
+            for finished, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    name = groups[index]['name']
+                    result = {'name': name, 'written': [], 'failed': [('*', str(e))], 'seconds': 0.0,
+                              'decoded': 0, 'source_uses': 0, 'log': f"处理文件组 {name} 的子进程异常退出: {e}\n"}
+                texture_log.echo(result.pop('log'))
+                texture_stats.merge_entries(result.pop('stats_entries', {}))
+                progress.update(finished, result['name'])
+                results[index] = result
+    if use_stats:
+        texture_stats.save_all()
+
+    for group, result in zip(groups, results):
+        summary['written'].extend(result['written'])
+        summary['failed'].extend((os.path.join(group['root'], group['name']), output, reason)
+                                 for output, reason in result['failed'])
+        summary['decoded'] += result['decoded']
+        summary['source_uses'] += result['source_uses']
+    summary['results'] = results
+    return summary
+
+def merge_directory(base_directory, jobs=1, spec=None, recursive=True, dry_run=False, use_stats=False):
+    """
+    目录模式：规划并校验目录中全部Leaf/Trunk贴图组，再合并校验通过的组
+
+    Args:
+        base_directory (str): 基础目录
+        jobs (int): 并行进程数，1表示在当前进程中串行处理
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        recursive (bool): 是否包括子目录
+        dry_run (bool): 只输出合并计划，不处理像素
+        use_stats (bool): 是否使用并更新源贴图目录中的统计索引
+
+    Returns:
+        dict: 与run_merge_plan相同的汇总
+    """
+    spec = spec or texture_rules.load_rule_spec(DEFAULT_RULES)
+    groups = collect_leaf_groups(base_directory, spec, recursive)
+    print(f"找到 {len(groups)} 个Leaf/Trunk贴图组")
+    plans = plan_merge(groups, spec)
+    print_merge_plan(plans)
+    return run_merge_plan(plans, jobs, spec, dry_run, use_stats)
 
 def main():
+    parser = argparse.ArgumentParser(description='纹理合并工具：合并Leaf/Trunk贴图组的通道')
+    parser.add_argument('directory', nargs='?',
+                        help='要处理的目录（不提供时从剪贴板或文件选择对话框获取文件）')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='目录模式下包括全部子目录')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='目录模式下并行处理贴图组的进程数，0表示使用全部CPU核心（默认1，串行）')
+    parser.add_argument('--rules', metavar='SPEC',
+                        help=f'通道打包规则文件路径或packing_rules目录中的规则名称（默认{DEFAULT_RULES}）')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只解析文件头输出合并计划（输出列表、尺寸、输入和预计输出字节数），不处理像素')
+    parser.add_argument('--stats', action='store_true',
+                        help='使用并更新源贴图目录中的通道统计索引（.texture_stats.json），常量通道直接填充；'
+                             '默认不使用，也不在源贴图目录中写入索引文件')
+    args = parser.parse_args()
+    texture_log.configure()
+
+    try:
+        spec = texture_rules.load_rule_spec(args.rules or DEFAULT_RULES)
+    except (OSError, texture_rules.RuleSpecError) as e:
+        print(f"读取通道打包规则失败: {e}")
+        sys.exit(2)
+
+    if args.directory:
+        if not os.path.isdir(args.directory):
+            print(f"目录不存在: {args.directory}")
+            sys.exit(2)
+        print(f"开始处理目录: {args.directory}")
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        summary = merge_directory(args.directory, jobs, spec, args.recursive, args.dry_run, args.stats)
+        if args.dry_run:
+            sys.exit(1 if summary['failed'] else 0)
+        print(f"纹理合并处理完成: {summary['groups']} 个贴图组, 生成 {len(summary['written'])} 个文件, "
+              f"失败 {len(summary['failed'])} 个, 解码 {summary['decoded']} 次"
+              f"（逐输出加载需要 {summary['source_uses']} 次）")
+        for group_path, output, reason in summary['failed']:
+            print(f"  {group_path} {output}: {reason}")
+        sys.exit(1 if summary['failed'] else 0)
+
     print("开始处理纹理合并...")
     
     # 获取文件路径
@@ -585,7 +506,7 @@ def main():
             print(f"    - {file}")
     
     # 合并通道
-    merge_texture_channels(leaf_groups)
+    merge_texture_channels(leaf_groups, spec, args.dry_run, args.stats)
     
     print("纹理合并处理完成")
 
@@ -3,8 +3,19 @@
 import cv2
 import numpy as np
 import argparse
+import contextlib
+import csv
+import glob
+import io
 import os
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tga_codec
+import texture_log
+import texture_stats
+
 try:
     # 尝试导入PIL以更好地处理TGA文件
     from PIL import Image
@@ -19,6 +30,20 @@ try:
 except ImportError:
     TK_AVAILABLE = False
 
+logger = texture_log.get_logger('alpha')
+
+# 批处理时从目录中收集的图像扩展名
+IMAGE_EXTENSIONS = ('.tga', '.tpic', '.png', '.tif', '.tiff', '.jpg', '.jpeg', '.bmp')
+
+def _tga_output_path(output_path):
+    """
+    确保输出路径以.tga结尾
+    """
+    if not output_path.lower().endswith('.tga'):
+        name, _ = os.path.splitext(output_path)
+        output_path = name + '.tga'
+    return output_path
+
 def save_image_tga(image, output_path):
     """
     保存图像为TGA格式
@@ -27,10 +52,14 @@ def save_image_tga(image, output_path):
         image (numpy.ndarray): 要保存的图像
         output_path (str): 输出文件路径
     """
-    # 确保输出路径以.tga结尾
-    if not output_path.lower().endswith('.tga'):
-        name, _ = os.path.splitext(output_path)
-        output_path = name + '.tga'
+    output_path = _tga_output_path(output_path)
+    
+    # 优先直接编码TGA，BGR(A)数组无需交换通道即可写出
+    try:
+        tga_codec.write_tga(output_path, image)
+        return True
+    except Exception as e:
+        print(f"直接编码TGA时出错: {e}")
     
     # 如果PIL可用，使用PIL保存TGA文件以获得更好的兼容性
     if PIL_AVAILABLE:
@@ -79,7 +108,16 @@ def load_image_with_fallback(image_path):
     # 获取文件扩展名
     _, ext = os.path.splitext(image_path)
     
-    # 首先尝试使用OpenCV加载
+    # TGA文件优先直接解码，像素直接读入OpenCV通道顺序的数组
+    if ext.lower() in ['.tga', '.tpic']:
+        try:
+            image = tga_codec.read_tga(image_path)
+            print(f"直接解码TGA成功: {image_path}")
+            return image
+        except Exception as e:
+            print(f"直接解码TGA时出现异常: {e}")
+    
+    # 尝试使用OpenCV加载
     try:
         image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
         if image is not None:
@@ -151,7 +189,170 @@ def create_backup(image_path):
         print(f"创建备份失败: {e}")
         return None
 
-def process_alpha_channel(image_path, output_path=None):
+def alpha_value_range(image_path, alpha, shape, alpha_range=None, band_rows=None, use_stats=False):
+    """
+    获取Alpha通道的最大值和最小值（0-1范围）
+
+    启用统计索引（texture_stats.py）且其中有该文件的记录时直接使用，不再扫描像素；
+    否则在uint8上求最小/最大值（可以按行带分批扫描），再换算到0-1范围，
+    与先把整个通道转换为float32再求最小/最大值的结果一致。
+
+    Args:
+        image_path (str): 图像路径，用于查询统计索引
+        alpha (numpy.ndarray): (H, W)的uint8 Alpha通道（可以是内存映射上的视图）
+        shape (tuple): 图像的 (高, 宽)
+        alpha_range (tuple): 已知的 (最小值, 最大值)，例如新建的Alpha通道
+        band_rows (int): 按行带扫描的行数，None表示整幅扫描
+        use_stats (bool): 是否查询贴图目录中的统计索引（.texture_stats.json）
+
+    Returns:
+        tuple: (最小值, 最大值)，均为numpy.float32
+    """
+    if alpha_range is None and use_stats:
+        stats = texture_stats.lookup(image_path, hash_unknown=False)
+        alpha_stats = texture_stats.channel_stats(stats, 4, 3)
+        if alpha_stats is not None and stats['shape'] == list(shape):
+            alpha_range = (alpha_stats['min'], alpha_stats['max'])
+            logger.info("Alpha通道范围取自统计索引")
+    if alpha_range is None:
+        step = band_rows or alpha.shape[0]
+        bands = [alpha[top:top + step] for top in range(0, alpha.shape[0], step)]
+        alpha_range = (min(int(np.min(band)) for band in bands), max(int(np.max(band)) for band in bands))
+    # 与逐像素 uint8 -> float32 / 255.0 的结果一致
+    return np.float32(alpha_range[0]) / np.float32(255.0), np.float32(alpha_range[1]) / np.float32(255.0)
+
+
+def alpha_ratio(alpha_min, alpha_max):
+    """
+    计算缩放比例 ratio = 0.5 / max(|max-0.5|, |min-0.5|)
+    """
+    # 计算 |max-0.5| 和 |min-0.5|
+    max_diff = abs(alpha_max - 0.5)
+    min_diff = abs(alpha_min - 0.5)
+    
+    # 取绝对值大的数
+    scale_factor = max(max_diff, min_diff)
+    
+    print(f"缩放因子(最大差值): {scale_factor:.4f}")
+    
+    # 计算比率
+    if scale_factor == 0:
+        ratio = 1.0  # 避免除零错误
+    else:
+        ratio = 0.5 / scale_factor
+    
+    print(f"应用比率: {ratio:.4f}")
+    return ratio
+
+
+def transform_alpha(alpha, ratio):
+    """
+    对Alpha通道执行 ratio * (pixel - 0.5) + 0.5，结果转换回0-255范围
+
+    Args:
+        alpha (numpy.ndarray): uint8的Alpha通道（整幅或一个行带）
+        ratio (float): 缩放比例
+
+    Returns:
+        numpy.ndarray: 与输入形状相同的uint8数组
+    """
+    # 提取alpha通道 (转换为0-1范围)
+    alpha_channel = alpha.astype(np.float32) / 255.0
+    
+    # 应用变换: ratio * (pixel - 0.5) + 0.5
+    transformed_alpha = ratio * (alpha_channel - 0.5) + 0.5
+    
+    # 转换回0-255范围并确保值在有效范围内
+    return np.clip(transformed_alpha * 255.0, 0, 255).astype(np.uint8)
+
+
+def alpha_lookup_table(ratio):
+    """
+    把Alpha变换烘焙为256项的uint8查找表
+
+    Alpha是uint8，只有256种输入值；查找表直接由transform_alpha对0-255计算得到，
+    查表结果与对整幅通道做float32变换逐像素完全一致（包括舍入和截断）。
+
+    Args:
+        ratio (float): 缩放比例
+
+    Returns:
+        numpy.ndarray: 长度256的uint8数组，lut[原值] = 变换后的值
+    """
+    return transform_alpha(np.arange(256, dtype=np.uint8), ratio)
+
+
+def apply_alpha_lookup_table(pixels, lut):
+    """
+    用查找表原地变换BGRA图像的Alpha通道，不产生整幅的临时数组
+
+    连续存储的图像用一次cv2.LUT原地处理（BGR三个通道的表为恒等映射）；
+    其他情况按索引查表，只产生一个单通道的临时数组。
+
+    Args:
+        pixels (numpy.ndarray): (H, W, 4)的uint8图像（整幅或一个行带）
+        lut (numpy.ndarray): alpha_lookup_table的结果
+    """
+    if pixels.flags.c_contiguous:
+        table = np.repeat(np.arange(256, dtype=np.uint8)[:, np.newaxis], 4, axis=1)
+        table[:, 3] = lut
+        cv2.LUT(pixels, table.reshape(1, 256, 4), dst=pixels)
+    else:
+        pixels[:, :, 3] = lut[pixels[:, :, 3]]
+
+
+def process_alpha_channel_banded(image_path, output_path, band_rows, use_stats=False):
+    """
+    按行带处理未压缩的32位TGA：源贴图通过内存映射按行读取，结果按行带流式写出，
+    峰值内存与行带高度成正比，不随图像尺寸增长
+
+    Args:
+        image_path (str): 输入图像路径
+        output_path (str): 输出图像路径
+        band_rows (int): 每个行带的行数
+        use_stats (bool): 是否查询统计索引中的Alpha范围
+
+    Returns:
+        tuple: (Alpha最小值, Alpha最大值, 缩放比例)；图像不是可以内存映射的32位TGA时返回None，由调用方整幅处理
+    """
+    if os.path.splitext(image_path)[1].lower() not in ('.tga', '.tpic'):
+        return None
+    try:
+        image = tga_codec.open_tga_lazy(image_path)
+    except Exception as e:
+        print(f"无法映射TGA，改为整幅处理: {e}")
+        return None
+    if not image.mapped or image.channels != 4:
+        image.close()
+        return None
+
+    height, width = image.shape[:2]
+    print(f"按行带处理: 每次 {band_rows} 行")
+    try:
+        alpha_min, alpha_max = alpha_value_range(image_path, image.channel(3), (height, width), band_rows=band_rows,
+                                                use_stats=use_stats)
+        print(f"Alpha通道最小值: {alpha_min:.4f}")
+        print(f"Alpha通道最大值: {alpha_max:.4f}")
+        ratio = alpha_ratio(alpha_min, alpha_max)
+        lut = alpha_lookup_table(ratio)
+
+        writer = tga_codec.TgaStreamWriter(output_path, width, height, 4)
+        try:
+            for top, bottom in writer.bands(band_rows):
+                band = np.array(image[top:bottom])
+                apply_alpha_lookup_table(band, lut)
+                writer.write_band(top, band)
+        except BaseException:
+            writer.abort()
+            raise
+    finally:
+        # 输出可能覆盖原图，替换文件前先释放内存映射
+        image.close()
+    writer.close()
+    return alpha_min, alpha_max, ratio
+
+
+def process_alpha_channel(image_path, output_path=None, band_rows=None, use_stats=False):
     """
     处理图像的Alpha通道
     
@@ -160,21 +361,51 @@ def process_alpha_channel(image_path, output_path=None):
     2. 计算Alpha通道的最大值和最小值
     3. 计算max(|max-0.5|, |min-0.5|)
     4. 计算缩放比例 ratio = 0.5 / 上述值
-    5. 对每个像素执行: ratio * (pixel - 0.5) + 0.5
+    5. 对每个像素执行: ratio * (pixel - 0.5) + 0.5（预先烘焙为256项查找表，查表原地写回）
     6. 将结果写回图像的Alpha通道
     
     Args:
         image_path (str): 输入图像路径
         output_path (str): 输出图像路径，默认为None，表示覆盖原图
+        band_rows (int): 按行带处理的行数，None表示整幅处理。
+            只对未压缩的32位TGA生效，其他图像仍整幅处理
+        use_stats (bool): 是否查询统计索引中的Alpha范围，默认扫描像素
+
+    Returns:
+        dict: {'input', 'output', 'alpha_min', 'alpha_max', 'ratio'}，最小/最大值为0-1范围
     """
     
     # 检查文件是否存在
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"图像文件不存在: {image_path}")
     
+    # 只读取文件头预先了解图像尺寸和Alpha情况，不解码像素
+    try:
+        info = tga_codec.probe(image_path)
+        print(f"图像信息: {info['format']} {info['width']}x{info['height']}, "
+              f"{info['bit_depth']}位, Alpha {info['alpha_bits']}位")
+        if not info['alpha_bits'] and info['channels'] < 4:
+            print("提示: 文件头显示图像没有Alpha通道")
+    except Exception as e:
+        print(f"无法解析文件头，交给解码器处理: {e}")
+    
     # 创建备份文件
     backup_path = create_backup(image_path)
     
+    # 确定输出路径（默认覆盖原图）
+    if output_path is None:
+        output_path = image_path  # 覆盖原图
+    
+    banded = (process_alpha_channel_banded(image_path, _tga_output_path(output_path), band_rows, use_stats)
+              if band_rows else None)
+    if banded is not None:
+        print(f"图像已保存到: {_tga_output_path(output_path)}")
+        if backup_path:
+            print(f"原图备份保存在: {backup_path}")
+        alpha_min, alpha_max, ratio = banded
+        return {'input': image_path, 'output': _tga_output_path(output_path),
+                'alpha_min': float(alpha_min), 'alpha_max': float(alpha_max), 'ratio': float(ratio)}
+    
     # 使用多种方法加载图像
     image = load_image_with_fallback(image_path)
     
@@ -184,8 +415,9 @@ def process_alpha_channel(image_path, output_path=None):
                         f"支持的格式: {supported_formats}\n"
                         f"{'提示: 安装Pillow库可以获得更好的TGA支持' if not PIL_AVAILABLE else ''}")
     
-    # 检查是否有alpha通道
+    # 检查是否有alpha通道；新建的Alpha通道已知为常量255
     has_alpha = False
+    alpha_range = None
     if len(image.shape) == 3:
         if image.shape[2] >= 4:
             has_alpha = True
@@ -195,6 +427,7 @@ def process_alpha_channel(image_path, output_path=None):
             alpha_channel = np.full((image.shape[0], image.shape[1]), 255, dtype=image.dtype)
             image = np.dstack((image, alpha_channel))
             has_alpha = True
+            alpha_range = (255, 255)
     elif len(image.shape) == 2:
         # 灰度图像，转换为RGBA
         print("警告: 灰度图像，将转换为RGBA格式")
@@ -203,50 +436,23 @@ def process_alpha_channel(image_path, output_path=None):
         rgba[:, :, 3] = 255  # 全不透明
         image = rgba
         has_alpha = True
+        alpha_range = (255, 255)
     
     if not has_alpha:
         raise ValueError(f"图像不包含alpha通道: {image_path}\n"
                         f"图像形状: {image.shape}")
     
-    # 提取alpha通道 (转换为0-1范围)
-    alpha_channel = image[:, :, 3].astype(np.float32) / 255.0
-    
     # 获取最大值和最小值
-    alpha_min = np.min(alpha_channel)
-    alpha_max = np.max(alpha_channel)
+    alpha_min, alpha_max = alpha_value_range(image_path, image[:, :, 3], image.shape[:2], alpha_range,
+                                          use_stats=use_stats)
     
     print(f"Alpha通道最小值: {alpha_min:.4f}")
     print(f"Alpha通道最大值: {alpha_max:.4f}")
     
-    # 计算 |max-0.5| 和 |min-0.5|
-    max_diff = abs(alpha_max - 0.5)
-    min_diff = abs(alpha_min - 0.5)
+    ratio = alpha_ratio(alpha_min, alpha_max)
     
-    # 取绝对值大的数
-    scale_factor = max(max_diff, min_diff)
-    
-    print(f"缩放因子(最大差值): {scale_factor:.4f}")
-    
-    # 计算比率
-    if scale_factor == 0:
-        ratio = 1.0  # 避免除零错误
-    else:
-        ratio = 0.5 / scale_factor
-    
-    print(f"应用比率: {ratio:.4f}")
-    
-    # 应用变换: ratio * (pixel - 0.5) + 0.5
-    transformed_alpha = ratio * (alpha_channel - 0.5) + 0.5
-    
-    # 转换回0-255范围并确保值在有效范围内
-    transformed_alpha = np.clip(transformed_alpha * 255.0, 0, 255).astype(np.uint8)
-    
-    # 将处理后的alpha通道写回图像
-    image[:, :, 3] = transformed_alpha
-    
-    # 确定输出路径（默认覆盖原图）
-    if output_path is None:
-        output_path = image_path  # 覆盖原图
+    # 查表原地变换Alpha通道
+    apply_alpha_lookup_table(image, alpha_lookup_table(ratio))
     
     # 保存图像为TGA格式
     success = save_image_tga(image, output_path)
@@ -257,6 +463,140 @@ def process_alpha_channel(image_path, output_path=None):
             print(f"原图备份保存在: {backup_path}")
     else:
         raise IOError(f"无法保存图像到: {output_path}")
+    return {'input': image_path, 'output': _tga_output_path(output_path),
+            'alpha_min': float(alpha_min), 'alpha_max': float(alpha_max), 'ratio': float(ratio)}
+
+def expand_inputs(inputs, recursive=False):
+    """
+    把命令行输入展开为图像文件列表：目录（-r时包括子目录）、通配符或单个文件，
+    重复的文件只保留第一次出现，目录和通配符中的备份文件（*_backup.*）不会被收集
+
+    Args:
+        inputs (list): 文件、目录或通配符
+        recursive (bool): 目录是否包括子目录
+
+    Returns:
+        tuple: (图像文件列表, 不存在或没有匹配的输入列表)
+    """
+    files = []
+    missing = []
+    seen = set()
+
+    def add(file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        if key not in seen:
+            seen.add(key)
+            files.append(file_path)
+
+    def is_image(file_name):
+        stem, ext = os.path.splitext(file_name)
+        return ext.lower() in IMAGE_EXTENSIONS and not stem.endswith('_backup')
+
+    for item in inputs:
+        if os.path.isdir(item):
+            walker = os.walk(item) if recursive else [(item, [], sorted(os.listdir(item)))]
+            for root, dirs, names in walker:
+                dirs.sort()
+                for name in sorted(names):
+                    if is_image(name) and os.path.isfile(os.path.join(root, name)):
+                        add(os.path.join(root, name))
+        elif glob.has_magic(item):
+            matches = [path for path in sorted(glob.glob(item, recursive=True))
+                       if is_image(os.path.basename(path)) and os.path.isfile(path)]
+            if not matches:
+                missing.append(item)
+            for path in matches:
+                add(path)
+        elif os.path.isfile(item):
+            add(item)
+        else:
+            missing.append(item)
+    return files, missing
+
+def _process_file_in_batch(image_path, band_rows, use_stats=False, log_level=None):
+    """
+    批处理中处理一个文件（也在子进程中运行），捕获该文件的全部输出，由主进程整体打印
+
+    Returns:
+        dict: {'input', 'status': 'ok'/'failed', 'output', 'alpha_min', 'alpha_max', 'ratio', 'seconds', 'error', 'log'}
+    """
+    if log_level is not None:
+        texture_log.configure(log_level)
+    log = io.StringIO()
+    start = time.perf_counter()
+    record = {'input': image_path, 'status': 'failed', 'output': None,
+              'alpha_min': None, 'alpha_max': None, 'ratio': None, 'error': None}
+    with contextlib.redirect_stdout(log):
+        print(f"处理: {image_path}")
+        try:
+            record.update(process_alpha_channel(image_path, band_rows=band_rows, use_stats=use_stats))
+            record['status'] = 'ok'
+        except Exception as e:
+            record['error'] = str(e)
+            print(f"错误: {e}")
+    record['seconds'] = time.perf_counter() - start
+    record['log'] = log.getvalue()
+    return record
+
+def process_alpha_batch(image_paths, jobs=1, band_rows=None, use_stats=False):
+    """
+    批量处理多个图像（原地覆盖并备份），jobs大于1时分发到进程池并行处理，
+    避免每个文件都启动一次Python并重新导入cv2和numpy
+
+    Args:
+        image_paths (list): 图像文件列表
+        jobs (int): 并行进程数，1表示在当前进程中串行处理
+        band_rows (int): 按行带处理的行数，None表示整幅处理
+        use_stats (bool): 是否查询统计索引中的Alpha范围
+
+    Returns:
+        list: 与image_paths顺序一致的处理记录
+    """
+    records = [None] * len(image_paths)
+    with texture_log.ProgressLine(len(image_paths), label='处理进度') as progress:
+        if jobs <= 1 or len(image_paths) <= 1:
+            for index, image_path in enumerate(image_paths):
+                records[index] = _process_file_in_batch(image_path, band_rows, use_stats)
+                texture_log.echo(records[index].pop('log'))
+                progress.update(index + 1, os.path.basename(image_path))
+        else:
+            log_level = texture_log.console_level()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {executor.submit(_process_file_in_batch, image_path, band_rows, use_stats,
+                                           log_level): index
+                           for index, image_path in enumerate(image_paths)}
+                for finished, future in enumerate(as_completed(futures), 1):
+                    index = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        record = {'input': image_paths[index], 'status': 'failed', 'output': None,
+                                  'alpha_min': None, 'alpha_max': None, 'ratio': None, 'seconds': 0.0,
+                                  'error': f"子进程异常退出: {e}", 'log': ''}
+                    texture_log.echo(record.pop('log'))
+                    progress.update(finished, os.path.basename(record['input']))
+                    records[index] = record
+    return records
+
+def write_csv_summary(records, csv_path):
+    """
+    把批处理记录写为CSV汇总：每个文件的Alpha最小/最大值（0-1）和应用的比率
+
+    Args:
+        records (list): process_alpha_batch返回的记录
+        csv_path (str): CSV文件路径
+    """
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['input', 'status', 'alpha_min', 'alpha_max', 'ratio', 'output', 'seconds', 'error'])
+        for record in records:
+            writer.writerow([
+                record['input'], record['status'],
+                '' if record['alpha_min'] is None else f"{record['alpha_min']:.6f}",
+                '' if record['alpha_max'] is None else f"{record['alpha_max']:.6f}",
+                '' if record['ratio'] is None else f"{record['ratio']:.6f}",
+                record['output'] or '', f"{record['seconds']:.4f}", record['error'] or '',
+            ])
 
 def select_file_gui():
     """
@@ -294,20 +634,61 @@ def select_file_gui():
     return file_path if file_path else None
 
 def main():
-    parser = argparse.ArgumentParser(description='处理图像的Alpha通道')
-    parser.add_argument('input', nargs='?', help='输入图像路径')
-    parser.add_argument('-o', '--output', help='输出图像路径(可选)')
+    parser = argparse.ArgumentParser(description='处理图像的Alpha通道', fromfile_prefix_chars='@')
+    parser.add_argument('input', nargs='*',
+                        help='输入图像路径；也可以是目录、通配符（如 "D:/Masks/**/*_M.tga"）或 @列表文件（每行一个输入），'
+                             '多个输入时批量原地处理')
+    parser.add_argument('-o', '--output', help='输出图像路径(可选，只用于单个文件)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='批量处理目录时包括子目录')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='批量处理的并行进程数，0表示使用全部CPU核心（默认1，串行）')
+    parser.add_argument('--csv', metavar='PATH',
+                        help='批量处理时把每个文件的Alpha最小/最大值和应用的比率写入CSV汇总')
     parser.add_argument('--no-gui', action='store_true', help='禁用GUI文件选择（使用命令行参数）')
+    parser.add_argument('--band-rows', type=int, metavar='N',
+                        help='按行带处理，每次只处理N行并直接写出，用于超大贴图（只对未压缩的32位TGA生效）')
+    parser.add_argument('--stats', action='store_true',
+                        help='从贴图目录中的通道统计索引（.texture_stats.json）读取Alpha范围，命中时不再扫描像素')
     
     args = parser.parse_args()
+    texture_log.configure()
     
     # 默认使用GUI，除非明确禁用或提供了输入文件
     use_gui_by_default = not args.no_gui and not args.input
     
+    if args.band_rows is not None and args.band_rows <= 0:
+        parser.error('--band-rows必须大于0')
+    
+    # 单个普通文件保持原来的处理方式；目录、通配符或多个输入时批量处理
+    batch = len(args.input) > 1 or any(not os.path.isfile(item) for item in args.input) or args.csv
+    if args.input and batch:
+        if args.output:
+            parser.error('批量处理时不能指定--output，图像会原地处理（原图自动备份）')
+        image_paths, missing = expand_inputs(args.input, args.recursive)
+        for item in missing:
+            print(f"输入不存在或没有匹配的文件: {item}")
+        if not image_paths:
+            print("没有找到要处理的图像")
+            exit(1)
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        print(f"批量处理 {len(image_paths)} 个图像，使用 {min(jobs, len(image_paths))} 个进程")
+        records = process_alpha_batch(image_paths, jobs, args.band_rows, args.stats)
+        failed = [record for record in records if record['status'] != 'ok']
+        if args.csv:
+            try:
+                write_csv_summary(records, args.csv)
+                print(f"汇总已保存: {args.csv}")
+            except OSError as e:
+                print(f"保存汇总失败: {args.csv}, 错误: {e}")
+        print(f"批量处理完成: 成功 {len(records) - len(failed)} 个, 失败 {len(failed)} 个")
+        for record in failed:
+            print(f"  {record['input']}: {record['error']}")
+        exit(1 if failed or missing else 0)
+    
     try:
         if args.input:
             # 处理提供的图像
-            process_alpha_channel(args.input, args.output)
+            process_alpha_channel(args.input[0], args.output, args.band_rows, args.stats)
             
         elif use_gui_by_default:
             # 使用GUI选择文件（默认行为）
@@ -325,7 +706,7 @@ def main():
                 exit(1)
                 
             print(f"已选择文件: {input_file}")
-            process_alpha_channel(input_file, args.output)
+            process_alpha_channel(input_file, args.output, args.band_rows, args.stats)
             
         else:
             # 没有提供任何输入且禁用了GUI
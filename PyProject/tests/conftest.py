@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+"""
+测试公共设置：工具脚本都放在PyProject目录下直接运行，测试时把该目录加入模块搜索路径
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
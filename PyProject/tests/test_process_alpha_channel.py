@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+process_alpha_channel_To_0_1的回归测试：Alpha查找表与原浮点变换逐像素一致
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+import tga_codec
+import process_alpha_channel_To_0_1 as alpha_tool
+
+
+# 代表性的 (最小值, 最大值)：常量、满范围、接近0.5、单边偏移和比率小于1的情况
+RANGE_PAIRS = [(0, 255), (0, 0), (255, 255), (128, 128), (127, 128), (0, 127), (128, 255),
+               (1, 254), (30, 200), (64, 65), (100, 101), (200, 250), (5, 17)]
+
+
+def _ratio(alpha_min, alpha_max):
+    with contextlib.redirect_stdout(io.StringIO()):
+        minimum, maximum = alpha_tool.alpha_value_range(None, None, None, (alpha_min, alpha_max))
+        return alpha_tool.alpha_ratio(minimum, maximum)
+
+
+def _random_bgra(seed, shape, alpha_min=0, alpha_max=255):
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, shape + (4,), dtype=np.uint8)
+    image[:, :, 3] = rng.integers(alpha_min, alpha_max + 1, shape, dtype=np.uint8)
+    return image
+
+
+@pytest.mark.parametrize('alpha_min, alpha_max', RANGE_PAIRS)
+def test_lookup_table_matches_transform(alpha_min, alpha_max):
+    ratio = _ratio(alpha_min, alpha_max)
+    levels = np.arange(256, dtype=np.uint8)
+    np.testing.assert_array_equal(alpha_tool.alpha_lookup_table(ratio), alpha_tool.transform_alpha(levels, ratio))
+
+
+@pytest.mark.parametrize('ratio', [1.0, 0.5, 3.7, np.float32(1.6)])
+def test_lookup_table_matches_transform_for_plain_ratios(ratio):
+    levels = np.arange(256, dtype=np.uint8)
+    np.testing.assert_array_equal(alpha_tool.alpha_lookup_table(ratio), alpha_tool.transform_alpha(levels, ratio))
+
+
+@pytest.mark.parametrize('alpha_min, alpha_max', RANGE_PAIRS)
+def test_apply_contiguous_and_strided(alpha_min, alpha_max):
+    ratio = _ratio(alpha_min, alpha_max)
+    lut = alpha_tool.alpha_lookup_table(ratio)
+    image = _random_bgra(alpha_min * 256 + alpha_max, (23, 31), alpha_min, alpha_max)
+    expected = image.copy()
+    expected[:, :, 3] = alpha_tool.transform_alpha(image[:, :, 3], ratio)
+
+    # 连续存储：cv2.LUT原地处理
+    contiguous = image.copy()
+    alpha_tool.apply_alpha_lookup_table(contiguous, lut)
+    np.testing.assert_array_equal(contiguous, expected)
+
+    # 非连续视图：按索引查表
+    strided = image.copy()
+    alpha_tool.apply_alpha_lookup_table(strided[:, ::-1], lut)
+    np.testing.assert_array_equal(strided, expected)
+
+
+@pytest.mark.parametrize('band_rows', [None, 1, 7, 64])
+def test_process_alpha_channel_matches_transform(tmp_path, band_rows):
+    image = _random_bgra(9, (41, 29), 30, 200)
+    source_path = str(tmp_path / 'mask_M.tga')
+    output_path = str(tmp_path / 'mask_M_out.tga')
+    tga_codec.write_tga(source_path, image)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = alpha_tool.process_alpha_channel(source_path, output_path, band_rows)
+
+    expected = image.copy()
+    expected[:, :, 3] = alpha_tool.transform_alpha(image[:, :, 3], _ratio(30, 200))
+    np.testing.assert_array_equal(tga_codec.read_tga(output_path), expected)
+    assert result['alpha_min'] == pytest.approx(30 / 255)
+    assert result['alpha_max'] == pytest.approx(200 / 255)
+
+
+def test_alpha_value_range_skips_stats_index_by_default(monkeypatch):
+    def fail_lookup(*args, **kwargs):
+        raise AssertionError('未启用--stats时不应查询统计索引')
+
+    monkeypatch.setattr(alpha_tool.texture_stats, 'lookup', fail_lookup)
+    alpha = np.array([[30, 200], [90, 120]], dtype=np.uint8)
+    minimum, maximum = alpha_tool.alpha_value_range('mask_M.tga', alpha, alpha.shape)
+    assert (minimum, maximum) == (np.float32(30) / np.float32(255), np.float32(200) / np.float32(255))
+
+
+def test_expand_inputs_glob_skips_backups(tmp_path):
+    for name in ('a_M.tga', 'a_M_backup.tga', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+
+    files, missing = alpha_tool.expand_inputs([str(tmp_path / '*')])
+    assert files == [str(tmp_path / 'a_M.tga')]
+    assert missing == []
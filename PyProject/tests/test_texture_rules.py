@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+texture_rules的回归测试
+"""
+
+import numpy as np
+
+import tga_codec
+import texture_rules
+
+
+def _float_normal_z(r_channel, g_channel):
+    """查找表替换之前create_n_texture中的浮点公式"""
+    r_norm = r_channel.astype(np.float32) / 127.5 - 1.0
+    g_norm = g_channel.astype(np.float32) / 127.5 - 1.0
+    b_squared = 1.0 - np.square(r_norm) - np.square(g_norm)
+    b_norm = np.sqrt(np.maximum(b_squared, 0))
+    return ((b_norm + 1.0) * 127.5).astype(np.uint8)
+
+
+def _all_rg_pairs():
+    r_channel, g_channel = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8), indexing='ij')
+    return r_channel, g_channel
+
+
+def test_normal_z_lut_matches_float_formula():
+    r_channel, g_channel = _all_rg_pairs()
+    expected = _float_normal_z(r_channel, g_channel)
+    np.testing.assert_array_equal(texture_rules.get_normal_z_lut().reshape(256, 256), expected)
+
+
+def test_reconstruct_normal_z_matches_float_formula(monkeypatch):
+    # 缩小批大小，覆盖多批和最后不满一批的情况
+    monkeypatch.setattr(texture_rules, '_NORMAL_Z_BATCH_PIXELS', 1000)
+    r_channel, g_channel = _all_rg_pairs()
+    expected = _float_normal_z(r_channel, g_channel)
+    np.testing.assert_array_equal(texture_rules.reconstruct_normal_z(r_channel, g_channel), expected)
+
+    out = np.zeros((256, 256, 3), dtype=np.uint8)
+    texture_rules.reconstruct_normal_z(r_channel, g_channel, out=out[:, :, 0])
+    np.testing.assert_array_equal(out[:, :, 0], expected)
+
+
+def test_n_rule_matches_float_formula(tmp_path):
+    rng = np.random.default_rng(3)
+    nce = rng.integers(0, 256, (37, 29, 4), dtype=np.uint8)
+    nce_path = str(tmp_path / 'Gun_NCE.tga')
+    tga_codec.write_tga(nce_path, nce)
+
+    spec = texture_rules.load_rule_spec('delta_force_weapon')
+    outputs = texture_rules.render_group(spec, {'NCE': nce_path}, tga_codec.read_tga, None, 'Gun')
+    n_output = next(output for output in outputs if output['name'] == 'N')
+    assert n_output['status'] == 'written'
+
+    n_image = tga_codec.read_tga(n_output['path'])
+    np.testing.assert_array_equal(n_image[:, :, 2], nce[:, :, 2])
+    np.testing.assert_array_equal(n_image[:, :, 1], nce[:, :, 1])
+    np.testing.assert_array_equal(n_image[:, :, 0], _float_normal_z(nce[:, :, 2], nce[:, :, 1]))
+
+
+def test_render_group_reports_decodes_and_peak_source_bytes(tmp_path):
+    rng = np.random.default_rng(5)
+    sources = {}
+    for label, channels in (('C', 4), ('MRA', 3), ('NCE', 4)):
+        pixels = rng.integers(0, 256, (16, 12, channels), dtype=np.uint8)
+        sources[label] = str(tmp_path / f'Gun_{label}.tga')
+        tga_codec.write_tga(sources[label], pixels)
+
+    spec = texture_rules.load_rule_spec('delta_force_weapon')
+    report = {}
+    outputs = texture_rules.render_group(spec, sources, tga_codec.read_tga, None, 'Gun', source_report=report)
+    assert [output['status'] for output in outputs if output['name'] in ('DM', 'ORS', 'N')] == ['written'] * 3
+    # C和MRA同时用于_DM和_ORS，每张源贴图只解码一次
+    assert report['decoded'] == 3
+    assert 0 < report['peak_source_bytes'] <= 16 * 12 * (4 + 3 + 4)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+tga_codec的回归测试
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+import tga_codec
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def _write_palette_tga(file_path, indices, palette_rgb):
+    """用Pillow写一张调色板(P模式)TGA"""
+    image = Image.fromarray(indices, 'P')
+    image.putpalette(palette_rgb.ravel().tolist())
+    image.save(file_path)
+
+
+@pytest.fixture
+def palette_tga(tmp_path):
+    rng = np.random.default_rng(7)
+    indices = rng.integers(0, 16, (24, 17), dtype=np.uint8)
+    palette_rgb = rng.integers(0, 256, (256, 3), dtype=np.uint8)
+    file_path = str(tmp_path / 'Leaf_1_A.tga')
+    _write_palette_tga(file_path, indices, palette_rgb)
+    return file_path, indices, palette_rgb
+
+
+def test_read_palette_expands_colors(palette_tga):
+    file_path, indices, palette_rgb = palette_tga
+    image = tga_codec.read_tga(file_path)
+    assert image.shape == indices.shape + (3,)
+    np.testing.assert_array_equal(image, palette_rgb[indices][:, :, ::-1])
+
+
+def test_read_palette_indices_match_pillow(palette_tga):
+    file_path, indices, _ = palette_tga
+    image = tga_codec.read_tga(file_path, palette=False)
+    np.testing.assert_array_equal(image, indices)
+    np.testing.assert_array_equal(image, np.array(Image.open(file_path)))
+
+
+def test_merge_reads_palette_sources_as_indices(tmp_path):
+    """MergeTexture原来用Pillow读取，调色板图像合并的是索引值而不是颜色"""
+    import MergeTexture
+    import texture_rules
+
+    rng = np.random.default_rng(11)
+    height, width = 32, 20
+    diffuse = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    mask = rng.integers(0, 8, (height, width), dtype=np.uint8)
+    palette_rgb = rng.integers(0, 256, (256, 3), dtype=np.uint8)
+    Image.fromarray(diffuse, 'RGB').save(str(tmp_path / 'Leaf_1_D.tga'))
+    _write_palette_tga(str(tmp_path / 'Leaf_1_A.tga'), mask, palette_rgb)
+
+    spec = texture_rules.load_rule_spec(MergeTexture.DEFAULT_RULES)
+    sources = {'D': str(tmp_path / 'Leaf_1_D.tga'), 'A': str(tmp_path / 'Leaf_1_A.tga')}
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = MergeTexture.merge_texture_group('Leaf_1', sources, spec)
+    assert not result['failed']
+
+    merged = tga_codec.read_tga(str(tmp_path / 'Textures' / 'Leaf_1_DA.tga'))
+    np.testing.assert_array_equal(merged[:, :, :3], diffuse[:, :, ::-1])
+    np.testing.assert_array_equal(merged[:, :, 3], mask)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+贴图转换基准测试
+1. 用固定随机种子生成可复现的TGA测试贴图集：
+   - 枪械贴图：_C/_MRA/_NCE/_UniqueMask（三角洲枪械贴图通道转换）
+   - 植被贴图：Leaf的_D/_A/_N/_R/_S和Trunk的_D/_AO/_N/_R（MergeTexture）
+   - Alpha贴图：RGB/RGBA/L/P/LA各一张（process_alpha_channel_To_0_1）
+   尺寸从512到8K，像素模式覆盖RGB/RGBA/L/P/LA，同时包含RLE压缩和未压缩的文件
+2. 分别对convert_texture_channels、merge_texture_channels和process_alpha_channel
+   计时（整体耗时与各阶段耗时），结果写成JSON
+3. 与之前保存的JSON比较，耗时超过阈值的项目视为性能回退，退出码为1
+
+测试贴图用Pillow写出，与被测的TGA编解码实现相互独立。
+
+使用方法：
+    python texture_benchmark.py --corpus D:/bench --sizes 512,1024 --output result.json
+    python texture_benchmark.py --corpus D:/bench --output new.json --compare result.json
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+import zlib
+
+import numpy as np
+from PIL import Image
+
+import tga_codec
+import texture_profiler
+
+
+RESULT_FORMAT = 1
+CORPUS_FORMAT = 1
+CORPUS_INFO_FILE = 'corpus.json'
+
+DEFAULT_SIZES = (512, 1024, 2048, 4096, 8192)
+DEFAULT_SEED = 20240601
+DEFAULT_THRESHOLD = 0.10
+
+BENCHMARK_NAMES = ('convert', 'merge', 'alpha')
+
+# 每种尺寸生成两组变体：变体0为未压缩，变体1为RLE压缩，两组变体的像素模式互相补充
+VARIANT_MODES = (
+    {
+        'C': 'RGBA', 'MRA': 'RGB', 'NCE': 'RGBA', 'UniqueMask': 'RGBA',
+        'D': 'RGB', 'A': 'L', 'N': 'RGB', 'R': 'L', 'S': 'L', 'AO': 'L',
+    },
+    {
+        'C': 'RGB', 'MRA': 'P', 'NCE': 'LA', 'UniqueMask': 'L',
+        'D': 'RGBA', 'A': 'P', 'N': 'RGB', 'R': 'LA', 'S': 'P', 'AO': 'RGB',
+    },
+)
+
+ALPHA_MODES = ('RGBA', 'LA', 'RGB', 'L', 'P')
+
+LEAF_SUFFIXES = ('D', 'A', 'N', 'R', 'S')
+TRUNK_SUFFIXES = ('D', 'AO', 'N', 'R')
+WEAPON_SUFFIXES = ('C', 'MRA', 'NCE', 'UniqueMask')
+
+
+def _synthetic_plane(rng, size, offset):
+    """
+    生成一个uint8通道：平滑渐变加少量噪声，上方八分之一为常量区域（使RLE压缩有效果）
+    """
+    y = np.arange(size, dtype=np.uint32)[:, None]
+    x = np.arange(size, dtype=np.uint32)[None, :]
+    plane = ((x * 255 // size + y * 127 // size + offset) & 0xFF).astype(np.uint8)
+    plane += rng.integers(0, 24, (size, size), dtype=np.uint8)
+    plane[:size // 8] = offset & 0xFF
+    return plane
+
+
+def synthetic_image(name, size, mode, seed=DEFAULT_SEED):
+    """
+    按名称、尺寸和模式生成确定性的测试图像
+
+    Args:
+        name (str): 图像名称（参与随机种子，不同文件内容不同）
+        size (int): 边长
+        mode (str): Pillow像素模式，RGB/RGBA/L/P/LA
+        seed (int): 随机种子
+
+    Returns:
+        PIL.Image.Image: 测试图像
+    """
+    rng = np.random.default_rng([seed, zlib.crc32(name.encode('utf-8'))])
+    if mode == 'P':
+        image = Image.fromarray(_synthetic_plane(rng, size, 0), 'L').convert('P')
+        palette = rng.integers(0, 256, 768, dtype=np.uint8)
+        image.putpalette(palette.tobytes())
+        return image
+
+    channel_count = {'L': 1, 'LA': 2, 'RGB': 3, 'RGBA': 4}[mode]
+    planes = [_synthetic_plane(rng, size, 61 * index) for index in range(channel_count)]
+    if channel_count == 1:
+        return Image.fromarray(planes[0], 'L')
+    return Image.fromarray(np.dstack(planes), mode)
+
+
+def _write_image(image, file_path, rle):
+    image.save(file_path, format='TGA', compression='tga_rle' if rle else None)
+    return os.path.getsize(file_path)
+
+
+def generate_corpus(corpus_directory, sizes=DEFAULT_SIZES, seed=DEFAULT_SEED):
+    """
+    生成测试贴图集；目录中已有相同参数生成的贴图集时直接复用
+
+    Args:
+        corpus_directory (str): 输出目录
+        sizes (tuple): 贴图边长列表
+        seed (int): 随机种子
+
+    Returns:
+        dict: 贴图集信息 {'format', 'seed', 'sizes', 'files', 'bytes', 'directories'}
+    """
+    info_path = os.path.join(corpus_directory, CORPUS_INFO_FILE)
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if info.get('format') == CORPUS_FORMAT and info.get('seed') == seed and info.get('sizes') == list(sizes):
+            print(f"复用已有的测试贴图集: {corpus_directory} ({info['files']} 个文件)")
+            return info
+    except (OSError, ValueError):
+        pass
+
+    directories = {name: os.path.join(corpus_directory, name) for name in BENCHMARK_NAMES}
+    for directory in directories.values():
+        shutil.rmtree(directory, ignore_errors=True)
+
+    file_count = 0
+    total_bytes = 0
+    for size in sizes:
+        print(f"正在生成 {size}x{size} 测试贴图...")
+        for variant, modes in enumerate(VARIANT_MODES):
+            rle = variant == 1
+            jobs = [('convert', f"gun_{size}_{variant}", WEAPON_SUFFIXES),
+                    ('merge', f"Leaf_{size}_{variant}", LEAF_SUFFIXES),
+                    ('merge', f"Trunk_{size}_{variant}", TRUNK_SUFFIXES)]
+            for benchmark, base_name, suffixes in jobs:
+                directory = os.path.join(directories[benchmark], str(size))
+                os.makedirs(directory, exist_ok=True)
+                for suffix in suffixes:
+                    name = f"{base_name}_{suffix}"
+                    image = synthetic_image(name, size, modes[suffix], seed)
+                    total_bytes += _write_image(image, os.path.join(directory, name + '.tga'), rle)
+                    file_count += 1
+
+        directory = os.path.join(directories['alpha'], str(size))
+        os.makedirs(directory, exist_ok=True)
+        for index, mode in enumerate(ALPHA_MODES):
+            rle = index % 2 == 1
+            name = f"alpha_{size}_{mode}_{'rle' if rle else 'raw'}"
+            image = synthetic_image(name, size, mode, seed)
+            total_bytes += _write_image(image, os.path.join(directory, name + '.tga'), rle)
+            file_count += 1
+
+    info = {
+        'format': CORPUS_FORMAT,
+        'seed': seed,
+        'sizes': list(sizes),
+        'files': file_count,
+        'bytes': total_bytes,
+        'directories': {name: os.path.relpath(path, corpus_directory) for name, path in directories.items()},
+    }
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    print(f"测试贴图集已生成: {file_count} 个文件, {total_bytes / (1024 * 1024):.1f} MB")
+    return info
+
+
+def _list_tga_files(directory):
+    file_paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d != 'Textures')
+        file_paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith('.tga'))
+    return file_paths
+
+
+def _measure_image(args, image):
+    return image.nbytes, image.shape[0] * image.shape[1]
+
+
+def _measure_saved(args, result):
+    image = args[0]
+    return image.nbytes, image.shape[0] * image.shape[1]
+
+
+def _measure_composed(args, result):
+    channels, height, width = args[1:4]
+    return height * width * len(channels), height * width
+
+
+@contextlib.contextmanager
+def _profiled_functions(module, stages):
+    """
+    在with块内把模块中的函数替换为带阶段统计的版本
+
+    Args:
+        module (module): 被测模块
+        stages (dict): 函数名 -> (阶段名称, measure函数)
+    """
+    originals = {name: getattr(module, name) for name in stages}
+    try:
+        for name, (stage, measure) in stages.items():
+            setattr(module, name, texture_profiler.profiled(stage, measure)(originals[name]))
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+def _run_convert(corpus_directory, jobs):
+    converter = importlib.import_module('三角洲枪械贴图通道转换')
+    converter.convert_texture_channels(os.path.join(corpus_directory, 'convert'), jobs, force=True)
+
+
+def _run_merge(corpus_directory, jobs):
+    merge_texture = importlib.import_module('MergeTexture')
+    directory = os.path.join(corpus_directory, 'merge')
+    # 合并时输出由各源通道合成即写出，没有单独的保存函数，保存阶段统计write_tga_channels（包含通道交错与编码）
+    with _profiled_functions(merge_texture, {'load_tga_image': ('load', _measure_image)}), \
+            _profiled_functions(tga_codec, {'write_tga_channels': ('save', _measure_composed)}):
+        groups = merge_texture.group_files_by_name(_list_tga_files(directory))
+        merge_texture.merge_texture_channels(merge_texture.identify_leaf_textures(groups))
+
+
+def _run_alpha(corpus_directory, jobs):
+    alpha_module = importlib.import_module('process_alpha_channel_To_0_1')
+    source_directory = os.path.join(corpus_directory, 'alpha')
+    work_directory = os.path.join(corpus_directory, 'alpha_work')
+    shutil.rmtree(work_directory, ignore_errors=True)
+    os.makedirs(work_directory)
+    stages = {
+        'create_backup': ('backup', None),
+        'load_image_with_fallback': ('load', _measure_image),
+        'save_image_tga': ('save', _measure_saved),
+    }
+    try:
+        with _profiled_functions(alpha_module, stages):
+            for file_path in _list_tga_files(source_directory):
+                work_path = os.path.join(work_directory, os.path.basename(file_path))
+                shutil.copyfile(file_path, work_path)
+                alpha_module.process_alpha_channel(work_path)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+
+BENCHMARKS = {
+    'convert': ('convert_texture_channels', _run_convert),
+    'merge': ('merge_texture_channels', _run_merge),
+    'alpha': ('process_alpha_channel', _run_alpha),
+}
+
+
+def run_benchmark(name, corpus_directory, repeat=3, jobs=1):
+    """
+    重复运行一项基准测试，屏蔽被测函数的日志输出
+
+    Args:
+        name (str): 基准测试名称，见BENCHMARKS
+        corpus_directory (str): 测试贴图集目录
+        repeat (int): 重复次数
+        jobs (int): 并行进程数（只对convert_texture_channels有效）
+
+    Returns:
+        dict: {'function', 'runs', 'best', 'median', 'stages'}，stages取最快一次运行的阶段统计
+    """
+    function_name, runner = BENCHMARKS[name]
+    profiler = texture_profiler.get_profiler()
+    runs = []
+    best_stages = None
+    for index in range(repeat):
+        profiler.reset()
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            runner(corpus_directory, jobs)
+            seconds = time.perf_counter() - start
+        if not runs or seconds < min(runs):
+            best_stages = profiler.report()['stages']
+        runs.append(seconds)
+        print(f"  {function_name} 第 {index + 1}/{repeat} 次: {seconds:.3f} 秒")
+
+    return {
+        'function': function_name,
+        'runs': [round(seconds, 4) for seconds in runs],
+        'best': round(min(runs), 4),
+        'median': round(statistics.median(runs), 4),
+        'stages': best_stages,
+    }
+
+
+def run_benchmarks(corpus_directory, names=BENCHMARK_NAMES, sizes=DEFAULT_SIZES, seed=DEFAULT_SEED,
+                   repeat=3, jobs=1):
+    """
+    生成（或复用）测试贴图集并运行基准测试
+
+    Returns:
+        dict: 可保存为JSON并用于比较的测试结果
+    """
+    corpus = generate_corpus(corpus_directory, sizes, seed)
+    results = {}
+    for name in names:
+        print(f"运行基准测试: {BENCHMARKS[name][0]}")
+        results[name] = run_benchmark(name, corpus_directory, repeat, jobs)
+
+    return {
+        'format': RESULT_FORMAT,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'corpus': {'seed': corpus['seed'], 'sizes': corpus['sizes'], 'files': corpus['files'], 'bytes': corpus['bytes']},
+        'repeat': repeat,
+        'jobs': jobs,
+        'results': results,
+        'peak_rss_mb': texture_profiler.get_profiler().report()['peak_rss_mb'],
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    比较两次基准测试结果，按最快一次的耗时计算
+
+    Args:
+        baseline (dict): 基准结果
+        current (dict): 当前结果
+        threshold (float): 耗时增加超过该比例视为性能回退
+
+    Returns:
+        list: 比较结果，每项为 {'name', 'baseline', 'current', 'change', 'regression'}
+    """
+    if baseline.get('corpus', {}).get('sizes') != current.get('corpus', {}).get('sizes') \
+            or baseline.get('corpus', {}).get('seed') != current.get('corpus', {}).get('seed'):
+        print("警告: 两次测试使用的贴图集参数不同，比较结果可能没有意义")
+    if baseline.get('jobs') != current.get('jobs'):
+        print("警告: 两次测试的并行进程数不同，多进程时各阶段耗时是所有进程的累计值")
+
+    rows = []
+    for name, result in current['results'].items():
+        base_result = baseline.get('results', {}).get(name)
+        if base_result is None:
+            continue
+        entries = [(result['function'], base_result['best'], result['best'])]
+        for stage, stats in (result.get('stages') or {}).items():
+            base_stats = (base_result.get('stages') or {}).get(stage)
+            if base_stats is not None:
+                entries.append((f"{result['function']}.{stage}", base_stats['seconds'], stats['seconds']))
+        for label, base_seconds, seconds in entries:
+            change = (seconds - base_seconds) / base_seconds if base_seconds > 0 else 0.0
+            rows.append({
+                'name': label,
+                'baseline': base_seconds,
+                'current': seconds,
+                'change': round(change, 4),
+                'regression': change > threshold,
+            })
+    return rows
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='贴图转换基准测试')
+    parser.add_argument('--corpus', required=True, help='测试贴图集目录（不存在时自动生成）')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='贴图边长，逗号分隔（默认512到8192）')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--only', default=','.join(BENCHMARK_NAMES),
+                        help=f"要运行的测试，逗号分隔，可选 {','.join(BENCHMARK_NAMES)}")
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试的重复次数（默认3）')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='convert_texture_channels的并行进程数')
+    parser.add_argument('-o', '--output', help='测试结果JSON输出路径')
+    parser.add_argument('--compare', metavar='BASELINE', help='与之前保存的测试结果JSON比较')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'耗时增加超过该比例视为性能回退（默认{DEFAULT_THRESHOLD}）')
+    args = parser.parse_args()
+
+    sizes = tuple(int(size) for size in args.sizes.split(',') if size.strip())
+    names = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的测试: {', '.join(unknown)}")
+
+    # 被测脚本通过模块名导入
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    result = run_benchmarks(args.corpus, names, sizes, args.seed, max(1, args.repeat), args.jobs)
+
+    for name, entry in result['results'].items():
+        print(f"{entry['function']}: 最快 {entry['best']:.3f} 秒, 中位数 {entry['median']:.3f} 秒")
+        for stage, stats in (entry['stages'] or {}).items():
+            print(f"  {stage}: {stats['seconds']:.3f} 秒, {stats['calls']} 次, "
+                  f"{stats['megapixels_per_s'] or 0:.1f} 百万像素/秒")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"测试结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, result, args.threshold)
+        regressions = [row for row in rows if row['regression']]
+        print(f"\n与基准结果比较 ({args.compare}):")
+        for row in rows:
+            mark = '  <-- 性能回退' if row['regression'] else ''
+            print(f"  {row['name']}: {row['baseline']:.3f} -> {row['current']:.3f} 秒 ({row['change']:+.1%}){mark}")
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回退（阈值 {args.threshold:.0%}）")
+            sys.exit(1)
+        print("没有发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+贴图目录索引
+基于os.scandir一次遍历目录树，按名称后缀把贴图文件分到各自的组中，
+同时为每个目录建立 文件名(不含扩展名) -> 文件名 的字典，
+使备用匹配（例如不带下划线的UniqueMask）成为O(1)的字典查找，而不是反复扫描整个文件列表。
+
+目录的遍历顺序与os.walk(topdown=True)一致，不进入符号链接指向的目录。
+"""
+
+import os
+
+
+def classify_texture_name(file_name, suffixes, extensions):
+    """
+    根据文件名后缀确定所属的组和通道标签
+
+    Args:
+        file_name (str): 文件名
+        suffixes (dict): 名称后缀 -> 标签，按顺序匹配，例如 {'_C': 'C', '_MRA': 'MRA'}
+        extensions (tuple): 允许的扩展名（小写）
+
+    Returns:
+        tuple: (基础名称, 标签)，不匹配时返回None
+    """
+    stem, ext = os.path.splitext(file_name)
+    if ext.lower() not in extensions:
+        return None
+    for suffix, label in suffixes.items():
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)], label
+    return None
+
+
+def _scan_directory(path):
+    """
+    列出一个目录中的文件名和子目录路径，无法访问的目录返回空结果（与os.walk一致）
+    """
+    file_names = []
+    sub_directories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir()
+                except OSError:
+                    is_directory = False
+                if is_directory:
+                    if not entry.is_symlink():
+                        sub_directories.append(entry.path)
+                else:
+                    file_names.append(entry.name)
+    except OSError:
+        pass
+    return file_names, sub_directories
+
+
+def iter_texture_directories(base_directory, suffixes, extensions=('.tga',)):
+    """
+    单次遍历目录树，逐个目录产出分组结果
+
+    Args:
+        base_directory (str): 基础目录
+        suffixes (dict): 名称后缀 -> 标签，按顺序匹配
+        extensions (tuple): 参与分组的扩展名（小写）
+
+    Yields:
+        dict: 目录索引
+            root (str): 目录路径
+            groups (dict): 基础名称 -> {标签: 文件路径}，按文件出现顺序排列
+            stems (dict): 文件名(不含扩展名) -> 文件名，包含目录中的所有文件
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    pending = [base_directory]
+    while pending:
+        root = pending.pop()
+        file_names, sub_directories = _scan_directory(root)
+        yield _index_files(root, file_names, suffixes, extensions)
+
+        # 倒序压栈，保证按目录列出的顺序深度优先遍历
+        pending.extend(reversed(sub_directories))
+
+
+def index_directory(directory, suffixes, extensions=('.tga',)):
+    """
+    只为一个目录建立索引（不递归），例如监视模式中只重新扫描发生变化的目录
+
+    Returns:
+        dict: 与iter_texture_directories产出的目录索引相同
+    """
+    file_names, _ = _scan_directory(directory)
+    return _index_files(directory, file_names, suffixes, tuple(ext.lower() for ext in extensions))
+
+
+def _index_files(root, file_names, suffixes, extensions):
+    groups = {}
+    stems = {}
+    for file_name in file_names:
+        stems.setdefault(os.path.splitext(file_name)[0], file_name)
+        classified = classify_texture_name(file_name, suffixes, extensions)
+        if classified is None:
+            continue
+        base_key, label = classified
+        groups.setdefault(base_key, {})[label] = os.path.join(root, file_name)
+    return {'root': root, 'groups': groups, 'stems': stems}
+
+
+def find_by_stem(directory_index, stem):
+    """
+    在目录索引中按文件名(不含扩展名)查找文件
+
+    Args:
+        directory_index (dict): iter_texture_directories产出的目录索引
+        stem (str): 不含扩展名的文件名
+
+    Returns:
+        str: 文件路径，不存在时返回None
+    """
+    file_name = directory_index['stems'].get(stem)
+    if file_name is None:
+        return None
+    return os.path.join(directory_index['root'], file_name)
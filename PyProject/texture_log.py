@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+贴图处理日志
+在标准logging之上提供：
+- 分级控制台输出：每张贴图的读取、保存和每个输出的细节为DEBUG，每个贴图组一条INFO汇总，失败为WARNING
+- 单行进度条：终端中原地刷新完成数、每秒处理数和预计剩余时间；输出被重定向时每隔一段时间输出一行
+- 结构化记录：每个贴图组一条JSON记录，可以追加写入JSON Lines文件
+
+控制台输出总是写到当前的sys.stdout，因此contextlib.redirect_stdout（子进程捕获日志、
+--headless把日志转到stderr）对日志同样有效。
+"""
+
+import json
+import logging
+import sys
+import time
+import unicodedata
+
+
+LOGGER_NAME = 'texture'
+
+# 终端中进度条的最短刷新间隔（秒）
+PROGRESS_REFRESH_INTERVAL = 0.2
+
+# 输出不是终端时输出进度行的间隔（秒）
+PROGRESS_LOG_INTERVAL = 10.0
+
+_installed_handlers = []
+_active_progress = None
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """
+    写到当前sys.stdout的日志处理器，输出前擦除进度条，输出后重新绘制
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+    def emit(self, record):
+        progress = _active_progress
+        if progress is not None:
+            progress.clear()
+        super().emit(record)
+        if progress is not None:
+            progress.redraw()
+
+
+class _GroupRecordFormatter(logging.Formatter):
+    """
+    把贴图组记录格式化为一行JSON
+    """
+
+    def format(self, record):
+        return json.dumps(record.group_record, ensure_ascii=False)
+
+
+def configure(level=logging.INFO, json_path=None):
+    """
+    配置贴图处理日志，重复调用时替换之前的配置
+
+    Args:
+        level (int): 控制台日志级别
+        json_path (str): 贴图组结构化记录的JSON Lines文件路径（追加写入），None表示不写
+
+    Returns:
+        logging.Logger: 根日志器
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in _installed_handlers:
+        logger.removeHandler(handler)
+        handler.close()
+    _installed_handlers.clear()
+
+    console = _ConsoleHandler()
+    console.setLevel(level)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    _installed_handlers.append(console)
+
+    if json_path:
+        records = logging.FileHandler(json_path, mode='a', encoding='utf-8')
+        records.setLevel(logging.INFO)
+        records.addFilter(lambda record: hasattr(record, 'group_record'))
+        records.setFormatter(_GroupRecordFormatter())
+        _installed_handlers.append(records)
+
+    for handler in _installed_handlers:
+        logger.addHandler(handler)
+    logger.setLevel(min(level, logging.INFO) if json_path else level)
+    logger.propagate = False
+    return logger
+
+
+def console_level():
+    """
+    当前控制台日志级别（用于传给子进程），尚未配置时返回None
+    """
+    for handler in _installed_handlers:
+        if isinstance(handler, _ConsoleHandler):
+            return handler.level
+    return None
+
+
+def get_logger(name=None):
+    """
+    获取贴图处理日志器
+
+    Args:
+        name (str): 子日志器名称，例如'rules'
+    """
+    return logging.getLogger(LOGGER_NAME if not name else f"{LOGGER_NAME}.{name}")
+
+
+def echo(text):
+    """
+    原样输出一段已经格式化的日志文本（例如子进程捕获的日志），不打断进度条
+    """
+    if not text:
+        return
+    progress = _active_progress
+    if progress is not None:
+        progress.clear()
+    sys.stdout.write(text if text.endswith('\n') else text + '\n')
+    sys.stdout.flush()
+    if progress is not None:
+        progress.redraw()
+
+
+def log_group(logger, record):
+    """
+    输出一个贴图组的结构化记录：控制台一行INFO摘要，JSON Lines文件一行完整记录
+
+    Args:
+        logger (logging.Logger): 日志器
+        record (dict): 贴图组记录，至少包含group、status、generated、failed、seconds
+    """
+    status = '完成处理' if record['status'] == 'ok' else '处理失败'
+    message = (f"{status}: {record['group']} 生成 {len(record['generated'])} 个, "
+               f"失败 {len(record['failed'])} 个, 耗时 {record['seconds']:.2f}秒")
+    logger.log(logging.INFO if record['status'] == 'ok' else logging.WARNING, message,
+               extra={'group_record': record})
+
+
+def _display_width(text):
+    """终端中的显示宽度，中文等全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressLine:
+    """
+    单行进度条：完成数/总数、百分比、每秒处理数和预计剩余时间
+
+    用法：
+        with ProgressLine(total) as progress:
+            for ...:
+                progress.update(done, note)
+    """
+
+    def __init__(self, total, label='处理进度', enabled=True):
+        self.total = total
+        self.label = label
+        self.enabled = enabled and total > 0
+        self.stream = sys.stdout
+        self.interactive = self.stream.isatty() if hasattr(self.stream, 'isatty') else False
+        self.done = 0
+        self.note = ''
+        self.started = time.perf_counter()
+        self._last_output = 0.0
+        self._width = 0
+
+    def __enter__(self):
+        global _active_progress
+        if self.enabled and self.interactive:
+            _active_progress = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def text(self):
+        """
+        当前进度文本
+        """
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else None
+        eta = _format_duration(remaining) if remaining is not None else '--:--'
+        text = (f"{self.label}: {self.done}/{self.total} ({int(self.done / self.total * 100)}%) "
+                f"{rate:.2f} 组/秒 剩余 {eta}")
+        return f"{text} {self.note}" if self.note else text
+
+    def update(self, done, note=''):
+        """
+        更新完成数
+
+        Args:
+            done (int): 已完成数
+            note (str): 附加说明，例如最近完成的贴图组
+        """
+        self.done = done
+        self.note = note
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        finished = done >= self.total
+        if self.interactive:
+            if finished or now - self._last_output >= PROGRESS_REFRESH_INTERVAL:
+                self._last_output = now
+                self.redraw()
+        elif finished or now - self._last_output >= PROGRESS_LOG_INTERVAL:
+            self._last_output = now
+            self.stream.write(self.text() + '\n')
+            self.stream.flush()
+
+    def clear(self):
+        """
+        擦除终端中的进度条
+        """
+        if self._width:
+            self.stream.write('\r' + ' ' * self._width + '\r')
+            self._width = 0
+
+    def redraw(self):
+        """
+        在终端中重新绘制进度条
+        """
+        if not (self.enabled and self.interactive):
+            return
+        text = self.text()
+        width = _display_width(text)
+        self.stream.write('\r' + text + ' ' * max(0, self._width - width))
+        self.stream.flush()
+        self._width = width
+
+    def close(self):
+        """
+        结束进度条，终端中保留最后一次的进度
+        """
+        global _active_progress
+        if _active_progress is self:
+            _active_progress = None
+        if self.enabled and self.interactive and self._width:
+            self.stream.write('\n')
+            self.stream.flush()
+            self._width = 0
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+增量构建清单
+按根目录保存一份JSON清单，记录每个贴图组的输入文件（修改时间、大小、哈希）、
+生成的输出文件以及转换器版本。再次运行时，输入和输出都未变化的组可以跳过，
+与make的增量构建方式相同。
+
+判断规则：
+1. 转换器版本不同 -> 需要重新生成
+2. 输入文件集合变化、文件缺失 -> 需要重新生成
+3. 输入文件大小和修改时间一致 -> 未变化；仅修改时间变化时比较内容哈希
+4. 记录的输出文件缺失或被外部修改 -> 需要重新生成
+
+清单只在运行结束时写回。长时间运行期间，每完成一个组就把它的清单记录追加到构建日志
+（.texture_journal.jsonl），日志按批次fsync。运行中断后使用恢复模式，
+先把日志中的记录合并进清单，再按上面的规则校验（输出文件缺失或被修改的组仍会重新生成）。
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import texture_log
+
+
+MANIFEST_FILE_NAME = '.texture_manifest.json'
+MANIFEST_FORMAT = 1
+
+JOURNAL_FILE_NAME = '.texture_journal.jsonl'
+
+# 构建日志每追加这么多条记录或经过这么多秒fsync一次
+JOURNAL_SYNC_RECORDS = 16
+JOURNAL_SYNC_SECONDS = 5.0
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+logger = texture_log.get_logger('manifest')
+
+
+def file_digest(file_path):
+    """
+    计算文件内容的SHA-1哈希
+
+    Args:
+        file_path (str): 文件路径
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_entry(file_path):
+    stat = os.stat(file_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+class BuildManifest:
+    """
+    一个根目录的增量构建清单
+
+    清单中的路径都保存为相对根目录的路径，整个目录树移动后清单仍然有效。
+    """
+
+    def __init__(self, root_directory, version, file_name=MANIFEST_FILE_NAME):
+        """
+        Args:
+            root_directory (str): 清单所属的根目录
+            version (str): 转换器版本，版本变化时所有组都需要重新生成
+            file_name (str): 清单文件名
+        """
+        self.root_directory = os.path.abspath(root_directory)
+        self.version = str(version)
+        self.path = os.path.join(self.root_directory, file_name)
+        self.groups = {}
+        self.dirty = False
+
+    def load(self):
+        """
+        读取清单文件，文件不存在或损坏时从空清单开始
+
+        Returns:
+            BuildManifest: self
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == MANIFEST_FORMAT:
+                self.groups = data.get('groups', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取构建清单失败，将全部重新生成: {self.path}, 错误: {str(e)}")
+            self.groups = {}
+        return self
+
+    def save(self):
+        """
+        原子地写回清单文件（先写临时文件再替换）
+        """
+        if not self.dirty:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': MANIFEST_FORMAT, 'groups': self.groups}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def _relative(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), self.root_directory).replace(os.sep, '/')
+
+    def _absolute(self, relative_path):
+        return os.path.join(self.root_directory, relative_path.replace('/', os.sep))
+
+    def check(self, group_key, input_paths):
+        """
+        检查一个组是否需要重新生成
+
+        Args:
+            group_key (str): 组的唯一标识
+            input_paths (list): 组的全部输入文件路径
+
+        Returns:
+            str: 需要重新生成的原因，已是最新时返回None
+        """
+        entry = self.groups.get(group_key)
+        if entry is None:
+            return "没有构建记录"
+        if entry.get('version') != self.version:
+            return f"转换器版本变化 ({entry.get('version')} -> {self.version})"
+
+        recorded_inputs = entry.get('inputs', {})
+        current_inputs = {self._relative(path): path for path in input_paths}
+        if set(recorded_inputs) != set(current_inputs):
+            return "输入文件集合变化"
+
+        for relative_path, file_path in current_inputs.items():
+            recorded = recorded_inputs[relative_path]
+            try:
+                current = _stat_entry(file_path)
+            except OSError:
+                return f"输入文件缺失: {relative_path}"
+            if current['size'] != recorded['size']:
+                return f"输入文件已修改: {relative_path}"
+            if current['mtime_ns'] != recorded['mtime_ns']:
+                # 修改时间变化但内容可能相同（例如版本库更新），比较哈希
+                if file_digest(file_path) != recorded.get('sha1'):
+                    return f"输入文件已修改: {relative_path}"
+                recorded['mtime_ns'] = current['mtime_ns']
+                self.dirty = True
+
+        for relative_path, recorded in entry.get('outputs', {}).items():
+            try:
+                current = _stat_entry(self._absolute(relative_path))
+            except OSError:
+                return f"输出文件缺失: {relative_path}"
+            if current != recorded:
+                return f"输出文件被外部修改: {relative_path}"
+
+        return None
+
+    def record(self, group_key, input_paths, output_paths):
+        """
+        记录一个组成功生成后的输入与输出状态
+
+        Args:
+            group_key (str): 组的唯一标识
+            input_paths (list): 组的全部输入文件路径
+            output_paths (list): 本次生成的输出文件路径
+        """
+        inputs = {}
+        for file_path in input_paths:
+            entry = _stat_entry(file_path)
+            entry['sha1'] = file_digest(file_path)
+            inputs[self._relative(file_path)] = entry
+        outputs = {self._relative(file_path): _stat_entry(file_path) for file_path in output_paths}
+        self.groups[group_key] = {'version': self.version, 'inputs': inputs, 'outputs': outputs}
+        self.dirty = True
+
+    def forget(self, group_key):
+        """
+        删除一个组的记录（例如生成失败时），下次运行会重新生成
+        """
+        if self.groups.pop(group_key, None) is not None:
+            self.dirty = True
+
+    def merge(self, groups):
+        """
+        合并其他来源（例如构建日志）中的组记录
+
+        Args:
+            groups (dict): 组标识 -> 组记录
+        """
+        if groups:
+            self.groups.update(groups)
+            self.dirty = True
+
+
+class BuildJournal:
+    """
+    只追加的构建日志：每行一条完成的组记录（与清单中的记录格式相同）
+
+    每条记录写入后立即flush到操作系统，进程崩溃不会丢失；
+    fsync按批次进行，断电时最多丢失最后一批记录，对应的组会在恢复时重新生成。
+    """
+
+    def __init__(self, root_directory, version, file_name=JOURNAL_FILE_NAME,
+                 sync_records=JOURNAL_SYNC_RECORDS, sync_seconds=JOURNAL_SYNC_SECONDS):
+        """
+        Args:
+            root_directory (str): 日志所属的根目录
+            version (str): 转换器版本，版本不同的日志在恢复时被忽略
+            file_name (str): 日志文件名
+            sync_records (int): 每追加多少条记录fsync一次
+            sync_seconds (float): 距上次fsync超过多少秒时fsync
+        """
+        self.path = os.path.join(os.path.abspath(root_directory), file_name)
+        self.version = str(version)
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def replay(self):
+        """
+        读取已有日志中的组记录，忽略版本不同的日志和中断时写了一半的最后一行
+
+        Returns:
+            dict: 组标识 -> 组记录
+        """
+        groups = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return groups
+        except OSError as e:
+            logger.warning(f"读取构建日志失败: {self.path}, 错误: {str(e)}")
+            return groups
+
+        for number, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                if number < len(lines) - 1:
+                    logger.warning(f"构建日志第 {number + 1} 行损坏，已忽略")
+                continue
+            if number == 0:
+                if data.get('format') != MANIFEST_FORMAT or data.get('version') != self.version:
+                    return {}
+                continue
+            groups[data['group']] = data['entry']
+        return groups
+
+    def open(self, keep_existing=False):
+        """
+        打开日志准备追加
+
+        Args:
+            keep_existing (bool): 保留已有的日志内容（恢复模式）；否则从新的日志开始
+
+        Returns:
+            BuildJournal: self
+        """
+        if keep_existing and os.path.exists(self.path):
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # 上次中断时可能写了一半的最后一行，另起一行继续追加
+            self._file.write('\n')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'format': MANIFEST_FORMAT, 'version': self.version}) + '\n')
+        self.sync()
+        return self
+
+    def append(self, group_key, entry):
+        """
+        追加一条完成的组记录
+
+        Args:
+            group_key (str): 组的唯一标识
+            entry (dict): 清单中该组的记录
+        """
+        self._file.write(json.dumps({'group': group_key, 'entry': entry}, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_records or time.monotonic() - self._last_sync >= self.sync_seconds:
+            self.sync()
+
+    def sync(self):
+        """
+        把已追加的记录fsync到磁盘
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, remove=False):
+        """
+        关闭日志
+
+        Args:
+            remove (bool): 删除日志文件（运行正常结束、清单已保存时）
+        """
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+贴图处理性能统计
+按阶段（读取、各类贴图生成、保存）累计耗时、调用次数、字节数和像素数，
+按贴图组记录总耗时，并在运行结束时输出JSON或CSV报告：
+每个阶段的耗时、MB/s、百万像素/s，最慢的若干贴图组，以及进程峰值内存。
+
+阶段耗时是包含式的：生成贴图的阶段内部包含它调用的读取与保存阶段。
+统计是线程安全的，后台写出线程中的保存也会被计入；
+多进程运行时各子进程的统计通过snapshot()/merge()汇总到主进程。
+"""
+
+import contextlib
+import csv
+import functools
+import json
+import sys
+import threading
+import time
+
+
+SLOWEST_GROUP_COUNT = 20
+
+
+def peak_rss_bytes():
+    """
+    获取当前进程的峰值常驻内存
+
+    Returns:
+        int: 字节数，无法获取时返回None
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+            return counters.PeakWorkingSetSize
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux上单位是KB，macOS上是字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class StageProfiler:
+    """
+    阶段耗时与吞吐量统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有统计"""
+        with self._lock:
+            self.stages = {}
+            self.groups = {}
+            self.peak_rss = None
+            self.started = time.perf_counter()
+
+    def add(self, stage, seconds, nbytes=0, pixels=0):
+        """
+        累计一次阶段调用
+
+        Args:
+            stage (str): 阶段名称
+            seconds (float): 耗时（秒）
+            nbytes (int): 处理的字节数
+            pixels (int): 处理的像素数
+        """
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'pixels': 0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += nbytes
+            entry['pixels'] += pixels
+
+    def add_group(self, group_key, seconds):
+        """记录一个贴图组的总耗时"""
+        with self._lock:
+            self.groups[group_key] = self.groups.get(group_key, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def group(self, group_key):
+        """统计with块内处理一个贴图组的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_group(group_key, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        导出可序列化的统计数据（用于从子进程传回主进程）
+
+        Returns:
+            dict: stages、groups和peak_rss
+        """
+        with self._lock:
+            return {
+                'stages': {name: dict(entry) for name, entry in self.stages.items()},
+                'groups': dict(self.groups),
+                'peak_rss': peak_rss_bytes(),
+            }
+
+    def merge(self, snapshot):
+        """
+        合并另一个进程的统计数据
+        """
+        with self._lock:
+            for name, other in snapshot['stages'].items():
+                entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'pixels': 0})
+                for field in ('calls', 'seconds', 'bytes', 'pixels'):
+                    entry[field] += other[field]
+            for group_key, seconds in snapshot['groups'].items():
+                self.groups[group_key] = self.groups.get(group_key, 0.0) + seconds
+            if snapshot.get('peak_rss') is not None:
+                self.peak_rss = max(self.peak_rss or 0, snapshot['peak_rss'])
+
+    def report(self):
+        """
+        生成统计报告
+
+        Returns:
+            dict: 报告数据
+        """
+        with self._lock:
+            stages = {}
+            for name, entry in self.stages.items():
+                seconds = entry['seconds']
+                megabytes = entry['bytes'] / (1024 * 1024)
+                megapixels = entry['pixels'] / 1e6
+                stages[name] = {
+                    'calls': entry['calls'],
+                    'seconds': round(seconds, 4),
+                    'megabytes': round(megabytes, 3),
+                    'megapixels': round(megapixels, 3),
+                    'mb_per_s': round(megabytes / seconds, 2) if seconds > 0 and entry['bytes'] else None,
+                    'megapixels_per_s': round(megapixels / seconds, 2) if seconds > 0 and entry['pixels'] else None,
+                }
+            slowest = sorted(self.groups.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_GROUP_COUNT]
+            peak_rss = max(filter(None, [self.peak_rss, peak_rss_bytes()]), default=None)
+            return {
+                'wall_seconds': round(time.perf_counter() - self.started, 3),
+                'group_count': len(self.groups),
+                'stages': stages,
+                'slowest_groups': [{'group': key, 'seconds': round(seconds, 4)} for key, seconds in slowest],
+                'peak_rss_mb': round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+            }
+
+    def write_report(self, report_path):
+        """
+        将报告写入文件，扩展名为.csv时写CSV，否则写JSON
+
+        Args:
+            report_path (str): 报告文件路径
+        """
+        report = self.report()
+        if report_path.lower().endswith('.csv'):
+            with open(report_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'name', 'calls', 'seconds', 'megabytes', 'megapixels',
+                                 'mb_per_s', 'megapixels_per_s'])
+                for name, stage in report['stages'].items():
+                    writer.writerow(['stage', name, stage['calls'], stage['seconds'], stage['megabytes'],
+                                     stage['megapixels'], stage['mb_per_s'], stage['megapixels_per_s']])
+                for group in report['slowest_groups']:
+                    writer.writerow(['group', group['group'], '', group['seconds'], '', '', '', ''])
+                writer.writerow(['run', 'wall_seconds', '', report['wall_seconds'], '', '', '', ''])
+                writer.writerow(['run', 'peak_rss_mb', '', report['peak_rss_mb'], '', '', '', ''])
+        else:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+_default_profiler = StageProfiler()
+
+
+def get_profiler():
+    """
+    获取进程内共享的默认统计器
+    """
+    return _default_profiler
+
+
+def profiled(stage, measure=None):
+    """
+    装饰器：把函数调用计入默认统计器的指定阶段
+
+    Args:
+        stage (str): 阶段名称
+        measure (callable): measure(args, result) 返回 (字节数, 像素数)，用于计算吞吐量
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            nbytes, pixels = 0, 0
+            if measure is not None:
+                try:
+                    nbytes, pixels = measure(args, result)
+                except Exception:
+                    pass
+            _default_profiler.add(stage, seconds, nbytes, pixels)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,904 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+声明式通道打包规则
+用JSON规则文件描述 输出贴图的每个通道 <- 源贴图通道 / 常量 / 派生运算，
+由本模块统一执行，新的贴图打包约定只需要新增一个规则文件（放在packing_rules目录中）。
+
+规则文件格式：
+{
+    "format": 1,
+    "name": "规则名称",
+    "output_directory": "",                       # 输出目录，相对锚点源贴图所在目录，空字符串表示同一目录
+    "sources": {"C": "_C", "MRA": "_MRA"},        # 源标签 -> 文件名后缀，按顺序匹配
+    "fallback_stems": {"UniqueMask": "{base}UniqueMask"},   # 可选：找不到后缀文件时按文件名(不含扩展名)查找
+    "outputs": [
+        {
+            "name": "DM",
+            "suffix": "_DM",
+            "format": "BGRA",                     # 输出通道布局：BGRA、BGR或L
+            "requires": ["C", "MRA"],             # 必需的源，第一个为锚点（决定输出目录和基础名称）
+            "optional": [],                       # 可选的源，缺失时对应通道使用default
+            "name_contains": "Trunk",             # 可选：只处理组名包含该字符串的组
+            "when": {"max_above": ["NCE.A", 0.1]},   # 可选：源通道最大值（0-1）超过阈值时才生成
+            "channels": {
+                "B": {"from": "C.B"},
+                "A": {"from": "MRA.R"}
+            }
+        }
+    ]
+}
+
+通道来源：
+- {"from": "源.通道"}：通道为B、G、R或A。灰度源的B、G、R都取灰度平面；
+  源没有该通道或可选源缺失时使用"default"。
+  A通道可以额外指定 "gray": "L"（灰度源取灰度平面）和 "rgb": "mean"（三通道源取各通道均值，
+  与 np.mean(image, axis=2, dtype=np.uint8) 的结果逐位一致）。
+- {"value": 数值}：常量，整数按0-255解释，浮点数按0-1解释（int(value * 255)）。
+- {"op": "normal_z", "args": ["R", "G"]}：由输出的R、G通道派生，在源通道填充之后计算。
+
+执行方式：每个输出预先分配一块缓冲区，按源分组，连续的通道合并为一次切片复制；
+同一组中每张源贴图只解码一次，在最后一个使用它的输出完成后立即释放，
+互不依赖的输出可以并行生成，并可限制同时占用的像素数（见render_group）。
+输出前先解析文件头检查源贴图尺寸，不一致的输出在解码前直接判定失败；
+plan_group只解析文件头就能列出一个组的全部输出、尺寸和字节数，用于运行前校验和预演报告。
+合成即写出模式（render_group不提供saver或指定band_rows）下，每个输出通道的来源
+（源像素视图、常量或派生函数）交给tga_codec.write_tga_channels按行带交错后直接写出，
+不分配整幅输出数组，适合超大贴图。
+启用统计索引（texture_stats）时，when条件直接查询索引中的通道最大值；
+索引中已知为常量的源通道直接填充常量值而不复制像素，并在结果中标记出来。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import tga_codec
+import texture_log
+import texture_profiler
+import texture_stats
+
+
+SPEC_FORMAT = 1
+
+RULES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packing_rules')
+
+OUTPUT_FORMATS = {
+    'BGRA': ('B', 'G', 'R', 'A'),
+    'BGR': ('B', 'G', 'R'),
+    'L': ('L',),
+}
+
+_COLOR_INDEX = {'B': 0, 'G': 1, 'R': 2}
+
+logger = texture_log.get_logger('rules')
+
+
+class RuleSpecError(ValueError):
+    """规则文件内容无效"""
+
+
+# 法线B通道查找表，以 (R << 8) | G 为索引，首次使用时生成
+_normal_z_lut = None
+
+# 查表时每批处理的像素数，限制索引临时数组的大小
+_NORMAL_Z_BATCH_PIXELS = 1 << 20
+
+
+def get_normal_z_lut():
+    """
+    获取法线B通道查找表
+
+    R、G都是uint8，B只取决于(R, G)，因此对全部65536种组合按原浮点公式计算一次：
+    法线贴图公式: B = sqrt(1 - R^2 - G^2)，RG先归一化到[-1, 1]范围，结果转换回[0, 255]范围
+
+    Returns:
+        numpy.ndarray: 65536个uint8元素的查找表
+    """
+    global _normal_z_lut
+    if _normal_z_lut is None:
+        values = np.arange(256, dtype=np.uint8)
+        r_norm = values[:, None].astype(np.float32) / 127.5 - 1.0
+        g_norm = values[None, :].astype(np.float32) / 127.5 - 1.0
+        b_squared = 1.0 - np.square(r_norm) - np.square(g_norm)
+        b_norm = np.sqrt(np.maximum(b_squared, 0))  # 防止负数开方
+        _normal_z_lut = ((b_norm + 1.0) * 127.5).astype(np.uint8).ravel()
+    return _normal_z_lut
+
+
+def reconstruct_normal_z(r_channel, g_channel, out=None):
+    """
+    通过查表由法线的R、G通道计算B通道，分批处理，不产生整幅的浮点临时数组
+
+    Args:
+        r_channel (numpy.ndarray): (H, W)的uint8 R通道
+        g_channel (numpy.ndarray): (H, W)的uint8 G通道
+        out (numpy.ndarray): 可选的(H, W)输出视图
+
+    Returns:
+        numpy.ndarray: (H, W)的uint8 B通道
+    """
+    lut = get_normal_z_lut()
+    height, width = r_channel.shape
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+    rows_per_batch = max(1, _NORMAL_Z_BATCH_PIXELS // max(width, 1))
+    for top in range(0, height, rows_per_batch):
+        bottom = min(top + rows_per_batch, height)
+        index = r_channel[top:bottom].astype(np.uint16)
+        index <<= 8
+        index |= g_channel[top:bottom]
+        out[top:bottom] = lut[index]
+    return out
+
+
+# 派生运算：参数为输出中已填好的通道，结果写入out
+DERIVED_OPS = {
+    'normal_z': reconstruct_normal_z,
+}
+
+
+def _constant(value, where):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RuleSpecError(f"{where}: 常量必须是数值")
+    if isinstance(value, float):
+        value = int(value * 255)
+    if not 0 <= value <= 255:
+        raise RuleSpecError(f"{where}: 常量超出范围: {value}")
+    return value
+
+
+def _parse_reference(reference, where):
+    source, _, channel = reference.partition('.')
+    if not source or channel not in ('B', 'G', 'R', 'A'):
+        raise RuleSpecError(f"{where}: 无效的通道引用 '{reference}'，应为 '源.B/G/R/A'")
+    return source, channel
+
+
+def _select_channel(channel_count, channel, gray=None, rgb=None):
+    """
+    确定从源中取哪个通道
+
+    Returns:
+        int: 通道索引；'plane': 灰度平面；'mean': 各通道均值；None: 源没有该通道
+    """
+    if channel_count == 1:
+        return 'plane' if channel != 'A' or gray == 'L' else None
+    if channel != 'A':
+        return _COLOR_INDEX[channel] if channel_count >= 3 else None
+    if channel_count == 4:
+        return 3
+    if channel_count == 3 and rgb == 'mean':
+        return 'mean'
+    return None
+
+
+def _pixels_of(image):
+    return image.pixels if isinstance(image, tga_codec.LazyTgaImage) else np.asarray(image)
+
+
+def _normalize_source(image):
+    """
+    统一源贴图的通道布局：(H, W, 1)视为灰度，灰度+Alpha的两通道数组扩展为BGRA
+    """
+    pixels = _pixels_of(image)
+    if pixels.ndim == 3 and pixels.shape[2] == 1:
+        return pixels[:, :, 0]
+    if pixels.ndim == 3 and pixels.shape[2] == 2:
+        gray = pixels[:, :, 0]
+        return np.dstack((gray, gray, gray, pixels[:, :, 1]))
+    return pixels
+
+
+def _channel_count(pixels):
+    return 1 if pixels.ndim == 2 else pixels.shape[2]
+
+
+def _mean_source(pixels):
+    """各通道均值的派生来源，按行带计算"""
+    def mean(top, bottom, band):
+        return np.mean(pixels[top:bottom], axis=2, dtype=np.uint8)
+    return mean
+
+
+def _derived_source(op, arguments):
+    """派生运算的来源，参数为当前行带中已填好的输出通道"""
+    def derive(top, bottom, band):
+        return DERIVED_OPS[op](*(band[:, :, index] for index in arguments))
+    return derive
+
+
+class PackingRule:
+    """
+    一个输出贴图的打包规则
+    """
+
+    def __init__(self, data, source_labels, where):
+        self.name = data.get('name')
+        self.suffix = data.get('suffix')
+        if not self.name or not self.suffix:
+            raise RuleSpecError(f"{where}: 输出必须包含name和suffix")
+        where = f"{where} ({self.name})"
+
+        self.format = data.get('format', 'BGRA')
+        if self.format not in OUTPUT_FORMATS:
+            raise RuleSpecError(f"{where}: 不支持的输出格式 '{self.format}'")
+        self.requires = list(data.get('requires', []))
+        self.optional = list(data.get('optional', []))
+        if not self.requires:
+            raise RuleSpecError(f"{where}: requires不能为空")
+        for label in self.requires + self.optional:
+            if label not in source_labels:
+                raise RuleSpecError(f"{where}: 未定义的源 '{label}'")
+        self.name_contains = data.get('name_contains')
+
+        self.when = None
+        if 'when' in data:
+            reference, threshold = data['when']['max_above']
+            self.when = (*_parse_reference(reference, where), float(threshold))
+
+        letters = OUTPUT_FORMATS[self.format]
+        channels = data.get('channels', {})
+        unknown = set(channels) - set(letters)
+        if unknown:
+            raise RuleSpecError(f"{where}: 输出格式 {self.format} 中没有通道 {sorted(unknown)}")
+
+        # 每个输出通道：('from', 源, 通道, 选项, 默认值) / ('value', 常量) / ('op', 运算, 参数通道索引)
+        self.channels = []
+        for index, letter in enumerate(letters):
+            entry = channels.get(letter, {'value': 0})
+            channel_where = f"{where}.{letter}"
+            if 'from' in entry:
+                source, channel = _parse_reference(entry['from'], channel_where)
+                if source not in self.requires + self.optional:
+                    raise RuleSpecError(f"{channel_where}: 源 '{source}' 不在requires或optional中")
+                default = _constant(entry['default'], channel_where) if 'default' in entry else None
+                options = (entry.get('gray'), entry.get('rgb'))
+                self.channels.append(('from', source, channel, options, default))
+            elif 'value' in entry:
+                self.channels.append(('value', _constant(entry['value'], channel_where)))
+            elif 'op' in entry:
+                if entry['op'] not in DERIVED_OPS:
+                    raise RuleSpecError(f"{channel_where}: 未知的派生运算 '{entry['op']}'")
+                try:
+                    arguments = tuple(letters.index(letter_arg) for letter_arg in entry.get('args', []))
+                except ValueError:
+                    raise RuleSpecError(f"{channel_where}: 派生运算的参数必须是输出通道")
+                self.channels.append(('op', entry['op'], arguments))
+            else:
+                raise RuleSpecError(f"{channel_where}: 通道必须指定from、value或op")
+
+        self._plans = {}
+
+    @property
+    def sources(self):
+        """规则用到的全部源标签"""
+        return self.requires + self.optional
+
+    def applies_to(self, group_name, sources):
+        """
+        组中是否有全部必需的源，且组名满足过滤条件
+        """
+        if self.name_contains and self.name_contains not in (group_name or ''):
+            return False
+        return all(label in sources for label in self.requires)
+
+    def compile(self, channel_counts):
+        """
+        按各源的实际通道数编译填充计划，结果按通道数组合缓存
+
+        Args:
+            channel_counts (dict): 源标签 -> 通道数，缺失的源为None
+
+        Returns:
+            tuple: (按源分组的复制段, 常量填充列表, 派生运算列表)
+                复制段为 源 -> [(输出起始, 输出结束, 选择)]，选择为 ('slice', 源起始) / ('plane',) / ('mean',)
+        """
+        key = tuple(channel_counts.get(label) for label in self.sources)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        copies = {}
+        constants = []
+        ops = []
+        for out_index, spec in enumerate(self.channels):
+            if spec[0] == 'value':
+                constants.append((out_index, spec[1]))
+                continue
+            if spec[0] == 'op':
+                ops.append((out_index, spec[1], spec[2]))
+                continue
+
+            _, source, channel, (gray, rgb), default = spec
+            count = channel_counts.get(source)
+            selection = None if count is None else _select_channel(count, channel, gray, rgb)
+            if selection is None:
+                if default is None:
+                    raise ValueError(f"源 {source} 没有 {channel} 通道，且规则没有指定default")
+                constants.append((out_index, default))
+                continue
+
+            runs = copies.setdefault(source, [])
+            last = runs[-1] if runs else None
+            # 输出和源通道都连续时合并为一次切片复制；灰度平面连续时合并为一次广播
+            if last is not None and last[1] == out_index:
+                if selection == 'plane' and last[2] == ('plane',):
+                    runs[-1] = (last[0], out_index + 1, last[2])
+                    continue
+                if isinstance(selection, int) and last[2][0] == 'slice' \
+                        and last[2][1] + (out_index - last[0]) == selection:
+                    runs[-1] = (last[0], out_index + 1, last[2])
+                    continue
+            if selection == 'plane':
+                runs.append((out_index, out_index + 1, ('plane',)))
+            elif selection == 'mean':
+                runs.append((out_index, out_index + 1, ('mean',)))
+            else:
+                runs.append((out_index, out_index + 1, ('slice', selection)))
+
+        plan = (copies, constants, ops)
+        self._plans[key] = plan
+        return plan
+
+    def constant_channels(self, images, source_stats):
+        """
+        根据源贴图的统计信息找出取自常量源通道的输出通道
+
+        Args:
+            images (dict): 源标签 -> 已统一布局的像素数组，缺失的可选源为None
+            source_stats (dict): 源标签 -> 统计信息（texture_stats），没有统计的源可以不出现
+
+        Returns:
+            dict: 输出通道索引 -> 常量值
+        """
+        channel_counts = {label: None if image is None else _channel_count(image) for label, image in images.items()}
+        copies, constants, ops = self.compile(channel_counts)
+        values = {}
+        for source, runs in copies.items():
+            stats = source_stats.get(source)
+            if stats is None:
+                continue
+            for start, stop, selection in runs:
+                if selection[0] == 'mean':
+                    continue
+                for out_index in range(start, stop):
+                    channel = 'plane' if selection[0] == 'plane' else selection[1] + out_index - start
+                    entry = texture_stats.channel_stats(stats, channel_counts[source], channel)
+                    if entry is not None and entry['constant']:
+                        values[out_index] = entry['min']
+        return values
+
+    def render(self, images, height, width, constant_fill=None):
+        """
+        按规则生成输出图像
+
+        Args:
+            images (dict): 源标签 -> 已统一布局的像素数组，缺失的可选源为None
+            height (int): 高度
+            width (int): 宽度
+            constant_fill (dict): 已知为常量的输出通道索引 -> 值，这些通道直接填充而不复制源像素
+
+        Returns:
+            numpy.ndarray: 输出图像，BGRA/BGR为(H, W, C)，L为(H, W)
+        """
+        channel_counts = {label: None if image is None else _channel_count(image) for label, image in images.items()}
+        copies, constants, ops = self.compile(channel_counts)
+        constant_fill = constant_fill or {}
+
+        channel_total = len(OUTPUT_FORMATS[self.format])
+        output = np.empty((height, width, channel_total), dtype=np.uint8)
+
+        for source, runs in copies.items():
+            pixels = images[source]
+            for start, stop, selection in runs:
+                if all(out_index in constant_fill for out_index in range(start, stop)):
+                    for out_index in range(start, stop):
+                        output[:, :, out_index] = constant_fill[out_index]
+                elif selection[0] == 'slice':
+                    offset = selection[1]
+                    output[:, :, start:stop] = pixels[:, :, offset:offset + stop - start]
+                elif selection[0] == 'plane':
+                    output[:, :, start:stop] = pixels[:, :, None]
+                else:
+                    output[:, :, start] = np.mean(pixels, axis=2, dtype=np.uint8)
+
+        for out_index, value in constants:
+            output[:, :, out_index] = value
+
+        for out_index, op, arguments in ops:
+            DERIVED_OPS[op](*(output[:, :, index] for index in arguments), out=output[:, :, out_index])
+
+        if self.format == 'L':
+            return output[:, :, 0]
+        return output
+
+    def channel_sources(self, images, constant_fill=None):
+        """
+        按规则得到每个输出通道的来源，供tga_codec.write_tga_channels合成即写出
+
+        Args:
+            images (dict): 源标签 -> 已统一布局的像素数组，缺失的可选源为None
+            constant_fill (dict): 已知为常量的输出通道索引 -> 值，这些通道直接使用常量而不读取源像素
+
+        Returns:
+            list: 按输出通道顺序的来源：源像素上的(H, W)视图、整数常量或派生函数
+        """
+        channel_counts = {label: None if image is None else _channel_count(image) for label, image in images.items()}
+        copies, constants, ops = self.compile(channel_counts)
+        constant_fill = constant_fill or {}
+
+        sources = [None] * len(OUTPUT_FORMATS[self.format])
+        for source, runs in copies.items():
+            pixels = images[source]
+            for start, stop, selection in runs:
+                for out_index in range(start, stop):
+                    if out_index in constant_fill:
+                        sources[out_index] = constant_fill[out_index]
+                    elif selection[0] == 'slice':
+                        sources[out_index] = pixels[:, :, selection[1] + out_index - start]
+                    elif selection[0] == 'plane':
+                        sources[out_index] = pixels
+                    else:
+                        sources[out_index] = _mean_source(pixels)
+
+        for out_index, value in constants:
+            sources[out_index] = value
+
+        for out_index, op, arguments in ops:
+            sources[out_index] = _derived_source(op, arguments)
+        return sources
+
+    def condition_met(self, images, stats=None):
+        """
+        检查when条件；源没有对应通道时视为不满足
+
+        Args:
+            images (dict): 源标签 -> 已统一布局的像素数组
+            stats (dict): 条件源的统计信息（texture_stats），提供时直接取其中的最大值而不扫描像素
+
+        Returns:
+            tuple: (是否满足, 说明)
+        """
+        if self.when is None:
+            return True, None
+        source, channel, threshold = self.when
+        pixels = images.get(source)
+        selection = None if pixels is None else _select_channel(_channel_count(pixels), channel)
+        if selection is None:
+            return False, f"{source}没有{channel}通道"
+        entry = texture_stats.channel_stats(stats, _channel_count(pixels), selection)
+        if entry is not None:
+            max_value = entry['max'] / 255.0
+        else:
+            plane = pixels if selection == 'plane' else pixels[:, :, selection]
+            max_value = np.max(plane) / 255.0
+        if max_value > threshold:
+            return True, f"{source}的{channel}通道最大亮度值为 {max_value:.3f}，超过阈值{threshold}"
+        return False, f"{source}的{channel}通道最大亮度值为 {max_value:.3f}，未超过阈值{threshold}"
+
+
+class PackingSpec:
+    """
+    一个规则文件：源后缀定义和全部输出规则
+    """
+
+    def __init__(self, data, path=None):
+        if data.get('format') != SPEC_FORMAT:
+            raise RuleSpecError(f"不支持的规则文件版本: {data.get('format')}")
+        self.path = path
+        self.name = data.get('name') or (os.path.splitext(os.path.basename(path))[0] if path else '')
+        self.output_directory = data.get('output_directory', '')
+        self.sources = dict(data.get('sources', {}))
+        if not self.sources:
+            raise RuleSpecError("sources不能为空")
+        self.fallback_stems = dict(data.get('fallback_stems', {}))
+        self.outputs = [PackingRule(entry, self.sources, f"outputs[{index}]")
+                        for index, entry in enumerate(data.get('outputs', []))]
+        names = [rule.name for rule in self.outputs]
+        if len(set(names)) != len(names):
+            raise RuleSpecError("输出名称重复")
+        # 规则内容的哈希，用于使增量构建清单中按旧规则生成的记录失效
+        self.digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def suffixes(self):
+        """文件名后缀 -> 源标签，按顺序匹配"""
+        return {suffix: label for label, suffix in self.sources.items()}
+
+    def classify(self, stem):
+        """
+        根据文件名(不含扩展名)确定源标签
+
+        Returns:
+            tuple: (基础名称, 源标签)，不匹配时返回None
+        """
+        for label, suffix in self.sources.items():
+            if stem.endswith(suffix):
+                return stem[:-len(suffix)], label
+        return None
+
+    def has_work(self, sources, group_name=None):
+        """组中的源是否足够生成至少一个输出"""
+        return any(rule.applies_to(group_name, sources) for rule in self.outputs)
+
+    def output_path(self, rule, sources):
+        """
+        输出文件路径：锚点源（requires中的第一个）所在目录 + output_directory，
+        文件名为锚点的基础名称 + 输出后缀
+        """
+        anchor_label = rule.requires[0]
+        anchor_path = sources[anchor_label]
+        stem = os.path.splitext(os.path.basename(anchor_path))[0]
+        base_name = stem[:-len(self.sources[anchor_label])]
+        directory = os.path.join(os.path.dirname(anchor_path), self.output_directory)
+        return os.path.normpath(os.path.join(directory, base_name + rule.suffix + '.tga'))
+
+
+def load_rule_spec(name_or_path):
+    """
+    读取规则文件
+
+    Args:
+        name_or_path (str): 规则文件路径，或packing_rules目录中的规则名称（不含.json）
+
+    Returns:
+        PackingSpec: 规则
+
+    Raises:
+        RuleSpecError: 规则内容无效
+        OSError: 文件无法读取
+    """
+    path = name_or_path
+    if not os.path.exists(path):
+        path = os.path.join(RULES_DIRECTORY, name_or_path + '.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise RuleSpecError(f"规则文件不是有效的JSON: {path}, 错误: {str(e)}")
+    return PackingSpec(data, path)
+
+
+def _probe_size(file_path):
+    """
+    只解析文件头获取 (高, 宽)，无法解析时返回None
+    """
+    try:
+        info = tga_codec.probe(file_path)
+    except Exception:
+        return None
+    return info['height'], info['width']
+
+
+def plan_group(spec, sources, group_name=None):
+    """
+    只解析文件头，在解码任何像素之前规划一个组的全部输出并校验
+
+    Args:
+        spec (PackingSpec): 打包规则
+        sources (dict): 源标签 -> 文件路径
+        group_name (str): 组名，用于name_contains过滤
+
+    Returns:
+        list: 按规则顺序的输出计划（组中没有任何必需源的输出不列出），每项为
+            {'name', 'suffix', 'path', 'status': 'ok'/'missing'/'invalid', 'reason',
+             'width', 'height', 'channels', 'input_bytes', 'output_bytes'}
+            missing表示缺少部分必需的源（该输出不会生成），invalid表示源无法读取或尺寸不一致
+    """
+    probes = {}
+
+    def probe_source(label):
+        if label not in probes:
+            try:
+                probes[label] = tga_codec.probe(sources[label])
+            except Exception as e:
+                probes[label] = e
+        return probes[label]
+
+    plans = []
+    for rule in spec.outputs:
+        if rule.name_contains and rule.name_contains not in (group_name or ''):
+            continue
+        if not any(label in sources for label in rule.requires):
+            continue
+        plan = {'name': rule.name, 'suffix': rule.suffix, 'path': None, 'status': 'ok', 'reason': None,
+                'width': None, 'height': None, 'channels': len(OUTPUT_FORMATS[rule.format]),
+                'input_bytes': 0, 'output_bytes': 0}
+        plans.append(plan)
+
+        missing = [label for label in rule.requires if label not in sources]
+        if missing:
+            plan['status'] = 'missing'
+            plan['reason'] = "缺少" + "、".join(spec.sources[label] for label in missing) + "贴图"
+            continue
+        plan['path'] = spec.output_path(rule, sources)
+
+        present = [label for label in rule.sources if label in sources]
+        infos = {label: probe_source(label) for label in present}
+        unreadable = [label for label, info in infos.items() if isinstance(info, Exception)]
+        if unreadable:
+            plan['status'] = 'invalid'
+            plan['reason'] = "无法读取文件头: " + ", ".join(f"{sources[label]} ({infos[label]})" for label in unreadable)
+            continue
+        sizes = {label: (info['height'], info['width']) for label, info in infos.items()}
+        if len(set(sizes.values())) > 1:
+            plan['status'] = 'invalid'
+            plan['reason'] = "尺寸不一致: " + ", ".join(f"{sources[label]} {size}" for label, size in sizes.items())
+            continue
+
+        plan['height'], plan['width'] = sizes[rule.requires[0]]
+        for label in present:
+            try:
+                plan['input_bytes'] += os.path.getsize(sources[label])
+            except OSError:
+                pass
+        plan['output_bytes'] = tga_codec.estimate_tga_size(plan['width'], plan['height'], plan['channels'])
+    return plans
+
+
+class _GroupScheduler:
+    """
+    一个组内的输出依赖图调度
+
+    源贴图和输出是图中的节点，输出依赖它用到的源。源在第一个使用它的输出开始时解码，
+    在最后一个使用它的输出完成后立即释放；互不依赖的输出可以由多个线程并行生成。
+    开始一个输出前为它尚未占用的源和输出缓冲区预留像素数，
+    已占用的像素数加上预留超过上限时等待其他输出完成后再开始
+    （没有正在运行的输出时总是允许开始，避免单个输出超过上限时无法继续）。
+    合成即写出时输出不占用整幅缓冲区，只为源预留。
+
+    同时记录解码次数和已解码源贴图占用字节数的峰值（内存映射的源按映射大小计），
+    用于评估构建机器上合适的内存预算。
+    """
+
+    def __init__(self, sources, loader, release, nodes, max_pixels, buffered_outputs=True):
+        self.sources = sources
+        self.loader = loader
+        self.release = release
+        self.pending = list(nodes)
+        self.max_pixels = max_pixels
+        self.buffered_outputs = buffered_outputs
+        self.condition = threading.Condition()
+        self.running = 0
+        self.held_pixels = 0
+        self.peak_pixels = 0
+        self.decoded = {}
+        self.decode_count = 0
+        self.source_bytes = {}
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.charged = set()
+        self.source_locks = {label: threading.Lock() for label in sources}
+        self.source_pixels = {}
+        self.consumers = {}
+        for _, rule, _ in nodes:
+            for label in rule.sources:
+                if label in sources:
+                    self.consumers[label] = self.consumers.get(label, 0) + 1
+                    if label not in self.source_pixels:
+                        size = _probe_size(sources[label])
+                        self.source_pixels[label] = size[0] * size[1] if size else 0
+
+    def _cost(self, rule):
+        labels = [label for label in rule.sources if label in self.sources and label not in self.charged]
+        anchor_pixels = self.source_pixels.get(rule.requires[0], 0) if self.buffered_outputs else 0
+        return labels, sum(self.source_pixels[label] for label in labels) + anchor_pixels
+
+    def acquire(self):
+        """
+        取出下一个可以开始的输出，全部输出都已开始时返回None
+        """
+        with self.condition:
+            while self.pending:
+                for position, node in enumerate(self.pending):
+                    labels, cost = self._cost(node[1])
+                    if self.max_pixels is None or self.running == 0 \
+                            or self.held_pixels + cost <= self.max_pixels:
+                        del self.pending[position]
+                        self.charged.update(labels)
+                        self.held_pixels += cost
+                        self.peak_pixels = max(self.peak_pixels, self.held_pixels)
+                        self.running += 1
+                        output_pixels = self.source_pixels.get(node[1].requires[0], 0) if self.buffered_outputs else 0
+                        return node, output_pixels
+                self.condition.wait()
+            return None
+
+    def finish(self, rule, output_pixels):
+        """
+        输出完成：归还输出缓冲区的预留，释放不再被使用的源
+        """
+        released = []
+        with self.condition:
+            self.running -= 1
+            self.held_pixels -= output_pixels
+            for label in rule.sources:
+                if label not in self.consumers:
+                    continue
+                self.consumers[label] -= 1
+                if self.consumers[label] == 0:
+                    self.decoded.pop(label, None)
+                    self.resident_bytes -= self.source_bytes.pop(label, 0)
+                    if label in self.charged:
+                        self.charged.discard(label)
+                        self.held_pixels -= self.source_pixels[label]
+                    released.append(label)
+            self.condition.notify_all()
+        if self.release is not None:
+            for label in released:
+                self.release(self.sources[label])
+
+    def get_source(self, label):
+        """
+        获取已解码的源贴图，多个输出同时需要时只解码一次
+        """
+        with self.source_locks[label]:
+            if label not in self.decoded:
+                image = self.loader(self.sources[label])
+                if image is None:
+                    logger.warning(f"无法读取{label}文件: {self.sources[label]}")
+                self.decoded[label] = None if image is None else _normalize_source(image)
+                with self.condition:
+                    self.decode_count += 1
+                    if image is not None:
+                        self.source_bytes[label] = image.nbytes
+                        self.resident_bytes += image.nbytes
+                        self.peak_resident_bytes = max(self.peak_resident_bytes, self.resident_bytes)
+            return self.decoded[label]
+
+    def run(self, render_node, workers):
+        """
+        用workers个线程执行全部输出
+        """
+        def work():
+            while True:
+                acquired = self.acquire()
+                if acquired is None:
+                    return
+                (index, rule, output_path), output_pixels = acquired
+                try:
+                    render_node(index, rule, output_path)
+                finally:
+                    self.finish(rule, output_pixels)
+
+        if workers <= 1 or len(self.pending) <= 1:
+            work()
+            return
+        threads = [threading.Thread(target=work, name=f"texture-rules-{i}", daemon=True)
+                   for i in range(min(workers, len(self.pending)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def _compose_output(rule, images, height, width, constant_fill, output_path, band_rows):
+    """
+    合成即写出：按行带交错各输出通道并直接写出TGA，不分配整幅输出数组
+
+    Returns:
+        int: 写出的字节数
+    """
+    channels = rule.channel_sources(images, constant_fill)
+    tga_codec.write_tga_channels(output_path, channels, height, width, band_rows)
+    return height * width * len(channels)
+
+
+def render_group(spec, sources, loader, saver, group_name=None, workers=1, max_megapixels=None, release=None,
+                 use_stats=False, band_rows=None, source_report=None):
+    """
+    按规则生成一个组的全部输出，组内每张源贴图最多解码一次，并在最后一个使用它的输出完成后释放
+
+    Args:
+        spec (PackingSpec): 打包规则
+        sources (dict): 源标签 -> 文件路径
+        loader (callable): loader(file_path) 返回图像（数组或LazyTgaImage），失败返回None
+        saver (callable): saver(image, file_path) 保存图像，返回False或抛出异常表示失败；
+            None表示合成即写出：各通道按行带交错后直接写出TGA，不分配整幅输出数组
+        group_name (str): 组名，用于name_contains过滤
+        workers (int): 并行生成输出的线程数
+        max_megapixels (float): 同时占用的源贴图和输出缓冲区像素数上限（百万像素），None表示不限制
+        release (callable): release(file_path) 在源贴图不再被使用时调用，例如记录或清理外部资源
+        use_stats (bool): 是否使用贴图所在目录的统计索引（when条件查询索引，常量通道直接填充）
+        band_rows (int): 合成即写出时每个行带的行数；指定时即使提供了saver也合成即写出。
+            输出只占用一个行带的内存，配合内存映射的源贴图，峰值内存与行带高度成正比
+        source_report (dict): 提供时写入 {'decoded': 源贴图解码次数, 'peak_source_bytes': 已解码源贴图的峰值占用字节数}
+
+    Returns:
+        list: 按规则顺序的输出结果，每项为
+            {'name', 'suffix', 'path', 'status': 'written'/'skipped'/'failed', 'reason',
+             'constant_channels': {输出通道: 常量值}}
+    """
+    nodes = []
+    results = []
+    for rule in spec.outputs:
+        if rule.applies_to(group_name, sources):
+            output_path = spec.output_path(rule, sources)
+            nodes.append((len(results), rule, output_path))
+            results.append({'name': rule.name, 'suffix': rule.suffix, 'path': output_path,
+                            'status': 'failed', 'reason': None, 'constant_channels': {}})
+
+    max_pixels = None if max_megapixels is None else int(max_megapixels * 1e6)
+    scheduler = _GroupScheduler(sources, loader, release, nodes, max_pixels,
+                                buffered_outputs=saver is not None and not band_rows)
+    profiler = texture_profiler.get_profiler()
+
+    def render_node(index, rule, output_path):
+        result = results[index]
+        start = time.perf_counter()
+        try:
+            present = [label for label in rule.sources if label in sources and os.path.exists(sources[label])]
+            sizes = {label: _probe_size(sources[label]) for label in present}
+            if None not in sizes.values() and len(set(sizes.values())) > 1:
+                result['reason'] = "尺寸不一致: " + ", ".join(f"{sources[label]} {size}" for label, size in sizes.items())
+                return
+
+            images = {}
+            for label in rule.sources:
+                images[label] = scheduler.get_source(label) if label in present else None
+                if images[label] is None and label in rule.requires:
+                    result['reason'] = f"无法读取{label}文件"
+                    return
+
+            shapes = {label: image.shape[:2] for label, image in images.items() if image is not None}
+            if len(set(shapes.values())) > 1:
+                result['reason'] = "尺寸不一致: " + ", ".join(f"{label} {shape}" for label, shape in shapes.items())
+                return
+
+            condition_stats = None
+            if use_stats and rule.when is not None and images.get(rule.when[0]) is not None:
+                condition_stats = texture_stats.get_or_compute(sources[rule.when[0]], images[rule.when[0]])
+            met, note = rule.condition_met(images, condition_stats)
+            if note:
+                logger.debug(note)
+            if not met:
+                result['status'] = 'skipped'
+                result['reason'] = note
+                return
+
+            height, width = shapes[rule.requires[0]]
+            constant_fill = {}
+            if use_stats:
+                source_stats = {}
+                for label, image in images.items():
+                    stats = None if image is None else texture_stats.lookup(sources[label], hash_unknown=False)
+                    if stats is not None and stats['shape'] == [height, width]:
+                        source_stats[label] = stats
+                constant_fill = rule.constant_channels(images, source_stats)
+                if constant_fill:
+                    letters = OUTPUT_FORMATS[rule.format]
+                    result['constant_channels'] = {letters[index]: value for index, value in sorted(constant_fill.items())}
+                    filled = ", ".join(f"{letter}={value}" for letter, value in result['constant_channels'].items())
+                    logger.debug(f"{rule.name}的常量通道直接填充: {filled}")
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if band_rows or saver is None:
+                written_bytes = _compose_output(rule, images, height, width, constant_fill, output_path, band_rows)
+            else:
+                output = rule.render(images, height, width, constant_fill)
+                if saver(output, output_path) is False:
+                    result['reason'] = "保存失败"
+                    return
+                written_bytes = output.nbytes
+            result['status'] = 'written'
+            profiler.add(rule.name, time.perf_counter() - start, written_bytes, height * width)
+        except Exception as e:
+            result['reason'] = str(e)
+        finally:
+            if result['status'] == 'written':
+                logger.debug(f"成功生成{rule.name}文件: {os.path.basename(output_path)}")
+            elif result['status'] == 'failed':
+                logger.warning(f"生成{rule.name}文件失败: {output_path}, 原因: {result['reason']}")
+
+    scheduler.run(render_node, workers)
+    if source_report is not None:
+        source_report['decoded'] = scheduler.decode_count
+        source_report['peak_source_bytes'] = scheduler.peak_resident_bytes
+    if max_pixels is not None:
+        logger.debug(f"组内峰值占用: {scheduler.peak_pixels / 1e6:.1f} 百万像素 / 上限 {max_megapixels} 百万像素")
+    return results
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+贴图统计索引
+对每张贴图的每个通道做一次整数直方图统计，得到最小值、最大值、均值、256级直方图和是否为常量，
+结果按文件内容的SHA-1保存在贴图所在目录的 .texture_stats.json 中。
+
+需要这些信息的步骤（例如根据NCE的A通道最大值决定是否生成_S，Alpha通道的最小/最大值）
+直接查询索引，不再重新扫描像素；已知为常量的通道在生成输出时可以直接填充。
+转换器和MergeTexture只在指定--stats时使用并更新索引，默认不在源贴图目录中写入索引文件。
+
+查找规则：
+1. 文件路径、修改时间和大小与记录一致 -> 直接使用记录的哈希
+2. 否则计算文件哈希，按哈希查找（文件被复制、改名或只是修改时间变化时仍然命中）
+3. 都找不到时由调用方提供解码后的像素计算并写入索引
+
+多进程运行时，子进程通过take_new_entries()取出新增的记录交给主进程合并保存，
+避免多个进程同时写同一个索引文件。
+
+也可以单独运行本脚本，预先为一个目录树建立统计索引：
+    python texture_stats.py D:/Textures
+"""
+
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+import tga_codec
+import texture_log
+import texture_manifest
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+
+STATS_FILE_NAME = '.texture_stats.json'
+STATS_FORMAT = 1
+
+# 每批统计的像素数；cv2.calcHist的计数是float32，单批不超过2^24个像素才能保证计数精确
+_BATCH_PIXELS = 1 << 24
+
+logger = texture_log.get_logger('stats')
+
+CHANNEL_LETTERS = {1: ('L',), 3: ('B', 'G', 'R'), 4: ('B', 'G', 'R', 'A')}
+
+
+def _histograms(pixels):
+    """
+    逐通道计算256级直方图，按行分批累加为精确的整数计数
+
+    Returns:
+        numpy.ndarray: (通道数, 256)的int64数组
+    """
+    channel_count = 1 if pixels.ndim == 2 else pixels.shape[2]
+    height, width = pixels.shape[:2]
+    histograms = np.zeros((channel_count, 256), dtype=np.int64)
+    rows_per_batch = max(1, _BATCH_PIXELS // max(width, 1))
+    for top in range(0, height, rows_per_batch):
+        band = pixels[top:top + rows_per_batch]
+        for channel in range(channel_count):
+            if CV2_AVAILABLE:
+                counts = cv2.calcHist([band], [channel], None, [256], [0, 256])
+                histograms[channel] += counts.ravel().astype(np.int64)
+            else:
+                plane = band if channel_count == 1 else band[:, :, channel]
+                histograms[channel] += np.bincount(plane.ravel(), minlength=256)
+    return histograms
+
+
+def compute_image_stats(pixels):
+    """
+    计算图像每个通道的统计信息（每个通道一次整数直方图统计）
+
+    Args:
+        pixels (numpy.ndarray): uint8图像，灰度(H, W)、BGR或BGRA
+
+    Returns:
+        dict: {'shape': [H, W], 'channels': {通道字母: {'min', 'max', 'mean', 'histogram', 'constant'}}}
+
+    Raises:
+        ValueError: 不支持的图像格式
+    """
+    pixels = np.asarray(pixels)
+    channel_count = 1 if pixels.ndim == 2 else pixels.shape[2]
+    if pixels.dtype != np.uint8 or channel_count not in CHANNEL_LETTERS:
+        raise ValueError(f"不支持统计的图像格式: {pixels.dtype} {pixels.shape}")
+
+    histograms = _histograms(pixels)
+    levels = np.arange(256, dtype=np.int64)
+    total = pixels.shape[0] * pixels.shape[1]
+    channels = {}
+    for letter, histogram in zip(CHANNEL_LETTERS[channel_count], histograms):
+        used = np.flatnonzero(histogram)
+        minimum = int(used[0]) if used.size else 0
+        maximum = int(used[-1]) if used.size else 0
+        channels[letter] = {
+            'min': minimum,
+            'max': maximum,
+            'mean': float(histogram @ levels) / total if total else 0.0,
+            'histogram': histogram.tolist(),
+            'constant': minimum == maximum,
+        }
+    return {'shape': [int(pixels.shape[0]), int(pixels.shape[1])], 'channels': channels}
+
+
+class StatsIndex:
+    """
+    一个目录的统计索引（线程安全）
+    """
+
+    def __init__(self, directory, file_name=STATS_FILE_NAME):
+        self.directory = os.path.abspath(directory)
+        self.path = os.path.join(self.directory, file_name)
+        self.files = {}
+        self.stats = {}
+        self.dirty = False
+        self._new_files = {}
+        self._new_stats = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        读取索引文件，文件不存在或损坏时从空索引开始
+
+        Returns:
+            StatsIndex: self
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == STATS_FORMAT:
+                self.files = data.get('files', {})
+                self.stats = data.get('stats', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取统计索引失败，将重新统计: {self.path}, 错误: {str(e)}")
+        return self
+
+    def save(self):
+        """
+        原子地写回索引文件（先写临时文件再替换）
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': STATS_FORMAT, 'files': self.files, 'stats': self.stats}, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+    def lookup(self, file_path, hash_unknown=True):
+        """
+        查询一个文件的统计信息
+
+        Args:
+            file_path (str): 文件路径
+            hash_unknown (bool): 路径记录不存在或已过期时，是否计算文件哈希再按哈希查找
+
+        Returns:
+            dict: 统计信息，没有记录时返回None
+        """
+        name = os.path.basename(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self.files.get(name)
+            if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                return self.stats.get(entry['sha1'])
+        if not hash_unknown:
+            return None
+
+        digest = texture_manifest.file_digest(file_path)
+        with self._lock:
+            self._set_file(name, {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': digest})
+            return self.stats.get(digest)
+
+    def get_or_compute(self, file_path, pixels):
+        """
+        查询统计信息，没有记录时用解码后的像素计算并写入索引
+
+        Args:
+            file_path (str): 文件路径
+            pixels (numpy.ndarray): 该文件解码后的像素
+
+        Returns:
+            dict: 统计信息
+        """
+        stats = self.lookup(file_path)
+        if stats is not None and stats['shape'] == list(np.shape(pixels)[:2]):
+            return stats
+        stats = compute_image_stats(pixels)
+        name = os.path.basename(file_path)
+        with self._lock:
+            entry = self.files.get(name)
+            if entry is not None:
+                self._set_stats(entry['sha1'], stats)
+        return stats
+
+    def _set_file(self, name, entry):
+        if self.files.get(name) != entry:
+            self.files[name] = entry
+            self._new_files[name] = entry
+            self.dirty = True
+
+    def _set_stats(self, digest, stats):
+        self.stats[digest] = stats
+        self._new_stats[digest] = stats
+        self.dirty = True
+
+    def take_new_entries(self):
+        """
+        取出上次调用以来新增的记录（用于从子进程传回主进程）
+
+        Returns:
+            dict: {'files': {...}, 'stats': {...}}
+        """
+        with self._lock:
+            entries = {'files': self._new_files, 'stats': self._new_stats}
+            self._new_files = {}
+            self._new_stats = {}
+            return entries
+
+    def merge(self, entries):
+        """
+        合并其他进程新增的记录
+        """
+        with self._lock:
+            for name, entry in entries['files'].items():
+                self._set_file(name, entry)
+            for digest, stats in entries['stats'].items():
+                self._set_stats(digest, stats)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(directory):
+    """
+    获取一个目录的统计索引（进程内共享，首次使用时读取索引文件）
+    """
+    key = os.path.normcase(os.path.abspath(directory))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = StatsIndex(directory).load()
+            _indexes[key] = index
+        return index
+
+
+def lookup(file_path, hash_unknown=True):
+    """
+    在文件所在目录的索引中查询统计信息，没有记录时返回None
+    """
+    return get_index(os.path.dirname(os.path.abspath(file_path))).lookup(file_path, hash_unknown)
+
+
+def get_or_compute(file_path, pixels):
+    """
+    在文件所在目录的索引中查询统计信息，没有记录时计算并写入索引
+    """
+    return get_index(os.path.dirname(os.path.abspath(file_path))).get_or_compute(file_path, pixels)
+
+
+def channel_stats(stats, channel_count, selection):
+    """
+    按源的通道数和通道索引取出对应通道的统计
+
+    Args:
+        stats (dict): compute_image_stats的结果
+        channel_count (int): 源的通道数
+        selection: 通道索引，或'plane'表示灰度平面
+
+    Returns:
+        dict: 通道统计，没有对应记录时返回None
+    """
+    letters = CHANNEL_LETTERS.get(channel_count)
+    if stats is None or letters is None:
+        return None
+    letter = letters[0] if selection == 'plane' else letters[selection]
+    return stats['channels'].get(letter)
+
+
+def take_new_entries():
+    """
+    取出所有目录索引中新增的记录
+
+    Returns:
+        dict: 目录 -> 新增记录
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    entries = {}
+    for index in indexes:
+        new_entries = index.take_new_entries()
+        if new_entries['files'] or new_entries['stats']:
+            entries[index.directory] = new_entries
+    return entries
+
+
+def merge_entries(entries):
+    """
+    合并take_new_entries取出的记录
+    """
+    for directory, new_entries in entries.items():
+        get_index(directory).merge(new_entries)
+
+
+def save_all():
+    """
+    保存所有有变化的目录索引，写入失败只打印提示
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        try:
+            index.save()
+        except OSError as e:
+            logger.warning(f"保存统计索引失败: {index.path}, 错误: {str(e)}")
+
+
+def build_index(base_directory, extensions=('.tga',)):
+    """
+    递归统计目录树中的全部贴图并写入各目录的统计索引，已有记录的文件跳过
+
+    Args:
+        base_directory (str): 基础目录
+        extensions (tuple): 要统计的扩展名（小写）
+
+    Returns:
+        dict: {'computed': 新统计的文件数, 'cached': 已有记录的文件数, 'failed': 无法读取的文件数}
+    """
+    counts = {'computed': 0, 'cached': 0, 'failed': 0}
+    for root, dirs, files in os.walk(base_directory):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() not in extensions:
+                continue
+            file_path = os.path.join(root, file_name)
+            if lookup(file_path) is not None:
+                counts['cached'] += 1
+                continue
+            try:
+                pixels = tga_codec.read_tga(file_path)
+                get_or_compute(file_path, pixels)
+                counts['computed'] += 1
+            except Exception as e:
+                logger.warning(f"统计失败: {file_path}, 错误: {str(e)}")
+                counts['failed'] += 1
+    save_all()
+    return counts
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='为目录树中的贴图建立通道统计索引')
+    parser.add_argument('directory', help='要统计的目录')
+    args = parser.parse_args()
+    texture_log.configure()
+
+    counts = build_index(args.directory)
+    print(f"统计完成: 新统计 {counts['computed']} 个文件, 已有记录 {counts['cached']} 个, 失败 {counts['failed']} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+目录监视
+轮询目录树中关心的文件（修改时间和大小），检测新增、修改和删除，
+一批连续的保存在安静一段时间后（防抖）作为一次变化交给回调处理。
+
+只依赖标准库：每次轮询用os.scandir遍历目录树，只对通过筛选的文件取stat，
+上万个文件的目录树一次轮询通常只需几十毫秒。
+"""
+
+import os
+import time
+
+
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_DEBOUNCE_SECONDS = 0.5
+
+
+def snapshot_files(directories, accept):
+    """
+    记录目录树中所有被接受的文件的状态
+
+    Args:
+        directories (list): 要监视的目录
+        accept (callable): accept(file_path) 返回是否关心该文件
+
+    Returns:
+        dict: 文件路径 -> (修改时间ns, 大小)
+    """
+    files = {}
+    pending = list(directories)
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                pending.append(entry.path)
+                        elif accept(entry.path):
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return files
+
+
+def diff_snapshots(before, after):
+    """
+    比较两次快照
+
+    Returns:
+        set: 新增、修改或删除的文件路径
+    """
+    changed = {path for path, state in after.items() if before.get(path) != state}
+    changed.update(path for path in before if path not in after)
+    return changed
+
+
+def watch(directories, accept, on_change, interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE_SECONDS,
+          should_stop=None):
+    """
+    监视目录树，变化安静debounce秒后调用一次on_change，直到Ctrl+C或should_stop()返回True
+
+    Args:
+        directories (list): 要监视的目录
+        accept (callable): accept(file_path) 返回是否关心该文件
+        on_change (callable): on_change(changed_paths) 处理一批变化的文件
+        interval (float): 轮询间隔（秒）
+        debounce (float): 最后一次变化后等待的时间（秒），期间的新变化合并为同一批
+        should_stop (callable): 返回True时结束监视，None表示一直监视
+    """
+    current = snapshot_files(directories, accept)
+    pending = set()
+    last_change = None
+    try:
+        while should_stop is None or not should_stop():
+            time.sleep(interval)
+            latest = snapshot_files(directories, accept)
+            changed = diff_snapshots(current, latest)
+            current = latest
+            if changed:
+                pending.update(changed)
+                last_change = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_change >= debounce:
+                batch, pending = pending, set()
+                on_change(batch)
+    except KeyboardInterrupt:
+        pass
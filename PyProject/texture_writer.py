@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步贴图写出
+生成的贴图放入有界队列，由少量写出线程在后台保存，使磁盘/网络写入与下一组贴图的解码和计算重叠。
+队列按字节数限流：待写出的数据超过上限时，提交方阻塞等待，避免内存无限增长。
+
+使用方式：
+    with texture_writer.write_behind(save_func) as writer:
+        ...  # 期间 texture_writer.submit_or_write(image, path, save_func) 会排队写出
+    writer.completed / writer.errors  # 退出时所有写出都已完成
+"""
+
+import contextlib
+import threading
+from collections import deque
+
+
+DEFAULT_WRITER_THREADS = 2
+DEFAULT_MAX_PENDING_BYTES = 512 * 1024 * 1024
+
+
+class AsyncTextureWriter:
+    """
+    带字节上限的后台写出线程池
+
+    提交的图像数组在写出完成前不能再被修改。
+    """
+
+    def __init__(self, write_func, workers=DEFAULT_WRITER_THREADS, max_pending_bytes=DEFAULT_MAX_PENDING_BYTES):
+        """
+        Args:
+            write_func (callable): write_func(image, file_path) 同步保存一张图像，返回是否成功
+            workers (int): 写出线程数
+            max_pending_bytes (int): 排队和正在写出的数据上限（字节）
+        """
+        self._write_func = write_func
+        self.max_pending_bytes = max_pending_bytes
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._pending_bytes = 0
+        self._closed = False
+        self._submitted = set()
+        self._finished = set()
+        self.completed = []
+        self.errors = {}
+        self.peak_pending_bytes = 0
+        self._threads = [threading.Thread(target=self._run, name=f"texture-writer-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, file_path):
+        """
+        提交一张待写出的图像，待写出的数据超过上限时阻塞
+
+        Args:
+            image (numpy.ndarray): 图像数据
+            file_path (str): 输出文件路径
+        """
+        size = image.nbytes
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("写出线程池已关闭")
+            # 队列为空时即使单张图像超过上限也允许提交，避免死锁
+            while self._pending_bytes and self._pending_bytes + size > self.max_pending_bytes:
+                self._condition.wait()
+            self._queue.append((image, file_path, size))
+            self._submitted.add(file_path)
+            self._pending_bytes += size
+            self.peak_pending_bytes = max(self.peak_pending_bytes, self._pending_bytes)
+            self._condition.notify_all()
+
+    def is_submitted(self, file_path):
+        """
+        文件是否已提交写出（无论是否已经写完）
+        """
+        with self._condition:
+            return file_path in self._submitted
+
+    def is_finished(self, file_path):
+        """
+        已提交的文件是否已经写完（无论成功与否）
+        """
+        with self._condition:
+            return file_path in self._finished
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                image, file_path, size = self._queue.popleft()
+
+            try:
+                error = None if self._write_func(image, file_path) else "保存失败"
+            except Exception as e:
+                error = str(e)
+            del image
+
+            with self._condition:
+                self._pending_bytes -= size
+                if error is None:
+                    self.completed.append(file_path)
+                else:
+                    self.errors[file_path] = error
+                self._finished.add(file_path)
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        等待所有已提交的图像写出完成并结束写出线程
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+_active_writer = None
+
+
+def get_active_writer():
+    """
+    获取当前生效的后台写出线程池，没有时返回None
+    """
+    return _active_writer
+
+
+@contextlib.contextmanager
+def write_behind(write_func, workers=DEFAULT_WRITER_THREADS, max_pending_bytes=DEFAULT_MAX_PENDING_BYTES):
+    """
+    在with块内启用后台写出，退出时等待全部写出完成
+
+    Args:
+        write_func (callable): 同步保存函数 write_func(image, file_path) -> bool
+        workers (int): 写出线程数，0表示不启用后台写出
+        max_pending_bytes (int): 排队数据上限（字节）
+
+    Yields:
+        AsyncTextureWriter: 写出线程池；不启用后台写出时为None
+    """
+    global _active_writer
+    if workers <= 0:
+        yield None
+        return
+
+    writer = AsyncTextureWriter(write_func, workers, max_pending_bytes)
+    previous_writer = _active_writer
+    _active_writer = writer
+    try:
+        yield writer
+    finally:
+        _active_writer = previous_writer
+        writer.close()
+
+
+def submit_or_write(image, file_path, write_func):
+    """
+    有后台写出线程池时排队写出并立即返回True，否则同步调用write_func
+
+    Returns:
+        bool: 是否成功（排队写出的实际结果在线程池的completed/errors中）
+    """
+    writer = _active_writer
+    if writer is None:
+        return write_func(image, file_path)
+    writer.submit(image, file_path)
+    return True
@@ -0,0 +1,916 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TGA编解码模块
+纯NumPy实现的TGA读写，供各个贴图工具共用。
+
+支持：
+1. 未压缩与RLE压缩（图像类型 1/2/3 与 9/10/11）
+2. 8位灰度/调色板、16位灰度+Alpha、24位BGR、32位BGRA
+3. 左下角与左上角两种原点
+4. 未压缩TGA的内存映射惰性通道访问（open_tga_lazy）
+5. 只读文件头的图像信息探测（probe，同时支持PNG/TIFF）
+6. 按行带流式写出（TgaStreamWriter），不需要整幅图像数组
+7. 合成即写出（write_tga_channels）：由逐通道的来源（数组视图、常量、派生函数）按行带交错后直接写出
+
+TGA文件本身按BGR(A)顺序存储像素，与OpenCV的通道顺序一致，
+因此解码时直接把像素块读入预分配的数组，不再需要RGB->BGR的交换拷贝；
+编码时按行直接写出数组视图，不再经过cvtColor或PIL的中间拷贝。
+"""
+
+import os
+import struct
+
+import numpy as np
+
+
+# TGA文件头固定为18字节
+TGA_HEADER_SIZE = 18
+_HEADER_STRUCT = struct.Struct('<BBBHHBHHHHBB')
+
+# 图像类型
+TGA_TYPE_COLOR_MAPPED = 1
+TGA_TYPE_TRUE_COLOR = 2
+TGA_TYPE_GRAYSCALE = 3
+TGA_TYPE_RLE_COLOR_MAPPED = 9
+TGA_TYPE_RLE_TRUE_COLOR = 10
+TGA_TYPE_RLE_GRAYSCALE = 11
+
+# 图像描述字节中的原点标志位
+_ORIGIN_RIGHT = 0x10
+_ORIGIN_TOP = 0x20
+
+# TGA 2.0 文件尾
+_TGA_FOOTER = b"\0" * 8 + b"TRUEVISION-XFILE." + b"\0"
+
+# RLE数据包最多包含128个像素
+_RLE_MAX_PACKET = 128
+
+# 写文件时使用的缓冲区大小
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# 合成即写出时每个行带的像素数
+COMPOSE_BAND_PIXELS = 1 << 20
+
+
+def parse_tga_header(data):
+    """
+    解析18字节的TGA文件头
+
+    Args:
+        data (bytes): 文件开头至少18字节的数据
+
+    Returns:
+        dict: 文件头字段
+
+    Raises:
+        ValueError: 数据不足或不是受支持的TGA文件头
+    """
+    if len(data) < TGA_HEADER_SIZE:
+        raise ValueError("TGA文件头不完整")
+
+    (id_length, color_map_type, image_type,
+     color_map_first, color_map_length, color_map_depth,
+     x_origin, y_origin, width, height,
+     pixel_depth, descriptor) = _HEADER_STRUCT.unpack_from(data)
+
+    if color_map_type not in (0, 1):
+        raise ValueError(f"未知的TGA调色板类型: {color_map_type}")
+    if image_type not in (TGA_TYPE_COLOR_MAPPED, TGA_TYPE_TRUE_COLOR, TGA_TYPE_GRAYSCALE,
+                          TGA_TYPE_RLE_COLOR_MAPPED, TGA_TYPE_RLE_TRUE_COLOR, TGA_TYPE_RLE_GRAYSCALE):
+        raise ValueError(f"不支持的TGA图像类型: {image_type}")
+    if width == 0 or height == 0:
+        raise ValueError(f"TGA图像尺寸无效: {width}x{height}")
+
+    return {
+        'id_length': id_length,
+        'color_map_type': color_map_type,
+        'image_type': image_type,
+        'color_map_first': color_map_first,
+        'color_map_length': color_map_length,
+        'color_map_depth': color_map_depth,
+        'width': width,
+        'height': height,
+        'pixel_depth': pixel_depth,
+        'alpha_bits': descriptor & 0x0F,
+        'rle': image_type >= TGA_TYPE_RLE_COLOR_MAPPED,
+        'top_origin': bool(descriptor & _ORIGIN_TOP),
+        'right_origin': bool(descriptor & _ORIGIN_RIGHT),
+    }
+
+
+def _read_exact(f, size):
+    """读取指定字节数，不足时抛出异常"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("TGA文件数据被截断")
+    return data
+
+
+def _read_color_map(f, header):
+    """
+    读取调色板，返回 (N, 3) 或 (N, 4) 的BGR(A)数组
+    """
+    depth = header['color_map_depth']
+    if depth not in (24, 32):
+        raise ValueError(f"不支持的TGA调色板位深: {depth}")
+    channels = depth // 8
+    length = header['color_map_length']
+    data = _read_exact(f, length * channels)
+    return np.frombuffer(data, dtype=np.uint8).reshape(length, channels)
+
+
+def _stored_layout(header):
+    """
+    根据文件头确定像素块在文件中的每像素字节数
+
+    Returns:
+        int: 每像素字节数
+    """
+    image_type = header['image_type']
+    depth = header['pixel_depth']
+    if image_type in (TGA_TYPE_COLOR_MAPPED, TGA_TYPE_RLE_COLOR_MAPPED):
+        if depth != 8:
+            raise ValueError(f"不支持的TGA调色板索引位深: {depth}")
+        return 1
+    if image_type in (TGA_TYPE_GRAYSCALE, TGA_TYPE_RLE_GRAYSCALE):
+        if depth not in (8, 16):
+            raise ValueError(f"不支持的TGA灰度位深: {depth}")
+        return depth // 8
+    if depth not in (24, 32):
+        raise ValueError(f"不支持的TGA真彩色位深: {depth}")
+    return depth // 8
+
+
+def _decode_rle(f, out, bpp):
+    """
+    将RLE像素数据直接解码到预分配的数组中
+
+    Args:
+        f: 已定位到像素数据的文件对象
+        out (numpy.ndarray): C连续的uint8输出数组
+        bpp (int): 每像素字节数
+    """
+    src = memoryview(f.read())
+    dst = memoryview(out).cast('B')
+    total = len(dst)
+    src_len = len(src)
+    pos = 0
+    written = 0
+    while written < total:
+        if pos >= src_len:
+            raise ValueError("TGA RLE数据被截断")
+        packet = src[pos]
+        pos += 1
+        count = (packet & 0x7F) + 1
+        nbytes = min(count * bpp, total - written)
+        if packet & 0x80:
+            # 重复包：一个像素值重复count次
+            pixel = bytes(src[pos:pos + bpp])
+            if len(pixel) != bpp:
+                raise ValueError("TGA RLE数据被截断")
+            pos += bpp
+            dst[written:written + nbytes] = (pixel * count)[:nbytes]
+        else:
+            # 原始包：count个连续像素
+            if pos + nbytes > src_len:
+                raise ValueError("TGA RLE数据被截断")
+            dst[written:written + nbytes] = src[pos:pos + nbytes]
+            pos += count * bpp
+        written += nbytes
+
+
+def _flip_rows_inplace(image):
+    """
+    原地上下翻转图像，只使用一行大小的临时缓冲区
+    """
+    height = image.shape[0]
+    row_buffer = np.empty_like(image[0])
+    for top in range(height // 2):
+        bottom = height - 1 - top
+        row_buffer[...] = image[top]
+        image[top] = image[bottom]
+        image[bottom] = row_buffer
+
+
+def read_tga(file_path, palette=True):
+    """
+    直接解码TGA文件为OpenCV通道顺序的数组
+
+    未压缩数据通过readinto直接读入预分配的数组，RLE数据解码到同一个数组中，
+    左下角原点的图像在原地翻转，整个过程只分配一次全尺寸的像素内存
+    （调色板与灰度+Alpha图像需要额外展开一次）。
+
+    Args:
+        file_path (str): TGA文件路径
+        palette (bool): 调色板图像是否按调色板展开为颜色；False时返回(H, W)的调色板索引，
+            与np.array(Image.open(...))读取P模式图像的结果一致（MergeTexture原有的读取方式）
+
+    Returns:
+        numpy.ndarray: 图像数据，灰度为(H, W)，真彩色为BGR(H, W, 3)或BGRA(H, W, 4)
+
+    Raises:
+        ValueError: 文件不是受支持的TGA格式
+        OSError: 文件读取失败
+    """
+    with open(file_path, 'rb') as f:
+        header = parse_tga_header(_read_exact(f, TGA_HEADER_SIZE))
+        if header['id_length']:
+            f.seek(header['id_length'], os.SEEK_CUR)
+
+        color_map = None
+        if header['color_map_type'] == 1:
+            color_map = _read_color_map(f, header)
+
+        bpp = _stored_layout(header)
+        height, width = header['height'], header['width']
+        if bpp == 1:
+            stored = np.empty((height, width), dtype=np.uint8)
+        else:
+            stored = np.empty((height, width, bpp), dtype=np.uint8)
+
+        if header['rle']:
+            _decode_rle(f, stored, bpp)
+        elif f.readinto(memoryview(stored).cast('B')) != stored.nbytes:
+            raise ValueError("TGA像素数据被截断")
+
+    if not header['top_origin']:
+        _flip_rows_inplace(stored)
+    if header['right_origin']:
+        stored[...] = stored[:, ::-1]
+
+    image_type = header['image_type']
+    if image_type in (TGA_TYPE_COLOR_MAPPED, TGA_TYPE_RLE_COLOR_MAPPED):
+        if not palette:
+            return stored
+        indices = stored
+        if header['color_map_first']:
+            indices = indices.astype(np.intp) - header['color_map_first']
+        return color_map.take(indices, axis=0, mode='clip')
+    if bpp == 2:
+        # 灰度+Alpha，展开为BGRA，与原有加载逻辑保持一致
+        bgra = np.empty((height, width, 4), dtype=np.uint8)
+        bgra[:, :, :3] = stored[:, :, :1]
+        bgra[:, :, 3] = stored[:, :, 1]
+        return bgra
+    return stored
+
+
+def _pixel_data_offset(header):
+    """
+    计算像素数据在文件中的起始偏移（文件头 + 图像ID + 调色板）
+    """
+    offset = TGA_HEADER_SIZE + header['id_length']
+    if header['color_map_type'] == 1:
+        offset += header['color_map_length'] * ((header['color_map_depth'] + 7) // 8)
+    return offset
+
+
+class LazyTgaImage:
+    """
+    按通道惰性访问的图像句柄
+
+    对未压缩的真彩色/灰度TGA，像素块通过np.memmap映射，
+    shape、切片和channel()返回的都是映射上的跨步视图，只有真正访问到的页才会从磁盘读入，
+    也不会产生解码后的整幅副本。左下角原点通过负步长视图处理，不做翻转拷贝。
+    其他情况（RLE、调色板、灰度+Alpha或已解码的数组）退化为包装内存中的数组，接口保持一致。
+
+    句柄支持数组式的切片访问和np.asarray，因此原先按数组编写的通道逻辑可以直接使用。
+    """
+
+    def __init__(self, pixels, file_path=None, mapped=False):
+        """
+        Args:
+            pixels (numpy.ndarray): 图像像素，灰度为(H, W)，彩色为(H, W, C)
+            file_path (str): 来源文件路径
+            mapped (bool): 像素是否来自内存映射（只读）
+        """
+        self._pixels = pixels
+        self.file_path = file_path
+        self.mapped = mapped
+
+    @property
+    def pixels(self):
+        """图像像素视图"""
+        if self._pixels is None:
+            raise ValueError("图像句柄已关闭")
+        return self._pixels
+
+    @property
+    def shape(self):
+        return self.pixels.shape
+
+    @property
+    def ndim(self):
+        return self.pixels.ndim
+
+    @property
+    def dtype(self):
+        return self.pixels.dtype
+
+    @property
+    def channels(self):
+        """通道数，灰度图为1"""
+        return 1 if self.ndim == 2 else self.shape[2]
+
+    @property
+    def has_alpha(self):
+        return self.channels == 4
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
+
+    def channel(self, index):
+        """
+        获取单个通道的跨步视图
+
+        Args:
+            index (int): OpenCV顺序的通道索引（0=B, 1=G, 2=R, 3=A），灰度图任意颜色通道都返回灰度本身
+
+        Returns:
+            numpy.ndarray: (H, W)的只读或可写视图
+        """
+        if self.ndim == 2:
+            if index >= 3:
+                raise IndexError("灰度图像没有Alpha通道")
+            return self.pixels
+        return self.pixels[:, :, index]
+
+    def to_array(self):
+        """
+        得到可写的完整数组；内存映射或只读（如组内共享的句柄）的像素会复制一份，
+        内存映射的句柄会在此时真正读入全部像素
+
+        Returns:
+            numpy.ndarray: C连续的uint8数组
+        """
+        if self.mapped or not self.pixels.flags.writeable:
+            return np.array(self.pixels, order='C')
+        return self.pixels
+
+    def close(self):
+        """释放像素引用，内存映射在最后一个视图释放后关闭"""
+        self._pixels = None
+
+    def __getitem__(self, key):
+        return self.pixels[key]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.pixels
+        return self.pixels.astype(dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_tga_lazy(file_path):
+    """
+    打开TGA文件并返回按通道惰性访问的句柄
+
+    未压缩的8位灰度、24位BGR和32位BGRA图像直接映射像素块；
+    其他格式完整解码后再包装，调用方无需区分。
+
+    Args:
+        file_path (str): TGA文件路径
+
+    Returns:
+        LazyTgaImage: 图像句柄
+
+    Raises:
+        ValueError: 文件不是受支持的TGA格式
+        OSError: 文件读取失败
+    """
+    with open(file_path, 'rb') as f:
+        header = parse_tga_header(_read_exact(f, TGA_HEADER_SIZE))
+
+    mappable = (not header['rle']
+                and header['color_map_type'] == 0
+                and header['image_type'] in (TGA_TYPE_TRUE_COLOR, TGA_TYPE_GRAYSCALE)
+                and header['pixel_depth'] in (8, 24, 32))
+    if not mappable:
+        return LazyTgaImage(read_tga(file_path), file_path)
+
+    height, width = header['height'], header['width']
+    bpp = header['pixel_depth'] // 8
+    shape = (height, width) if bpp == 1 else (height, width, bpp)
+    # 文件长度不足时np.memmap会抛出ValueError
+    pixels = np.memmap(file_path, dtype=np.uint8, mode='r',
+                       offset=_pixel_data_offset(header), shape=shape)
+    if not header['top_origin']:
+        pixels = pixels[::-1]
+    if header['right_origin']:
+        pixels = pixels[:, ::-1]
+    return LazyTgaImage(pixels, file_path, mapped=True)
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_TIFF_SIGNATURES = (b"II*\x00", b"MM\x00*")
+
+# PNG颜色类型对应的通道数
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# TIFF标签
+_TIFF_TAG_WIDTH = 256
+_TIFF_TAG_HEIGHT = 257
+_TIFF_TAG_BITS_PER_SAMPLE = 258
+_TIFF_TAG_COMPRESSION = 259
+_TIFF_TAG_ORIENTATION = 274
+_TIFF_TAG_SAMPLES_PER_PIXEL = 277
+_TIFF_TAG_EXTRA_SAMPLES = 338
+_TIFF_COMPRESSION_PACKBITS = 32773
+_TIFF_TYPE_SIZES = {1: 1, 3: 2, 4: 4}
+_TIFF_TYPE_FORMATS = {1: 'B', 3: 'H', 4: 'I'}
+
+
+def _probe_tga(data):
+    header = parse_tga_header(data)
+    image_type = header['image_type']
+    depth = header['pixel_depth']
+    if image_type in (TGA_TYPE_COLOR_MAPPED, TGA_TYPE_RLE_COLOR_MAPPED):
+        channels = 4 if header['color_map_depth'] == 32 else 3
+        alpha_bits = 8 if channels == 4 else 0
+    elif image_type in (TGA_TYPE_GRAYSCALE, TGA_TYPE_RLE_GRAYSCALE):
+        # 灰度+Alpha解码后展开为BGRA
+        channels = 4 if depth == 16 else 1
+        alpha_bits = header['alpha_bits']
+    else:
+        channels = 4 if depth == 32 else 3
+        alpha_bits = header['alpha_bits']
+    return {
+        'format': 'TGA',
+        'width': header['width'],
+        'height': header['height'],
+        'bit_depth': depth,
+        'channels': channels,
+        'alpha_bits': alpha_bits,
+        'rle': header['rle'],
+        'origin': ('top' if header['top_origin'] else 'bottom') + ('-right' if header['right_origin'] else '-left'),
+    }
+
+
+def _probe_png(f):
+    f.seek(len(_PNG_SIGNATURE))
+    length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+    if chunk_type != b'IHDR' or length < 13:
+        raise ValueError("PNG文件缺少IHDR块")
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', _read_exact(f, 10))
+    if color_type not in _PNG_CHANNELS:
+        raise ValueError(f"未知的PNG颜色类型: {color_type}")
+    channels = _PNG_CHANNELS[color_type]
+    alpha_bits = bit_depth if color_type in (4, 6) else 0
+
+    # 调色板/灰度/RGB图像的透明度在tRNS块中，只扫描块头直到图像数据开始
+    f.seek(length - 10 + 4, os.SEEK_CUR)
+    while not alpha_bits:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', chunk)
+        if chunk_type == b'tRNS':
+            alpha_bits = 8
+        elif chunk_type in (b'IDAT', b'IEND'):
+            break
+        f.seek(length + 4, os.SEEK_CUR)
+
+    return {
+        'format': 'PNG',
+        'width': width,
+        'height': height,
+        'bit_depth': bit_depth if color_type == 3 else bit_depth * channels,
+        'channels': channels,
+        'alpha_bits': alpha_bits,
+        'rle': False,
+        'origin': 'top-left',
+    }
+
+
+def _probe_tiff(f, byte_order):
+    endian = '<' if byte_order == b'II' else '>'
+    f.seek(4)
+    (ifd_offset,) = struct.unpack(endian + 'I', _read_exact(f, 4))
+    f.seek(ifd_offset)
+    (entry_count,) = struct.unpack(endian + 'H', _read_exact(f, 2))
+    entries = _read_exact(f, entry_count * 12)
+
+    tags = {}
+    for i in range(entry_count):
+        tag, value_type, count = struct.unpack_from(endian + 'HHI', entries, i * 12)
+        if value_type not in _TIFF_TYPE_SIZES:
+            continue
+        value_size = _TIFF_TYPE_SIZES[value_type] * count
+        fmt = endian + _TIFF_TYPE_FORMATS[value_type] * count
+        if value_size <= 4:
+            values = struct.unpack_from(fmt, entries, i * 12 + 8)
+        elif tag == _TIFF_TAG_BITS_PER_SAMPLE:
+            # 多通道的位深存储在偏移处
+            (offset,) = struct.unpack_from(endian + 'I', entries, i * 12 + 8)
+            f.seek(offset)
+            values = struct.unpack(fmt, _read_exact(f, value_size))
+        else:
+            continue
+        tags[tag] = values
+
+    if _TIFF_TAG_WIDTH not in tags or _TIFF_TAG_HEIGHT not in tags:
+        raise ValueError("TIFF文件缺少尺寸标签")
+    bits = tags.get(_TIFF_TAG_BITS_PER_SAMPLE, (1,))
+    channels = tags.get(_TIFF_TAG_SAMPLES_PER_PIXEL, (1,))[0]
+    extra_samples = tags.get(_TIFF_TAG_EXTRA_SAMPLES, ())
+    alpha_bits = bits[-1] if any(sample in (1, 2) for sample in extra_samples) else 0
+    orientation = tags.get(_TIFF_TAG_ORIENTATION, (1,))[0]
+
+    return {
+        'format': 'TIFF',
+        'width': tags[_TIFF_TAG_WIDTH][0],
+        'height': tags[_TIFF_TAG_HEIGHT][0],
+        'bit_depth': bits[0] * channels if len(bits) == 1 else sum(bits),
+        'channels': channels,
+        'alpha_bits': alpha_bits,
+        'rle': tags.get(_TIFF_TAG_COMPRESSION, (1,))[0] == _TIFF_COMPRESSION_PACKBITS,
+        'origin': 'bottom-left' if orientation == 4 else 'top-left',
+    }
+
+
+def probe(file_path):
+    """
+    只解析文件头获取图像信息，不解码任何像素
+
+    支持TGA（18字节文件头）、PNG（IHDR与tRNS块）和TIFF（第一个IFD），
+    用于在解码前检查尺寸是否匹配、是否带Alpha等。
+
+    Args:
+        file_path (str): 图像文件路径
+
+    Returns:
+        dict: 包含以下字段
+            format (str): 'TGA'、'PNG' 或 'TIFF'
+            width (int), height (int): 图像尺寸
+            bit_depth (int): 每像素位数
+            channels (int): 解码后的通道数（与read_tga/OpenCV加载结果的通道数一致）
+            alpha_bits (int): Alpha位数，0表示没有Alpha
+            rle (bool): 是否为RLE（TIFF为PackBits）压缩
+            origin (str): 像素原点，如 'bottom-left'、'top-left'
+
+    Raises:
+        ValueError: 不是受支持的图像格式或文件头损坏
+        OSError: 文件读取失败
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(TGA_HEADER_SIZE)
+        if data.startswith(_PNG_SIGNATURE):
+            return _probe_png(f)
+        if data[:4] in _TIFF_SIGNATURES:
+            return _probe_tiff(f, data[:2])
+    if os.path.splitext(file_path)[1].lower() in ('.tga', '.tpic'):
+        return _probe_tga(data)
+    raise ValueError(f"无法识别的图像格式: {file_path}")
+
+
+# 写出时通道数 -> (图像类型, 位深, Alpha位数)
+_CHANNEL_LAYOUTS = {
+    1: (TGA_TYPE_GRAYSCALE, 8, 0),
+    2: (TGA_TYPE_GRAYSCALE, 16, 8),
+    3: (TGA_TYPE_TRUE_COLOR, 24, 0),
+    4: (TGA_TYPE_TRUE_COLOR, 32, 8),
+}
+
+
+def _image_layout(image):
+    """
+    根据数组形状确定写出的TGA图像类型、位深和描述字节
+
+    Returns:
+        tuple: (图像类型, 位深, Alpha位数, 像素数组)
+    """
+    if image.dtype != np.uint8:
+        raise ValueError(f"TGA只支持8位通道数据，当前类型: {image.dtype}")
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    channels = 1 if image.ndim == 2 else (image.shape[2] if image.ndim == 3 else None)
+    if channels not in _CHANNEL_LAYOUTS:
+        raise ValueError(f"不支持的图像格式用于保存: {image.shape}")
+    return (*_CHANNEL_LAYOUTS[channels], image)
+
+
+def build_tga_header(width, height, image_type, pixel_depth, alpha_bits, rle=False, top_origin=False):
+    """
+    构造18字节的TGA文件头
+
+    Returns:
+        bytes: 文件头数据
+    """
+    if not (0 < width <= 0xFFFF and 0 < height <= 0xFFFF):
+        raise ValueError(f"TGA图像尺寸超出范围: {width}x{height}")
+    if rle:
+        image_type += TGA_TYPE_RLE_COLOR_MAPPED - TGA_TYPE_COLOR_MAPPED
+    descriptor = alpha_bits | (_ORIGIN_TOP if top_origin else 0)
+    return _HEADER_STRUCT.pack(0, 0, image_type, 0, 0, 0, 0, 0,
+                               width, height, pixel_depth, descriptor)
+
+
+def estimate_tga_size(width, height, channels):
+    """
+    估算未压缩TGA文件的字节数（文件头 + 像素数据 + 文件尾）
+
+    Args:
+        width (int): 宽度
+        height (int): 高度
+        channels (int): 通道数
+
+    Returns:
+        int: 字节数
+    """
+    return TGA_HEADER_SIZE + width * height * channels + len(_TGA_FOOTER)
+
+
+def _encode_rle_row(row, bpp):
+    """
+    将一行像素编码为RLE数据包
+
+    连续3个及以上相同的像素编码为重复包，其余像素合并为原始包。
+
+    Args:
+        row (numpy.ndarray): 一行像素，形状为(W,)或(W, bpp)
+        bpp (int): 每像素字节数
+
+    Returns:
+        bytes: 编码后的数据
+    """
+    width = row.shape[0]
+    pixels = row.reshape(width, bpp)
+    data = pixels.tobytes()
+    if width > 1:
+        changed = np.any(pixels[1:] != pixels[:-1], axis=1)
+        starts = np.flatnonzero(np.concatenate(([True], changed)))
+    else:
+        starts = np.zeros(1, dtype=np.intp)
+    lengths = np.diff(np.append(starts, width))
+
+    out = bytearray()
+
+    def flush_raw(begin, end):
+        while begin < end:
+            count = min(end - begin, _RLE_MAX_PACKET)
+            out.append(count - 1)
+            out.extend(data[begin * bpp:(begin + count) * bpp])
+            begin += count
+
+    raw_start = 0
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        if length < 3:
+            continue
+        flush_raw(raw_start, start)
+        pixel = data[start * bpp:(start + 1) * bpp]
+        remaining = length
+        while remaining > 0:
+            count = min(remaining, _RLE_MAX_PACKET)
+            out.append(0x80 | (count - 1))
+            out += pixel
+            remaining -= count
+        raw_start = start + length
+    flush_raw(raw_start, width)
+    return bytes(out)
+
+
+def write_tga(file_path, image, rle=False, top_origin=False):
+    """
+    将OpenCV通道顺序的数组直接写为TGA文件
+
+    数组本身就是BGR(A)顺序，按行直接写出视图数据，不做通道交换也不复制整幅图像。
+    默认写出左下角原点，与PIL保存的TGA文件布局一致。
+
+    Args:
+        image (numpy.ndarray): 灰度(H, W)、灰度+Alpha(H, W, 2)、BGR(H, W, 3)或BGRA(H, W, 4)的uint8数组
+        file_path (str): 输出文件路径
+        rle (bool): 是否使用RLE压缩
+        top_origin (bool): 是否以左上角为原点写出
+
+    Raises:
+        ValueError: 图像格式不受支持
+        OSError: 文件写入失败
+    """
+    image_type, pixel_depth, alpha_bits, pixels = _image_layout(image)
+    height, width = pixels.shape[:2]
+    bpp = pixel_depth // 8
+    header = build_tga_header(width, height, image_type, pixel_depth, alpha_bits,
+                              rle=rle, top_origin=top_origin)
+
+    rows = range(height) if top_origin else range(height - 1, -1, -1)
+    with open(file_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+        f.write(header)
+        for y in rows:
+            row = pixels[y]
+            if rle:
+                f.write(_encode_rle_row(row, bpp))
+            elif row.flags.c_contiguous:
+                f.write(row.data)
+            else:
+                f.write(np.ascontiguousarray(row).data)
+        f.write(_TGA_FOOTER)
+
+
+class TgaStreamWriter:
+    """
+    按行带流式写出TGA文件，内存占用只与行带高度有关，不需要整幅图像数组
+
+    文件按TGA的存储顺序写出：左下角原点（默认，与write_tga写出的文件逐字节一致）时
+    从最后一行写到第一行，因此行带必须按bands()给出的顺序提交。
+    数据先写入临时文件，close()校验全部行都已写出后再替换目标文件，中途失败不会留下不完整的输出。
+
+    用法：
+        with TgaStreamWriter(path, width, height, 4) as writer:
+            for top, bottom in writer.bands(256):
+                writer.write_band(top, band_pixels)
+    """
+
+    def __init__(self, file_path, width, height, channels, rle=False, top_origin=False):
+        """
+        Args:
+            file_path (str): 输出文件路径
+            width (int): 宽度
+            height (int): 高度
+            channels (int): 通道数：1(灰度)、2(灰度+Alpha)、3(BGR)或4(BGRA)
+            rle (bool): 是否使用RLE压缩
+            top_origin (bool): 是否以左上角为原点写出
+
+        Raises:
+            ValueError: 尺寸或通道数不受支持
+            OSError: 文件无法创建
+        """
+        if channels not in _CHANNEL_LAYOUTS:
+            raise ValueError(f"不支持的通道数用于保存: {channels}")
+        image_type, pixel_depth, alpha_bits = _CHANNEL_LAYOUTS[channels]
+        header = build_tga_header(width, height, image_type, pixel_depth, alpha_bits,
+                                  rle=rle, top_origin=top_origin)
+        self.file_path = file_path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rle = rle
+        self.top_origin = top_origin
+        self._bpp = pixel_depth // 8
+        # 下一个行带的起始行（左上角原点）或结束行（左下角原点）
+        self._next_row = 0 if top_origin else height
+        self._temp_path = file_path + '.tmp'
+        self._file = open(self._temp_path, 'wb', buffering=_WRITE_BUFFER_SIZE)
+        try:
+            self._file.write(header)
+        except BaseException:
+            self.abort()
+            raise
+
+    def bands(self, band_rows):
+        """
+        按文件存储顺序划分行带
+
+        Args:
+            band_rows (int): 每个行带的行数
+
+        Returns:
+            list: [(起始行, 结束行)]，行号按图像从上到下计
+        """
+        band_rows = max(1, int(band_rows))
+        ranges = [(top, min(top + band_rows, self.height)) for top in range(0, self.height, band_rows)]
+        return ranges if self.top_origin else ranges[::-1]
+
+    def write_band(self, top, band):
+        """
+        写出一个行带
+
+        Args:
+            top (int): 行带在图像中的起始行
+            band (numpy.ndarray): 行带像素，灰度为(rows, W)，其他为(rows, W, C)的uint8数组
+
+        Raises:
+            ValueError: 行带格式不符或没有按存储顺序提交
+        """
+        if band.dtype != np.uint8:
+            raise ValueError(f"TGA只支持8位通道数据，当前类型: {band.dtype}")
+        if band.ndim == 3 and band.shape[2] == 1:
+            band = band[:, :, 0]
+        channels = 1 if band.ndim == 2 else band.shape[2]
+        if band.ndim not in (2, 3) or band.shape[1] != self.width or channels != self.channels:
+            raise ValueError(f"行带形状 {band.shape} 与输出 {self.width}x{self.height}x{self.channels} 不符")
+        bottom = top + band.shape[0]
+        expected = top if self.top_origin else bottom
+        if expected != self._next_row or top < 0 or bottom > self.height:
+            raise ValueError(f"行带 [{top}, {bottom}) 没有按存储顺序提交")
+
+        rows = range(band.shape[0]) if self.top_origin else range(band.shape[0] - 1, -1, -1)
+        for y in rows:
+            row = band[y]
+            if self.rle:
+                self._file.write(_encode_rle_row(row, self._bpp))
+            elif row.flags.c_contiguous:
+                self._file.write(row.data)
+            else:
+                self._file.write(np.ascontiguousarray(row).data)
+        self._next_row = bottom if self.top_origin else top
+
+    def close(self):
+        """
+        写出文件尾并替换目标文件
+
+        Raises:
+            ValueError: 还有行没有写出
+        """
+        if self._file is None:
+            return
+        remaining = self.height - self._next_row if self.top_origin else self._next_row
+        if remaining:
+            self.abort()
+            raise ValueError(f"还有 {remaining} 行没有写出: {self.file_path}")
+        try:
+            self._file.write(_TGA_FOOTER)
+            self._file.close()
+            self._file = None
+            os.replace(self._temp_path, self.file_path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """
+        放弃写出并删除临时文件
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self._temp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_tga_channels(file_path, channels, height, width, band_rows=None, rle=False, top_origin=False):
+    """
+    由逐通道的来源合成并直接写出TGA文件（合成即写出）
+
+    每个行带在一块复用的小缓冲区中交错各通道后立即写出，
+    不分配整幅的交错输出数组，也不需要通道交换的副本；数组来源可以是内存映射上的跨步视图，
+    只有写到的行才会从磁盘读入。写出的文件与先合成整幅数组再调用write_tga逐字节一致。
+
+    Args:
+        file_path (str): 输出文件路径
+        channels (list): 按BGR(A)顺序的输出通道来源（灰度为1个，灰度+Alpha为2个），每项为：
+            - (H, W)的uint8数组或视图
+            - 0-255的整数常量
+            - callable(top, bottom, band)：派生通道，band为当前行带(rows, W, C)的缓冲区，
+              其中数组和常量通道已经填好，返回(rows, W)的数组；派生通道按列表顺序计算
+        height (int): 高度
+        width (int): 宽度
+        band_rows (int): 每个行带的行数，None表示按COMPOSE_BAND_PIXELS自动确定
+        rle (bool): 是否使用RLE压缩
+        top_origin (bool): 是否以左上角为原点写出
+
+    Raises:
+        ValueError: 通道数或来源不受支持、数组尺寸不符
+        OSError: 文件写入失败
+    """
+    channel_total = len(channels)
+    views = []
+    derived = []
+    constants = []
+    for index, source in enumerate(channels):
+        if callable(source):
+            derived.append((index, source))
+        elif isinstance(source, (int, np.integer)) and not isinstance(source, bool):
+            if not 0 <= source <= 255:
+                raise ValueError(f"通道 {index} 的常量超出范围: {source}")
+            constants.append((index, int(source)))
+        else:
+            if source.shape != (height, width):
+                raise ValueError(f"通道 {index} 的尺寸 {source.shape} 与输出 {height}x{width} 不符")
+            views.append((index, source))
+
+    if band_rows is None:
+        band_rows = COMPOSE_BAND_PIXELS // max(width, 1)
+    band_rows = max(1, min(int(band_rows), height))
+    buffer = np.empty((band_rows, width, channel_total), dtype=np.uint8)
+    # 常量通道在复用的缓冲区中只填充一次
+    for index, value in constants:
+        buffer[:, :, index] = value
+
+    with TgaStreamWriter(file_path, width, height, channel_total, rle=rle, top_origin=top_origin) as writer:
+        for top, bottom in writer.bands(band_rows):
+            band = buffer[:bottom - top]
+            for index, view in views:
+                band[:, :, index] = view[top:bottom]
+            for index, func in derived:
+                band[:, :, index] = func(top, bottom, band)
+            writer.write_band(top, band)
@@ -6,16 +6,69 @@
 递归搜索目录下的所有贴图，根据名称后缀识别贴图通道转换规则，
 将_MRA贴图的R通道覆盖到_C贴图的A通道，并另存为_DM后缀的新纹理，
 所有操作的贴图格式都是tga格式
+
+通道规则定义在packing_rules/delta_force_weapon.json中，由texture_rules统一执行，
+可以通过--rules指定其他规则文件
+
+日志分为三级：默认每个贴图组输出一行汇总并显示进度条，-v输出每张贴图的读取、保存细节，
+-q只输出警告和错误；--log-json把每个贴图组的结构化记录追加写入JSON Lines文件。
+
+--watch在处理完成后继续监视源贴图，按名称后缀把变化的文件对应到贴图组，只重新生成这些组。
+
+构建机等无界面环境使用--headless：可以指定多个目录，用--include/--exclude按贴图组筛选，
+日志输出到stderr，stdout只输出一份JSON汇总，有失败的输出时退出码为1，参数或目录错误时为2。
+该模式下不会导入tkinter。
 """
 
 import os
+import io
+import json
+import time
+import logging
+import fnmatch
+import argparse
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import cv2
 import numpy as np
 from PIL import Image
-import tkinter as tk
-from tkinter import filedialog, messagebox
 import sys
 
+import tga_codec
+import texture_index
+import texture_log
+import texture_manifest
+import texture_profiler
+import texture_stats
+import texture_watch
+import texture_rules
+import texture_writer
+
+
+# 转换器版本，修改转换流程时需要递增，使增量构建清单中的旧记录失效（规则文件的变化由其哈希体现）
+CONVERTER_VERSION = '1'
+
+# 默认的通道打包规则
+DEFAULT_RULES = 'delta_force_weapon'
+
+# 完成对话框中最多列出的文件数
+COMPLETION_LIST_LIMIT = 50
+
+_default_spec = None
+
+logger = texture_log.get_logger('convert')
+
+
+def get_default_spec():
+    """
+    获取默认的通道打包规则（首次使用时读取规则文件）
+    """
+    global _default_spec
+    if _default_spec is None:
+        _default_spec = texture_rules.load_rule_spec(DEFAULT_RULES)
+    return _default_spec
+
 
 def load_tga_image(file_path):
     """
@@ -28,6 +81,15 @@ def load_tga_image(file_path):
     Returns:
         numpy.ndarray: 图像数据，OpenCV格式(BGR或BGRA)
     """
+    # 方法0: 直接解码TGA，像素直接读入OpenCV通道顺序的数组
+    if file_path.lower().endswith('.tga'):
+        try:
+            image = tga_codec.read_tga(file_path)
+            logger.debug(f"直接解码TGA成功 {image.shape}: {file_path}")
+            return image
+        except Exception as e:
+            logger.warning(f"直接解码TGA失败: {file_path}, 错误: {str(e)}")
+
     # 方法1: 使用PIL加载
     try:
         # 使用PIL打开图像
@@ -39,599 +101,651 @@ def load_tga_image(file_path):
             rgba_array = np.array(pil_image)
             # PIL使用RGBA，OpenCV使用BGRA
             bgra_array = rgba_array[:, :, [2, 1, 0, 3]]  # RGB->BGR, A保持不变
-            print(f"PIL读取成功 (RGBA): {file_path}")
+            logger.debug(f"PIL读取成功 (RGBA): {file_path}")
             return bgra_array
         elif pil_image.mode == 'RGB':
             # RGB格式
             rgb_array = np.array(pil_image)
             # PIL使用RGB，OpenCV使用BGR
             bgr_array = rgb_array[:, :, [2, 1, 0]]  # RGB->BGR
-            print(f"PIL读取成功 (RGB): {file_path}")
+            logger.debug(f"PIL读取成功 (RGB): {file_path}")
             return bgr_array
         elif pil_image.mode == 'P':  # 调色板模式
             # 转换为RGB
             pil_image = pil_image.convert('RGB')
             rgb_array = np.array(pil_image)
             bgr_array = rgb_array[:, :, [2, 1, 0]]
-            print(f"PIL读取成功 (Palette->RGB): {file_path}")
+            logger.debug(f"PIL读取成功 (Palette->RGB): {file_path}")
             return bgr_array
         elif pil_image.mode == 'LA':  # 灰度+Alpha
             # 转换为RGBA
             pil_image = pil_image.convert('RGBA')
             rgba_array = np.array(pil_image)
             bgra_array = rgba_array[:, :, [2, 1, 0, 3]]
-            print(f"PIL读取成功 (LA->RGBA): {file_path}")
+            logger.debug(f"PIL读取成功 (LA->RGBA): {file_path}")
             return bgra_array
         elif pil_image.mode == 'L':  # 灰度
             gray_array = np.array(pil_image)
-            print(f"PIL读取成功 (L): {file_path}")
+            logger.debug(f"PIL读取成功 (L): {file_path}")
             return gray_array
         else:
             # 其他格式，尝试转换为RGBA再处理
             pil_image = pil_image.convert('RGBA')
             rgba_array = np.array(pil_image)
             bgra_array = rgba_array[:, :, [2, 1, 0, 3]]
-            print(f"PIL读取成功 (Other->{pil_image.mode}->RGBA): {file_path}")
+            logger.debug(f"PIL读取成功 (Other->{pil_image.mode}->RGBA): {file_path}")
             return bgra_array
     except Exception as e:
-        print(f"PIL读取图像失败: {file_path}, 错误: {str(e)}")
+        logger.warning(f"PIL读取图像失败: {file_path}, 错误: {str(e)}")
     
     # 方法2: 回退到OpenCV
     try:
         image = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
         if image is not None:
-            print(f"OpenCV读取成功: {file_path}")
+            logger.debug(f"OpenCV读取成功: {file_path}")
             return image
         else:
-            print(f"OpenCV无法读取图像: {file_path}")
+            logger.warning(f"OpenCV无法读取图像: {file_path}")
     except Exception as e:
-        print(f"OpenCV读取图像失败: {file_path}, 错误: {str(e)}")
+        logger.warning(f"OpenCV读取图像失败: {file_path}, 错误: {str(e)}")
     
     # 如果两种方法都失败
     return None
 
 
-def convert_texture_channels(base_directory):
+def _measure_decoded(args, image):
+    """性能统计：解码得到的字节数和像素数"""
+    return image.nbytes, image.shape[0] * image.shape[1]
+
+
+def _measure_written(args, result):
+    """性能统计：写出的图像字节数和像素数"""
+    image = args[0]
+    return image.nbytes, image.shape[0] * image.shape[1]
+
+
+@texture_profiler.profiled('load', _measure_decoded)
+def open_texture_channels(file_path):
     """
-    递归搜索目录中的贴图，根据名称后缀识别贴图通道转换规则，
-    将_MRA贴图的R通道覆盖到_C贴图的A通道，并另存为_DM后缀的新纹理。
+    打开贴图并返回按通道惰性访问的句柄
+    未压缩的TGA通过内存映射访问，只读取实际用到的通道数据；
+    其他情况回退到load_tga_image完整解码。
+    句柄在组内用到它的多个输出之间共享，返回的句柄只读，需要修改时使用to_array()获取副本
+
+    Args:
+        file_path (str): 贴图文件路径
+
+    Returns:
+        tga_codec.LazyTgaImage: 图像句柄，支持数组式切片；读取失败返回None
+    """
+    if file_path.lower().endswith('.tga'):
+        try:
+            image = tga_codec.open_tga_lazy(file_path)
+            logger.debug(f"{'映射' if image.mapped else '解码'}TGA成功 {image.shape}: {file_path}")
+            # 句柄由组内多个输出共享，禁止原地修改
+            image.pixels.flags.writeable = False
+            return image
+        except Exception as e:
+            logger.warning(f"映射TGA失败: {file_path}, 错误: {str(e)}")
+
+    image = load_tga_image(file_path)
+    if image is None:
+        return None
+    image.flags.writeable = False
+    return tga_codec.LazyTgaImage(image, file_path)
+
+
+def collect_texture_groups(base_directory, spec=None):
+    """
+    递归搜索目录中的贴图，按基础名称和后缀分组，并为每组找好备用名称的源贴图（例如不带下划线的UniqueMask）
+    目录树只遍历一次，备用匹配通过目录索引的字典查找完成
 
     Args:
         base_directory (str): 要搜索的基础目录路径
-        
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+
     Returns:
-        list: 生成的文件路径列表
+        list: 贴图组列表，每项为 {'root': 目录, 'base_key': 基础名称, 'files': {源标签: 路径}}，按扫描顺序排列
     """
-    generated_files = []
-    
-    # 检查基础目录是否存在
-    if not os.path.exists(base_directory):
-        print(f"错误: 目录不存在: {base_directory}")
-        return generated_files
-        
-    # 遍历目录及其子目录
-    for root, dirs, files in os.walk(base_directory):
-        print(f"正在扫描目录: {root}")
-        
-        # 创建文件映射，按基础名称分组
-        file_map = {}
-
-        # 筛选出相关的贴图文件
-        for file in files:
-            if file.lower().endswith('.tga'):
-                # 获取文件名（不含扩展名）
-                base_name = os.path.splitext(file)[0]
-
-                # 按照后缀分类文件
-                if base_name.endswith('_C'):
-                    base_key = base_name[:-2]  # 移除 "_C"
-                    if base_key not in file_map:
-                        file_map[base_key] = {}
-                    file_map[base_key]['C'] = os.path.join(root, file)
-                elif base_name.endswith('_MRA'):
-                    base_key = base_name[:-4]  # 移除 "_MRA"
-                    if base_key not in file_map:
-                        file_map[base_key] = {}
-                    file_map[base_key]['MRA'] = os.path.join(root, file)
-                elif base_name.endswith('_NCE'):
-                    base_key = base_name[:-4]  # 移除 "_NCE"
-                    if base_key not in file_map:
-                        file_map[base_key] = {}
-                    file_map[base_key]['NCE'] = os.path.join(root, file)
-                elif base_name.endswith('_UniqueMask'):
-                    base_key = base_name[:-10]  # 移除 "_UniqueMask"
-                    if base_key not in file_map:
-                        file_map[base_key] = {}
-                    file_map[base_key]['UniqueMask'] = os.path.join(root, file)
-
-        # 处理每一对匹配的文件
-        processed_count = 0
-        total_files = sum(1 for fg in file_map.values() if 'NCE' in fg)
-        current_file = 0
-        
-        for base_key, file_group in file_map.items():
-            if 'C' in file_group and 'MRA' in file_group:
-                c_file_path = file_group['C']
-                mra_file_path = file_group['MRA']
-                
-                # 构造输出文件路径
-                dm_file_path = os.path.join(root, f"{base_key}_DM.tga")
-                
-                # 执行通道转换
-                if process_texture_conversion(c_file_path, mra_file_path, dm_file_path):
-                    generated_files.append(dm_file_path)
-                    processed_count += 1
-                    
-            # 处理ORS贴图创建
-            if 'C' in file_group and 'MRA' in file_group:
-                c_file_path = file_group['C']
-                mra_file_path = file_group['MRA']
-                
-                # 构造ORS输出文件路径
-                ors_file_path = os.path.join(root, f"{base_key}_ORS.tga")
-                
-                # 创建ORS贴图
-                if create_ors_texture(c_file_path, mra_file_path, ors_file_path):
-                    generated_files.append(ors_file_path)
-                    processed_count += 1
-                    
-            # 处理N贴图和S贴图创建
-            if 'NCE' in file_group:
-                current_file += 1
-                progress = int(current_file/total_files*100) if total_files > 0 else 0
-                print(f"\n处理进度: {current_file}/{total_files} ({progress}%)")
-                print(f"正在处理: {base_key}")
-                
-                nce_file_path = file_group['NCE']
-                
-                # 构造N和S输出文件路径
-                n_file_path = os.path.join(root, f"{base_key}_N.tga")
-                s_file_path = os.path.join(root, f"{base_key}_S.tga")
-                special_mask_file_path = os.path.join(root, f"{base_key}_SpecialMask.tga")
-                
-                # 创建N贴图
-                if create_n_texture(nce_file_path, n_file_path):
-                    generated_files.append(n_file_path)
-                    processed_count += 1
-                    
-                # 创建S贴图和Special贴图
-                unique_mask_path = file_group.get('UniqueMask', None)
-                # 如果上面的方法没有找到UniqueMask，尝试其他匹配方式
-                if unique_mask_path is None:
-                    # 查找是否有匹配的UniqueMask文件（不带下划线前缀的情况）
-                    potential_unique_mask = f"{base_key}UniqueMask"
-                    for file in files:
-                        if os.path.splitext(file)[0] == potential_unique_mask:
-                            unique_mask_path = os.path.join(root, file)
-                            print(f"通过备用方法找到UniqueMask文件: {file}")
-                            break
-                    
-                    # 如果还是没找到，尝试直接构造文件名
-                    if unique_mask_path is None:
-                        potential_unique_mask_file = f"{base_key}_UniqueMask.tga"
-                        potential_path = os.path.join(root, potential_unique_mask_file)
-                        if os.path.exists(potential_path):
-                            unique_mask_path = potential_path
-                            print(f"通过文件名构造找到UniqueMask文件: {potential_unique_mask_file}")
-                
-                success = create_s_and_special_textures(nce_file_path, unique_mask_path, s_file_path, special_mask_file_path)
-                if success:
-                    generated_files.append(special_mask_file_path)
-                    if os.path.exists(s_file_path):
-                        generated_files.append(s_file_path)
-                    processed_count += 1
-                    print(f"完成处理: {base_key}")
-                else:
-                    print(f"处理失败: {base_key}")
+    spec = spec or get_default_spec()
+    groups = []
 
-        if total_files > 0:
-            print(f"\n总体进度: 完成 {processed_count}/{total_files} 个文件的处理")
+    for directory_index in texture_index.iter_texture_directories(base_directory, spec.suffixes):
+        root = directory_index['root']
+        logger.debug(f"正在扫描目录: {root}")
 
-        if processed_count > 0:
-            print(f"在目录 {root} 中处理了 {processed_count} 个操作")
-            
-    return generated_files
+        for base_key, file_group in directory_index['groups'].items():
+            group = _complete_group(directory_index, base_key, file_group, spec)
+            if group is not None:
+                groups.append(group)
+
+    return groups
 
 
-def process_texture_conversion(c_file_path, mra_file_path, dm_file_path):
+def _complete_group(directory_index, base_key, file_group, spec):
     """
-    将_MRA贴图的R通道覆盖到_C贴图的A通道，并保存为_DM后缀的新纹理
+    检查一组源贴图是否有可生成的输出，并按规则中的备用文件名补全缺少的源，例如 {base_key}UniqueMask
 
-    Args:
-        c_file_path (str): _C贴图文件路径
-        mra_file_path (str): _MRA贴图文件路径
-        dm_file_path (str): 输出_DM贴图文件路径
-        
     Returns:
-        bool: 是否成功处理
+        dict: 贴图组，没有可生成的输出时返回None
     """
-    try:
-        print(f"\n处理DM文件对:")
-        print(f"  C文件: {os.path.basename(c_file_path)}")
-        print(f"  MRA文件: {os.path.basename(mra_file_path)}")
-        
-        # 读取_C贴图 (Color贴图)
-        c_image = load_tga_image(c_file_path)
-        if c_image is None:
-            print(f"无法读取C文件: {c_file_path}")
-            return False
+    if not spec.has_work(file_group, base_key):
+        return None
+    for label, stem_pattern in spec.fallback_stems.items():
+        if label in file_group:
+            continue
+        fallback_path = texture_index.find_by_stem(directory_index, stem_pattern.format(base=base_key))
+        if fallback_path is not None:
+            file_group[label] = fallback_path
+            logger.debug(f"通过备用方法找到{label}文件: {os.path.basename(fallback_path)}")
+    return {'root': directory_index['root'], 'base_key': base_key, 'files': file_group}
 
-        # 读取_MRA贴图 (Metallic-Roughness-Ambient Occlusion贴图)
-        mra_image = load_tga_image(mra_file_path)
-        if mra_image is None:
-            print(f"无法读取MRA文件: {mra_file_path}")
-            return False
 
-        # 检查图像尺寸是否匹配
-        if c_image.shape[:2] != mra_image.shape[:2]:
-            print(f"图像尺寸不匹配:")
-            print(f"  {c_file_path}: {c_image.shape[:2]}")
-            print(f"  {mra_file_path}: {mra_image.shape[:2]}")
-            return False
+def group_of_source_file(file_path, spec=None):
+    """
+    确定一个源贴图文件属于哪个贴图组（按名称后缀或备用文件名）
 
-        # 如果_C贴图没有alpha通道，则添加一个
-        if len(c_image.shape) == 2:
-            # 灰度图像，转换为BGRA
-            height, width = c_image.shape
-            b_channel = c_image
-            g_channel = c_image
-            r_channel = c_image
-            a_channel = np.full((height, width), 255, dtype=c_image.dtype)
-            c_image = np.stack([b_channel, g_channel, r_channel, a_channel], axis=2)
-            print("为灰度图像添加了alpha通道")
-        elif len(c_image.shape) == 3 and c_image.shape[2] == 3:
-            # BGR图像，添加alpha通道，默认值为255(完全不透明)
-            alpha_channel = np.full((c_image.shape[0], c_image.shape[1], 1), 255, dtype=c_image.dtype)
-            c_image = np.concatenate((c_image, alpha_channel), axis=2)
-            print("为BGR图像添加了alpha通道")
-
-        # 获取_MRA贴图的R通道 (在BGR格式中，R通道是索引2)
-        # 确保我们能正确获取红色通道
-        if len(mra_image.shape) == 3:
-            mra_r_channel = mra_image[:, :, 2]  # BGR格式中的R通道
-            print(f"从MRA图像获取R通道，形状: {mra_r_channel.shape}")
-        elif len(mra_image.shape) == 2:
-            mra_r_channel = mra_image  # 灰度图像
-            print(f"从MRA图像获取灰度通道，形状: {mra_r_channel.shape}")
-        else:
-            print(f"MRA图像格式未知: {mra_image.shape}")
-            return False
+    Args:
+        file_path (str): 文件路径，文件可以已经被删除
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
 
-        # 将_MRA贴图的R通道赋值给_C贴图的A通道 (索引3)
-        c_image[:, :, 3] = mra_r_channel
-        print("成功将MRA的R通道复制到C图像的A通道")
+    Returns:
+        tuple: (目录, 基础名称)，不是源贴图时返回None
+    """
+    spec = spec or get_default_spec()
+    root, file_name = os.path.split(file_path)
+    classified = texture_index.classify_texture_name(file_name, spec.suffixes, ('.tga',))
+    if classified is not None:
+        return root, classified[0]
+    stem, ext = os.path.splitext(file_name)
+    if ext.lower() != '.tga':
+        return None
+    for stem_pattern in spec.fallback_stems.values():
+        prefix, _, suffix = stem_pattern.partition('{base}')
+        if len(stem) > len(prefix) + len(suffix) and stem.startswith(prefix) and stem.endswith(suffix):
+            return root, stem[len(prefix):len(stem) - len(suffix)]
+    return None
 
-        # 保存为_DM贴图
-        if save_tga_image(c_image, dm_file_path):
-            print(f"成功生成文件: {os.path.basename(dm_file_path)}")
-            return True
-        else:
-            print(f"保存文件失败: {dm_file_path}")
-            return False
 
-    except Exception as e:
-        print(f"处理DM文件时出错:")
-        print(f"  C文件: {c_file_path}")
-        print(f"  MRA文件: {mra_file_path}")
-        print(f"  错误: {str(e)}")
-        return False
+def collect_texture_group(root, base_key, spec=None):
+    """
+    只扫描一个目录，重新收集其中一个贴图组
+
+    Returns:
+        dict: 贴图组，源贴图不足以生成任何输出时返回None
+    """
+    spec = spec or get_default_spec()
+    directory_index = texture_index.index_directory(root, spec.suffixes)
+    return _complete_group(directory_index, base_key, directory_index['groups'].get(base_key, {}), spec)
 
 
-def create_ors_texture(c_file_path, mra_file_path, ors_file_path):
+def process_texture_group(group, spec=None, group_threads=1, max_megapixels=None, use_stats=False, band_rows=None):
     """
-    创建_ORS贴图：
-    1. 将_MRA贴图的B通道放到_ORS贴图的R通道
-    2. 将_MRA贴图的G通道放到_ORS贴图的G通道
-    3. _ORS贴图的B通道填0.3的值
-    4. 将_C贴图的A通道放到_ORS贴图的A通道
+    按通道打包规则处理一个贴图组，生成_DM、_ORS、_N、_S和_SpecialMask贴图
+    组内每张源贴图只解码一次，最后一个使用它的输出完成后立即释放
 
     Args:
-        c_file_path (str): _C贴图文件路径
-        mra_file_path (str): _MRA贴图文件路径
-        ors_file_path (str): 输出_ORS贴图文件路径
-        
+        group (dict): collect_texture_groups返回的贴图组
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        group_threads (int): 组内并行生成输出的线程数
+        max_megapixels (float): 组内同时占用的像素数上限（百万像素），None表示不限制
+        use_stats (bool): 是否使用贴图目录中的统计索引（_S的生成条件直接查询索引）
+        band_rows (int): 按行带流式生成并直接写出输出贴图，每个行带的行数；
+            None表示启用后台写出时整幅生成，同步写出时按默认行带合成即写出
+
     Returns:
-        bool: 是否成功创建
+        dict: 处理结果 {'root', 'base_key', 'generated': 生成的文件列表, 'failed': 失败的输出列表, 'operations': 成功的操作数,
+                        'outputs': 每个输出的状态, 'seconds': 耗时}
     """
-    try:
-        print(f"\n创建ORS贴图:")
-        print(f"  C文件: {os.path.basename(c_file_path)}")
-        print(f"  MRA文件: {os.path.basename(mra_file_path)}")
-        
-        # 读取_C贴图和_MRA贴图
-        c_image = load_tga_image(c_file_path)
-        if c_image is None:
-            print(f"无法读取C文件: {c_file_path}")
-            return False
-            
-        mra_image = load_tga_image(mra_file_path)
-        if mra_image is None:
-            print(f"无法读取MRA文件: {mra_file_path}")
-            return False
+    spec = spec or get_default_spec()
+    base_key = group['base_key']
+    generated = []
+    failed = []
 
-        # 检查图像尺寸是否匹配
-        if c_image.shape[:2] != mra_image.shape[:2]:
-            print(f"图像尺寸不匹配:")
-            print(f"  {c_file_path}: {c_image.shape[:2]}")
-            print(f"  {mra_file_path}: {mra_image.shape[:2]}")
-            return False
+    logger.debug(f"正在处理: {base_key}")
+    start = time.perf_counter()
+    # 有后台写出线程池时整幅生成后排队写出，使写出与下一组的计算重叠；
+    # 同步写出时合成即写出，不分配整幅输出数组
+    saver = save_tga_image if texture_writer.get_active_writer() is not None else None
+    source_report = {}
+    with texture_profiler.get_profiler().group(os.path.join(group['root'], base_key)):
+        outputs = texture_rules.render_group(spec, group['files'], open_texture_channels, saver, base_key,
+                                             workers=group_threads, max_megapixels=max_megapixels,
+                                             use_stats=use_stats, band_rows=band_rows, source_report=source_report)
 
-        height, width = c_image.shape[:2]
-        
-        # 创建ORS贴图 (BGRA格式)
-        ors_image = np.zeros((height, width, 4), dtype=np.uint8)
-        
-        # 1. 将_MRA贴图的B通道(索引0)放到_ORS贴图的R通道(索引2)
-        if len(mra_image.shape) == 3:
-            ors_image[:, :, 2] = mra_image[:, :, 0]  # B->R
-        elif len(mra_image.shape) == 2:
-            ors_image[:, :, 2] = mra_image  # 灰度->R
-            
-        # 2. 将_MRA贴图的G通道(索引1)放到_ORS贴图的G通道(索引1)
-        if len(mra_image.shape) == 3:
-            ors_image[:, :, 1] = mra_image[:, :, 1]  # G->G
-        elif len(mra_image.shape) == 2:
-            ors_image[:, :, 1] = mra_image  # 灰度->G
-            
-        # 3. _ORS贴图的B通道(索引0)填0.3的值 (约77)
-        ors_image[:, :, 0] = np.full((height, width), int(0.3 * 255), dtype=np.uint8)
-        
-        # 4. 将_C贴图的A通道放到_ORS贴图的A通道(索引3)
-        if len(c_image.shape) == 3 and c_image.shape[2] == 4:
-            ors_image[:, :, 3] = c_image[:, :, 3]  # A->A
-        else:
-            # 如果C图像没有alpha通道，默认为255
-            ors_image[:, :, 3] = np.full((height, width), 255, dtype=np.uint8)
-            
-        # 保存ORS贴图
-        if save_tga_image(ors_image, ors_file_path):
-            print(f"成功生成ORS文件: {os.path.basename(ors_file_path)}")
-            return True
-        else:
-            print(f"保存ORS文件失败: {ors_file_path}")
-            return False
-            
-    except Exception as e:
-        print(f"创建ORS贴图时出错:")
-        print(f"  C文件: {c_file_path}")
-        print(f"  MRA文件: {mra_file_path}")
-        print(f"  错误: {str(e)}")
-        return False
+    for output in outputs:
+        if output['status'] == 'written':
+            generated.append(output['path'])
+        elif output['status'] == 'failed':
+            failed.append(f"{base_key}{output['suffix']}")
+
+    return {
+        'root': group['root'],
+        'base_key': base_key,
+        'generated': generated,
+        'failed': failed,
+        'operations': len(generated),
+        'outputs': [{'name': output['name'], 'status': output['status'], 'reason': output['reason'],
+                     'constant_channels': output['constant_channels']} for output in outputs],
+        'seconds': time.perf_counter() - start,
+        'decoded': source_report.get('decoded', 0),
+        'peak_source_bytes': source_report.get('peak_source_bytes', 0),
+    }
 
 
-def create_n_texture(nce_file_path, n_file_path):
+def group_record(result):
+    """
+    由处理结果生成贴图组的结构化日志记录
     """
-    创建_N贴图：
-    1. 将_NCE后缀的RG通道放到_N后缀RG通道
-    2. 通过RG通道的法线信息计算出法线B通道的值
+    return {
+        'group': os.path.join(result['root'], result['base_key']),
+        'status': 'failed' if result['failed'] else 'ok',
+        'generated': [os.path.basename(file_path) for file_path in result['generated']],
+        'failed': result['failed'],
+        'outputs': result.get('outputs', []),
+        'seconds': round(result.get('seconds', 0.0), 4),
+        'decoded': result.get('decoded', 0),
+        'peak_source_bytes': result.get('peak_source_bytes', 0),
+    }
+
+
+def log_source_summary(results):
+    """
+    输出本次运行的源贴图解码次数和单个贴图组的源贴图峰值占用，用于评估构建机器上合适的内存预算
+    """
+    finished = [result for result in results if result is not None]
+    decoded = sum(result.get('decoded', 0) for result in finished)
+    peak_bytes = max((result.get('peak_source_bytes', 0) for result in finished), default=0)
+    logger.info(f"源贴图解码 {decoded} 次, 单组源贴图峰值占用 {peak_bytes / (1024 * 1024):.1f}MB")
+
+
+def _apply_write_errors(results, writer):
+    """
+    把后台写出失败的文件从生成列表移到失败列表
+    """
+    if writer is None or not writer.errors:
+        return
+    for result in results:
+        for file_path in list(result['generated']):
+            if file_path in writer.errors:
+                logger.warning(f"保存文件失败: {file_path}, 错误: {writer.errors[file_path]}")
+                result['generated'].remove(file_path)
+                result['failed'].append(os.path.splitext(os.path.basename(file_path))[0])
+
+
+def _process_texture_group_in_worker(group, writers, spec, group_threads, max_megapixels, use_stats, band_rows,
+                                     log_level):
+    """
+    在子进程中处理一个贴图组，捕获该组的全部输出，由主进程整体打印，避免多进程日志交错
+    """
+    # 子进程只输出到捕获的控制台，结构化记录由主进程写出
+    if log_level is not None:
+        texture_log.configure(log_level)
+    log = io.StringIO()
+    # 每组单独导出统计，由主进程合并
+    texture_profiler.get_profiler().reset()
+    with contextlib.redirect_stdout(log):
+        try:
+            with texture_writer.write_behind(write_tga_image, writers) as writer:
+                result = process_texture_group(group, spec, group_threads, max_megapixels, use_stats, band_rows)
+            _apply_write_errors([result], writer)
+        except Exception as e:
+            logger.error(f"处理贴图组 {group['base_key']} 时出错: {str(e)}")
+            result = {
+                'root': group['root'],
+                'base_key': group['base_key'],
+                'generated': [],
+                'failed': [group['base_key']],
+                'operations': 0,
+            }
+    result['log'] = log.getvalue()
+    result['profile'] = texture_profiler.get_profiler().snapshot()
+    # 统计索引由主进程统一保存，子进程只传回新增的记录
+    result['stats_entries'] = texture_stats.take_new_entries()
+    return result
+
+
+def run_texture_groups(groups, jobs=1, writers=texture_writer.DEFAULT_WRITER_THREADS, spec=None,
+                       group_threads=1, max_megapixels=None, use_stats=False, on_group_done=None, band_rows=None):
+    """
+    处理所有贴图组，jobs大于1时分发到进程池并行处理
+    生成的贴图由后台写出线程保存，写出与下一组的解码和计算重叠
 
     Args:
-        nce_file_path (str): _NCE贴图文件路径
-        n_file_path (str): 输出_N贴图文件路径
-        
+        groups (list): collect_texture_groups返回的贴图组列表
+        jobs (int): 并行进程数，1表示在当前进程中串行处理
+        writers (int): 每个进程的后台写出线程数，0表示同步写出
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        group_threads (int): 组内并行生成输出的线程数
+        max_megapixels (float): 每个进程的组内像素数上限（百万像素），None表示不限制
+        use_stats (bool): 是否使用贴图目录中的统计索引
+        on_group_done (callable): on_group_done(group, result) 在一个组的输出全部写完后调用（在主进程中）
+        band_rows (int): 按行带流式生成并直接写出输出贴图，每个行带的行数；None表示整幅生成
+
     Returns:
-        bool: 是否成功创建
+        list: 与groups顺序一致的处理结果列表
     """
-    try:
-        print(f"\n创建N贴图:")
-        print(f"  NCE文件: {os.path.basename(nce_file_path)}")
-        
-        # 读取_NCE贴图
-        nce_image = load_tga_image(nce_file_path)
-        if nce_image is None:
-            print(f"无法读取NCE文件: {nce_file_path}")
-            return False
+    spec = spec or get_default_spec()
+    total = len(groups)
+    results = [None] * total
+    show_progress = logger.isEnabledFor(logging.INFO)
+    on_group_done = on_group_done or (lambda group, result: None)
 
-        height, width = nce_image.shape[:2]
-        
-        # 创建N贴图 (BGR格式)
-        n_image = np.zeros((height, width, 3), dtype=np.uint8)
-        
-        # 1. 将_NCE的RG通道放到_N的RG通道
-        if len(nce_image.shape) == 3:
-            n_image[:, :, 2] = nce_image[:, :, 2]  # R->R
-            n_image[:, :, 1] = nce_image[:, :, 1]  # G->G
-        elif len(nce_image.shape) == 2:
-            # 灰度图像，复制到RG通道
-            n_image[:, :, 2] = nce_image  # 灰度->R
-            n_image[:, :, 1] = nce_image  # 灰度->G
-            
-        # 2. 通过RG通道计算法线B通道的值
-        # 法线贴图公式: B = sqrt(1 - R^2 - G^2)
-        # 归一化RG通道到[-1, 1]范围
-        r_norm = n_image[:, :, 2].astype(np.float32) / 127.5 - 1.0
-        g_norm = n_image[:, :, 1].astype(np.float32) / 127.5 - 1.0
-        
-        # 计算B通道
-        b_squared = 1.0 - np.square(r_norm) - np.square(g_norm)
-        b_norm = np.sqrt(np.maximum(b_squared, 0))  # 防止负数开方
-        
-        # 转换回[0, 255]范围
-        n_image[:, :, 0] = ((b_norm + 1.0) * 127.5).astype(np.uint8)  # B通道
-        
-        # 保存N贴图
-        if save_tga_image(n_image, n_file_path):
-            print(f"成功生成N文件: {os.path.basename(n_file_path)}")
-            return True
-        else:
-            print(f"保存N文件失败: {n_file_path}")
-            return False
-            
-    except Exception as e:
-        print(f"创建N贴图时出错:")
-        print(f"  NCE文件: {nce_file_path}")
-        print(f"  错误: {str(e)}")
+    if jobs <= 1 or total <= 1:
+        # 后台写出时，组的输出写完（且没有失败）才算完成
+        waiting = deque()
+
+        def finish_written(writer):
+            while waiting:
+                result = results[waiting[0]]
+                # 行带模式直接写出的文件不经过写出线程池
+                if writer is not None and not all((writer.is_finished(file_path) or not writer.is_submitted(file_path))
+                                                  and file_path not in writer.errors
+                                                  for file_path in result['generated']):
+                    break
+                index = waiting.popleft()
+                on_group_done(groups[index], result)
+
+        with texture_writer.write_behind(write_tga_image, writers) as writer, \
+                texture_log.ProgressLine(total, enabled=show_progress) as progress:
+            for index, group in enumerate(groups):
+                results[index] = process_texture_group(group, spec, group_threads, max_megapixels, use_stats,
+                                                       band_rows)
+                texture_log.log_group(logger, group_record(results[index]))
+                progress.update(index + 1, group['base_key'])
+                waiting.append(index)
+                finish_written(writer)
+        # 后台写出的失败在全部组完成后才能确定，单独以WARNING输出
+        _apply_write_errors(results, writer)
+        finish_written(None)
+        log_source_summary(results)
+        return results
+
+    logger.info(f"使用 {jobs} 个进程并行处理 {total} 个贴图组")
+    log_level = texture_log.console_level()
+    with ProcessPoolExecutor(max_workers=jobs) as executor, \
+            texture_log.ProgressLine(total, enabled=show_progress) as progress:
+        futures = {executor.submit(_process_texture_group_in_worker, group, writers, spec,
+                                   group_threads, max_megapixels, use_stats, band_rows, log_level): index
+                   for index, group in enumerate(groups)}
+        for finished, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                group = groups[index]
+                result = {
+                    'root': group['root'],
+                    'base_key': group['base_key'],
+                    'generated': [],
+                    'failed': [group['base_key']],
+                    'operations': 0,
+                    'log': f"处理贴图组 {group['base_key']} 的子进程异常退出: {str(e)}\n",
+                }
+            texture_log.echo(result.pop('log'))
+            if 'profile' in result:
+                texture_profiler.get_profiler().merge(result.pop('profile'))
+            if 'stats_entries' in result:
+                texture_stats.merge_entries(result.pop('stats_entries'))
+            texture_log.log_group(logger, group_record(result))
+            progress.update(finished, result['base_key'])
+            results[index] = result
+            on_group_done(groups[index], result)
+    log_source_summary(results)
+    return results
+
+
+def texture_group_key(base_directory, group):
+    """
+    贴图组在增量构建清单中的标识：相对基础目录的路径 + 基础名称
+    """
+    relative_root = os.path.relpath(group['root'], base_directory).replace(os.sep, '/')
+    if relative_root == '.':
+        return group['base_key']
+    return f"{relative_root}/{group['base_key']}"
+
+
+def group_matches_filters(group_key, include=None, exclude=None):
+    """
+    按通配符筛选贴图组，模式匹配贴图组标识（相对基础目录的路径 + 基础名称，使用/分隔）
+
+    Args:
+        group_key (str): texture_group_key返回的贴图组标识
+        include (list): 包含模式，为空时包含全部贴图组
+        exclude (list): 排除模式，优先于包含模式
+
+    Returns:
+        bool: 是否处理该贴图组
+    """
+    if include and not any(fnmatch.fnmatchcase(group_key, pattern) for pattern in include):
         return False
+    return not (exclude and any(fnmatch.fnmatchcase(group_key, pattern) for pattern in exclude))
+
+
+def convert_texture_channels(base_directory, jobs=1, force=False, writers=texture_writer.DEFAULT_WRITER_THREADS,
+                             report_path=None, spec=None, group_threads=1, max_megapixels=None, use_stats=False,
+                             band_rows=None):
+    """
+    递归搜索目录中的贴图，根据名称后缀识别贴图通道转换规则，
+    将_MRA贴图的R通道覆盖到_C贴图的A通道，并另存为_DM后缀的新纹理。
+    输入和输出都没有变化的贴图组根据基础目录下的构建清单跳过。
 
+    参数与run_conversion相同
 
-def create_s_and_special_textures(nce_file_path, unique_mask_path, s_file_path, special_mask_file_path):
+    Returns:
+        list: 本次生成的文件路径列表
     """
-    创建_S贴图和SpecialMask贴图：
-    1. 创建_S贴图填纯黑色（但如果_NCE贴图的A通道亮度值不超过0.1则不创建）
-    2. SpecialMask贴图的通道规则：
-       R: _NCE贴图B通道
-       G: _UniqueMask贴图R通道
-       B: _UniqueMask贴图B通道
-       A: _UniqueMask贴图A通道
+    summary = run_conversion(base_directory, jobs, force, writers, report_path, spec, group_threads,
+                             max_megapixels, use_stats, band_rows=band_rows)
+    return summary['generated']
+
+
+def run_conversion(base_directory, jobs=1, force=False, writers=texture_writer.DEFAULT_WRITER_THREADS,
+                   report_path=None, spec=None, group_threads=1, max_megapixels=None, use_stats=False,
+                   include=None, exclude=None, resume=False, band_rows=None):
+    """
+    处理一个基础目录中的全部贴图组，返回运行汇总
+    每完成一个组就把它的清单记录追加到构建日志，运行中断后可以用resume跳过日志中已完成的组
 
     Args:
-        nce_file_path (str): _NCE贴图文件路径
-        unique_mask_path (str): _UniqueMask贴图文件路径
-        s_file_path (str): 输出_S贴图文件路径
-        special_mask_file_path (str): 输出_SpecialMask贴图文件路径
+        base_directory (str): 要搜索的基础目录路径
+        jobs (int): 并行处理贴图组的进程数，1表示串行
+        force (bool): 忽略构建清单，重新生成所有贴图组
+        writers (int): 后台写出线程数，0表示同步写出
+        report_path (str): 性能报告输出路径（.json或.csv），None表示不输出
+        spec (texture_rules.PackingSpec): 通道打包规则，None表示使用默认规则
+        group_threads (int): 组内并行生成输出的线程数
+        max_megapixels (float): 组内同时占用的像素数上限（百万像素），None表示不限制
+        use_stats (bool): 是否使用并更新贴图目录中的统计索引（.texture_stats.json）
+        include (list): 只处理标识匹配其中任一通配符的贴图组，None表示全部
+        exclude (list): 跳过标识匹配其中任一通配符的贴图组
+        resume (bool): 恢复中断的运行：构建日志中已完成、且输入和输出都未变化的组直接跳过（即使force为True）
+        band_rows (int): 按行带流式生成并直接写出输出贴图，每个行带的行数；None表示整幅生成。
+            超大贴图使用行带模式时，每个输出只占用一个行带的内存
         
     Returns:
-        bool: 是否成功创建
+        dict: {'root', 'exists', 'generated': 生成的文件列表, 'failed': 失败的输出列表,
+               'regenerated_groups', 'skipped_groups': 未变化跳过的组数, 'filtered_groups': 被筛选掉的组数,
+               'operations'}
     """
-    try:
-        print(f"\n创建S贴图和SpecialMask贴图:")
-        print(f"  NCE文件: {os.path.basename(nce_file_path)}")
-        if unique_mask_path:
-            print(f"  UniqueMask文件: {os.path.basename(unique_mask_path)}")
-        else:
-            print("  未找到对应的UniqueMask文件")
+    generated_files = []
+    summary = {
+        'root': base_directory,
+        'exists': True,
+        'generated': generated_files,
+        'failed': [],
+        'regenerated_groups': 0,
+        'skipped_groups': 0,
+        'filtered_groups': 0,
+        'operations': 0,
+    }
+    profiler = texture_profiler.get_profiler()
+    profiler.reset()
+    
+    # 检查基础目录是否存在
+    if not os.path.exists(base_directory):
+        logger.error(f"错误: 目录不存在: {base_directory}")
+        summary['exists'] = False
+        return summary
         
-        # 读取_NCE贴图
-        nce_image = load_tga_image(nce_file_path)
-        if nce_image is None:
-            print(f"无法读取NCE文件: {nce_file_path}")
-            return False
+    spec = spec or get_default_spec()
+    groups = collect_texture_groups(base_directory, spec)
+    if include or exclude:
+        selected = [group for group in groups
+                    if group_matches_filters(texture_group_key(base_directory, group), include, exclude)]
+        summary['filtered_groups'] = len(groups) - len(selected)
+        logger.info(f"按通配符筛选: 保留 {len(selected)} 个贴图组, 跳过 {summary['filtered_groups']} 个")
+        groups = selected
 
-        height, width = nce_image.shape[:2]
-        
-        # 检查_NCE贴图的A通道是否超过0.1的亮度值
-        nce_has_non_black_alpha = False
-        if len(nce_image.shape) == 3 and nce_image.shape[2] == 4:
-            # 检查alpha通道最大值是否超过0.1 (在0-1区间)
-            max_alpha_value = np.max(nce_image[:, :, 3]) / 255.0
-            if max_alpha_value > 0.1:
-                nce_has_non_black_alpha = True
-                print(f"NCE贴图的A通道最大亮度值为 {max_alpha_value:.3f}，超过阈值0.1")
-            else:
-                print(f"NCE贴图的A通道最大亮度值为 {max_alpha_value:.3f}，未超过阈值0.1，视为纯黑色")
-        else:
-            # 没有alpha通道，视为纯黑色
-            print("NCE贴图没有alpha通道，视为纯黑色")
-        
-        # 1. 创建_S贴图填纯黑色（除非NCE的A通道亮度值超过0.1）
-        if nce_has_non_black_alpha:
-            s_image = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            # 将_NCE后缀的A通道放到_S的B通道(索引0)
-            if len(nce_image.shape) == 3 and nce_image.shape[2] == 4:
-                s_image[:, :, 0] = nce_image[:, :, 3]  # A->B
-            else:
-                # 如果NCE图像没有alpha通道，默认为0
-                s_image[:, :, 0] = np.zeros((height, width), dtype=np.uint8)
-                
-            # 保存S贴图
-            if save_tga_image(s_image, s_file_path):
-                print(f"成功生成S文件: {os.path.basename(s_file_path)}")
-            else:
-                print(f"保存S文件失败: {s_file_path}")
-                return False
-        else:
-            print("由于NCE贴图的A通道亮度值未超过0.1，跳过S贴图创建")
-        
-        # 2. 创建SpecialMask贴图
-        # 读取_UniqueMask贴图
-        unique_mask_image = None
-        if unique_mask_path and os.path.exists(unique_mask_path):
-            unique_mask_image = load_tga_image(unique_mask_path)
-            if unique_mask_image is None:
-                print(f"无法读取UniqueMask文件: {unique_mask_path}")
-            else:
-                print(f"成功读取UniqueMask文件: {os.path.basename(unique_mask_path)}, 尺寸: {unique_mask_image.shape}")
-                # 检查尺寸是否匹配
-                if unique_mask_image.shape[:2] != (height, width):
-                    print(f"警告: UniqueMask图像尺寸 {unique_mask_image.shape[:2]} 与NCE图像尺寸 {(height, width)} 不匹配")
-        else:
-            if unique_mask_path:
-                print(f"UniqueMask文件不存在: {unique_mask_path}")
-            else:
-                print("没有提供UniqueMask文件路径")
-        
-        # 创建SpecialMask贴图 (BGRA格式)
-        special_mask_image = np.zeros((height, width, 4), dtype=np.uint8)
-        
-        # R: _NCE贴图B通道(索引0)
-        if len(nce_image.shape) == 3:
-            special_mask_image[:, :, 2] = nce_image[:, :, 0]  # B->R
-            print("已设置SpecialMask的R通道（来自NCE的B通道）")
-        elif len(nce_image.shape) == 2:
-            special_mask_image[:, :, 2] = nce_image  # 灰度->R
-            print("已设置SpecialMask的R通道（来自NCE的灰度通道）")
-            
-        # G: _UniqueMask贴图R通道(索引2)，如果没有则为0
-        if unique_mask_image is not None:
-            if len(unique_mask_image.shape) == 3 and unique_mask_image.shape[2] >= 3:
-                special_mask_image[:, :, 1] = unique_mask_image[:, :, 2]  # R->G
-                print("已设置SpecialMask的G通道（来自UniqueMask的R通道）")
-            elif len(unique_mask_image.shape) == 2:
-                # 灰度图像，复制到G通道
-                special_mask_image[:, :, 1] = unique_mask_image
-                print("已设置SpecialMask的G通道（来自UniqueMask的灰度通道）")
-            else:
-                special_mask_image[:, :, 1] = np.zeros((height, width), dtype=np.uint8)
-                print("已设置SpecialMask的G通道（默认为0）")
-        else:
-            special_mask_image[:, :, 1] = np.zeros((height, width), dtype=np.uint8)
-            print("已设置SpecialMask的G通道（默认为0，因为没有UniqueMask）")
-            
-        # B: _UniqueMask贴图B通道(索引0)，如果没有则为0
-        if unique_mask_image is not None:
-            if len(unique_mask_image.shape) == 3 and unique_mask_image.shape[2] >= 3:
-                special_mask_image[:, :, 0] = unique_mask_image[:, :, 0]  # B->B
-                print("已设置SpecialMask的B通道（来自UniqueMask的B通道）")
-            elif len(unique_mask_image.shape) == 2:
-                # 灰度图像，复制到B通道
-                special_mask_image[:, :, 0] = unique_mask_image
-                print("已设置SpecialMask的B通道（来自UniqueMask的灰度通道）")
-            else:
-                special_mask_image[:, :, 0] = np.zeros((height, width), dtype=np.uint8)
-                print("已设置SpecialMask的B通道（默认为0）")
+    # 根据构建清单筛选需要重新生成的组，恢复模式先合并上次中断运行的构建日志
+    version = f"{CONVERTER_VERSION}:{spec.digest}"
+    manifest = texture_manifest.BuildManifest(base_directory, version).load()
+    journal = texture_manifest.BuildJournal(base_directory, version)
+    journaled = {}
+    if resume:
+        journaled = journal.replay()
+        manifest.merge(journaled)
+        logger.info(f"恢复中断的运行: 构建日志中有 {len(journaled)} 个已完成的贴图组")
+    elif os.path.exists(journal.path):
+        logger.warning(f"发现上次中断运行的构建日志: {journal.path}，本次从头开始；使用--resume可以跳过其中已完成的贴图组")
+
+    pending_groups = []
+    skipped_count = 0
+    for group in groups:
+        group_key = texture_group_key(base_directory, group)
+        if force and group_key not in journaled:
+            reason = "强制重新生成"
         else:
-            special_mask_image[:, :, 0] = np.zeros((height, width), dtype=np.uint8)
-            print("已设置SpecialMask的B通道（默认为0，因为没有UniqueMask）")
-            
-        # A: _UniqueMask贴图A通道(索引3)，如果没有则为255
-        if unique_mask_image is not None:
-            if len(unique_mask_image.shape) == 3 and unique_mask_image.shape[2] == 4:
-                special_mask_image[:, :, 3] = unique_mask_image[:, :, 3]  # A->A
-                print("已设置SpecialMask的A通道（来自UniqueMask的A通道）")
-            elif len(unique_mask_image.shape) == 3 and unique_mask_image.shape[2] == 3:
-                # 3通道图像，使用平均值作为A通道基础
-                special_mask_image[:, :, 3] = np.mean(unique_mask_image, axis=2, dtype=np.uint8)
-                print("已设置SpecialMask的A通道（来自UniqueMask的平均值）")
-            elif len(unique_mask_image.shape) == 2:
-                # 灰度图像，直接用作A通道
-                special_mask_image[:, :, 3] = unique_mask_image
-                print("已设置SpecialMask的A通道（来自UniqueMask的灰度通道）")
-            else:
-                special_mask_image[:, :, 3] = np.full((height, width), 255, dtype=np.uint8)
-                print("已设置SpecialMask的A通道（默认为255）")
+            reason = manifest.check(group_key, list(group['files'].values()))
+        if reason is None:
+            skipped_count += 1
         else:
-            special_mask_image[:, :, 3] = np.full((height, width), 255, dtype=np.uint8)
-            print("已设置SpecialMask的A通道（默认为255，因为没有UniqueMask）")
-        
-        # 保存SpecialMask贴图
-        if save_tga_image(special_mask_image, special_mask_file_path):
-            print(f"成功生成SpecialMask文件: {os.path.basename(special_mask_file_path)}")
-            return True
+            logger.debug(f"需要重新生成 {group_key}: {reason}")
+            pending_groups.append(group)
+    logger.info(f"增量构建: {skipped_count} 个贴图组未变化已跳过, {len(pending_groups)} 个贴图组需要重新生成")
+
+    # 只记录完全成功的组，失败的组下次运行会重新生成
+    def record_group(group, result):
+        group_key = texture_group_key(base_directory, group)
+        if result['failed']:
+            manifest.forget(group_key)
         else:
-            print(f"保存SpecialMask文件失败: {special_mask_file_path}")
-            return False
-            
-    except Exception as e:
-        print(f"创建S贴图和SpecialMask贴图时出错:")
-        print(f"  NCE文件: {nce_file_path}")
-        print(f"  错误: {str(e)}")
-        return False
+            manifest.record(group_key, list(group['files'].values()), result['generated'])
+            if journal_open:
+                journal.append(group_key, manifest.groups[group_key])
+
+    try:
+        journal.open(keep_existing=resume)
+        journal_open = True
+    except OSError as e:
+        logger.warning(f"无法写入构建日志，本次运行中断后不能恢复: {journal.path}, 错误: {str(e)}")
+        journal_open = False
+
+    try:
+        results = run_texture_groups(pending_groups, jobs, writers, spec, group_threads, max_megapixels, use_stats,
+                                     record_group, band_rows)
+    finally:
+        if journal_open:
+            journal.close()
+    if use_stats:
+        texture_stats.save_all()
+    try:
+        manifest.save()
+        # 清单保存成功后构建日志不再需要；否则保留，供--resume使用
+        if journal_open:
+            journal.close(remove=True)
+    except OSError as e:
+        logger.warning(f"保存构建清单失败: {manifest.path}, 错误: {str(e)}")
+
+    # 按扫描顺序汇总结果，保证并行与串行的输出列表一致
+    processed_count = 0
+    failed_outputs = []
+    for result in results:
+        generated_files.extend(result['generated'])
+        processed_count += result['operations']
+        failed_outputs.extend(result['failed'])
+
+    if pending_groups:
+        logger.info(f"总体进度: 完成 {len(pending_groups)} 个贴图组的处理，共 {processed_count} 个操作")
+    logger.info(f"重新生成 {len(pending_groups)} 个贴图组，跳过 {skipped_count} 个未变化的贴图组")
+    if failed_outputs:
+        logger.warning(f"失败的输出 ({len(failed_outputs)}):")
+        for name in failed_outputs:
+            logger.warning(f"  {name}")
+
+    if report_path:
+        try:
+            profiler.write_report(report_path)
+            logger.info(f"性能报告已保存: {report_path}")
+        except OSError as e:
+            logger.warning(f"保存性能报告失败: {report_path}, 错误: {str(e)}")
+
+    summary['failed'] = failed_outputs
+    summary['regenerated_groups'] = len(pending_groups)
+    summary['skipped_groups'] = skipped_count
+    summary['operations'] = processed_count
+    return summary
+
+
+def run_headless(directories, jobs=1, force=False, writers=texture_writer.DEFAULT_WRITER_THREADS,
+                 report_path=None, spec=None, group_threads=1, max_megapixels=None, use_stats=False,
+                 include=None, exclude=None, resume=False, band_rows=None):
+    """
+    无界面批处理：依次处理多个基础目录，返回汇总和退出码
+
+    Args:
+        directories (list): 基础目录列表
+        report_path (str): 性能报告路径，多个目录时在扩展名前加上目录序号
+        其余参数与run_conversion相同
+
+    Returns:
+        dict: {'roots': 每个目录的汇总, 'generated_count', 'failed_count', 'exit_code'}
+              exit_code为0表示全部成功，1表示有输出失败，2表示有目录不存在
+    """
+    roots = []
+    for index, directory in enumerate(directories):
+        root_report = report_path
+        if report_path and len(directories) > 1:
+            name, ext = os.path.splitext(report_path)
+            root_report = f"{name}.{index + 1}{ext}"
+        logger.info(f"开始处理目录: {directory}")
+        summary = run_conversion(directory, jobs, force, writers, root_report, spec, group_threads,
+                                 max_megapixels, use_stats, include, exclude, resume, band_rows)
+        roots.append(summary)
+
+    if any(not summary['exists'] for summary in roots):
+        exit_code = 2
+    elif any(summary['failed'] for summary in roots):
+        exit_code = 1
+    else:
+        exit_code = 0
+    return {
+        'roots': roots,
+        'generated_count': sum(len(summary['generated']) for summary in roots),
+        'failed_count': sum(len(summary['failed']) for summary in roots),
+        'exit_code': exit_code,
+    }
 
 
 def save_tga_image(image, file_path):
     """
-    使用PIL保存TGA图像（遵循TGA格式处理最佳实践）
+    保存TGA图像；启用了后台写出时只排队并立即返回，写出结果在写出线程池中汇总
+
+    Args:
+        image (numpy.ndarray): 要保存的图像数据，提交后不能再修改
+        file_path (str): 输出文件路径
+        
+    Returns:
+        bool: 是否成功保存（或成功排队）
+    """
+    return texture_writer.submit_or_write(image, file_path, write_tga_image)
+
+
+@texture_profiler.profiled('save', _measure_written)
+def write_tga_image(image, file_path):
+    """
+    同步保存TGA图像（遵循TGA格式处理最佳实践）
+    优先直接编码BGR(A)数组，失败时回退到PIL和OpenCV
 
     Args:
         image (numpy.ndarray): 要保存的图像数据
@@ -640,6 +754,14 @@ def save_tga_image(image, file_path):
     Returns:
         bool: 是否成功保存
     """
+    if file_path.lower().endswith('.tga'):
+        try:
+            tga_codec.write_tga(file_path, image)
+            logger.debug(f"直接编码成功保存TGA文件: {file_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"直接编码TGA失败: {file_path}, 错误: {str(e)}")
+
     try:
         # 将OpenCV的BGR格式转换为PIL的RGB格式
         if len(image.shape) == 3 and image.shape[2] >= 3:
@@ -653,26 +775,26 @@ def save_tga_image(image, file_path):
             
             # 保存为TGA格式
             pil_image.save(file_path, format='TGA')
-            print(f"使用PIL成功保存TGA文件: {file_path}")
+            logger.debug(f"使用PIL成功保存TGA文件: {file_path}")
             return True
         elif len(image.shape) == 2:
             # 灰度图像
             pil_image = Image.fromarray(image)
             pil_image.save(file_path, format='TGA')
-            print(f"使用PIL成功保存灰度TGA文件: {file_path}")
+            logger.debug(f"使用PIL成功保存灰度TGA文件: {file_path}")
             return True
         else:
-            print(f"不支持的图像格式用于保存: {image.shape}")
+            logger.warning(f"不支持的图像格式用于保存: {image.shape}")
             return False
     except Exception as e:
-        print(f"使用PIL保存图像失败: {file_path}, 错误: {str(e)}")
+        logger.warning(f"使用PIL保存图像失败: {file_path}, 错误: {str(e)}")
         # 回退到OpenCV保存方法
         try:
             cv2.imwrite(file_path, image)
-            print(f"使用OpenCV成功保存图像: {file_path}")
+            logger.debug(f"使用OpenCV成功保存图像: {file_path}")
             return True
         except Exception as e2:
-            print(f"使用OpenCV保存图像也失败了: {file_path}, 错误: {str(e2)}")
+            logger.warning(f"使用OpenCV保存图像也失败了: {file_path}, 错误: {str(e2)}")
             return False
 
 
@@ -683,6 +805,9 @@ def select_directory():
     Returns:
         str: 用户选择的目录路径，如果取消选择则返回None
     """
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
     root.attributes('-topmost', True)  # 确保对话框在最前面
@@ -698,18 +823,22 @@ def select_directory():
 
 def show_completion_message(generated_files):
     """
-    显示处理完成消息和生成的文件列表
+    显示处理完成消息和生成的文件列表（最多列出COMPLETION_LIST_LIMIT个文件）
     
     Args:
         generated_files (list): 生成的文件路径列表
     """
+    import tkinter as tk
+    from tkinter import messagebox
+
     if not generated_files:
         messagebox.showinfo("处理完成", "处理已完成，但没有生成新文件。")
         return
     
     message = f"处理已完成！共生成 {len(generated_files)} 个文件：\n\n"
-    for file_path in generated_files:
-        message += f"{os.path.basename(file_path)}\n"
+    message += "".join(f"{os.path.basename(file_path)}\n" for file_path in generated_files[:COMPLETION_LIST_LIMIT])
+    if len(generated_files) > COMPLETION_LIST_LIMIT:
+        message += f"……以及其他 {len(generated_files) - COMPLETION_LIST_LIMIT} 个文件\n"
     
     message += f"\n文件保存在各自原始文件所在的目录中。"
     
@@ -720,17 +849,191 @@ def show_completion_message(generated_files):
     root.destroy()
 
 
+def watch_texture_channels(directories, writers=texture_writer.DEFAULT_WRITER_THREADS, spec=None, group_threads=1,
+                           max_megapixels=None, use_stats=False, include=None, exclude=None,
+                           interval=texture_watch.DEFAULT_POLL_INTERVAL, debounce=texture_watch.DEFAULT_DEBOUNCE_SECONDS,
+                           band_rows=None):
+    """
+    监视模式：先增量处理一遍，然后监视源贴图的变化，只重新生成受影响的贴图组，按Ctrl+C退出
+
+    Args:
+        directories (list): 基础目录列表
+        interval (float): 轮询间隔（秒）
+        debounce (float): 最后一次变化后等待的时间（秒），连续保存合并为一次处理
+        其余参数与run_conversion相同
+    """
+    spec = spec or get_default_spec()
+    version = f"{CONVERTER_VERSION}:{spec.digest}"
+    base_directories = [os.path.abspath(directory) for directory in directories]
+    for base_directory in base_directories:
+        run_conversion(base_directory, 1, writers=writers, spec=spec, group_threads=group_threads,
+                       max_megapixels=max_megapixels, use_stats=use_stats, include=include, exclude=exclude,
+                       band_rows=band_rows)
+
+    def base_directory_of(root):
+        """包含该目录的最内层基础目录，不在任何基础目录下时返回None"""
+        root = os.path.normcase(os.path.abspath(root))
+        containing = [base for base in base_directories
+                      if root == os.path.normcase(base)
+                      or root.startswith(os.path.normcase(base).rstrip(os.sep) + os.sep)]
+        return max(containing, key=len, default=None)
+
+    def on_change(changed_paths):
+        start = time.perf_counter()
+        groups_by_base = {}
+        for root, base_key in sorted({group_of_source_file(path, spec) for path in changed_paths} - {None}):
+            base_directory = base_directory_of(root)
+            if base_directory is None:
+                logger.debug(f"{base_key}: 所在目录不在监视的基础目录中，已忽略: {root}")
+                continue
+            group = collect_texture_group(root, base_key, spec)
+            if group is None:
+                logger.info(f"{base_key}: 源贴图不足，没有可生成的输出")
+            elif group_matches_filters(texture_group_key(base_directory, group), include, exclude):
+                groups_by_base.setdefault(base_directory, []).append(group)
+
+        regenerated = 0
+        for base_directory, groups in groups_by_base.items():
+            manifest = texture_manifest.BuildManifest(base_directory, version).load()
+            pending_groups = []
+            for group in groups:
+                # 只有修改时间变化而内容不变（例如版本库更新）时清单检查会通过，不需要重新生成
+                reason = manifest.check(texture_group_key(base_directory, group), list(group['files'].values()))
+                if reason is not None:
+                    logger.info(f"检测到变化 {texture_group_key(base_directory, group)}: {reason}")
+                    pending_groups.append(group)
+
+            def record_group(group, result):
+                group_key = texture_group_key(base_directory, group)
+                if result['failed']:
+                    manifest.forget(group_key)
+                else:
+                    manifest.record(group_key, list(group['files'].values()), result['generated'])
+
+            if not pending_groups:
+                continue
+            run_texture_groups(pending_groups, 1, writers, spec, group_threads, max_megapixels, use_stats,
+                               record_group, band_rows)
+            regenerated += len(pending_groups)
+            try:
+                manifest.save()
+            except OSError as e:
+                logger.warning(f"保存构建清单失败: {manifest.path}, 错误: {str(e)}")
+        if use_stats:
+            texture_stats.save_all()
+        if regenerated:
+            logger.info(f"重新生成 {regenerated} 个贴图组，耗时 {time.perf_counter() - start:.2f}秒")
+
+    logger.info(f"正在监视 {len(base_directories)} 个目录中的源贴图变化，按Ctrl+C退出")
+    texture_watch.watch(base_directories, lambda path: group_of_source_file(path, spec) is not None, on_change,
+                        interval, debounce)
+    logger.info("已停止监视")
+
+
+def main_headless(args):
+    """
+    无界面批处理入口：日志输出到stderr，stdout只输出JSON汇总
+
+    Args:
+        args (argparse.Namespace): 命令行参数
+
+    Returns:
+        int: 退出码
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            spec = texture_rules.load_rule_spec(args.rules) if args.rules else get_default_spec()
+        except (OSError, texture_rules.RuleSpecError) as e:
+            print(f"读取通道打包规则失败: {str(e)}")
+            summary = {'error': f"读取通道打包规则失败: {str(e)}", 'exit_code': 2}
+        else:
+            jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+            summary = run_headless(args.directory, jobs, force=args.force, writers=args.writers,
+                                   report_path=args.report, spec=spec, group_threads=args.group_threads,
+                                   max_megapixels=args.max_megapixels, use_stats=args.stats,
+                                   include=args.include, exclude=args.exclude, resume=args.resume,
+                                   band_rows=args.band_rows)
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return summary['exit_code']
+
+
 def main():
     """
     主函数
     """
+    parser = argparse.ArgumentParser(description='贴图通道转换工具')
+    parser.add_argument('directory', nargs='*',
+                        help='要处理的目录，--headless时可以指定多个（不提供时弹窗选择）')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='并行处理贴图组的进程数，0表示使用全部CPU核心（默认1，串行）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略增量构建清单，重新生成所有贴图')
+    parser.add_argument('--writers', type=int, default=texture_writer.DEFAULT_WRITER_THREADS,
+                        help=f'后台写出线程数，0表示同步写出（默认{texture_writer.DEFAULT_WRITER_THREADS}）')
+    parser.add_argument('--rules', metavar='SPEC',
+                        help=f'通道打包规则文件路径或packing_rules目录中的规则名称（默认{DEFAULT_RULES}）')
+    parser.add_argument('--group-threads', type=int, default=1,
+                        help='组内并行生成输出贴图的线程数（默认1）')
+    parser.add_argument('--max-megapixels', type=float,
+                        help='组内同时占用的源贴图和输出缓冲区像素数上限（百万像素），用于控制8K贴图组的峰值内存')
+    parser.add_argument('--band-rows', type=int, metavar='N',
+                        help='按行带流式生成输出贴图，每次只处理N行并直接写出，峰值内存与行带高度成正比（用于16K等超大贴图）')
+    parser.add_argument('--report', metavar='PATH',
+                        help='输出性能报告（各阶段耗时、吞吐量、最慢的贴图组、峰值内存），扩展名为.csv时输出CSV，否则输出JSON')
+    parser.add_argument('--stats', action='store_true',
+                        help='使用并更新贴图目录中的通道统计索引（.texture_stats.json），_S的生成条件和常量通道直接查询索引；'
+                             '默认不使用，也不在源贴图目录中写入索引文件')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='只处理标识（相对目录的路径/基础名称）匹配该通配符的贴图组，可以重复指定')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='跳过标识匹配该通配符的贴图组，可以重复指定，优先于--include')
+    parser.add_argument('--resume', action='store_true',
+                        help='恢复中断的运行：跳过构建日志中已完成、且输入和输出都未变化的贴图组')
+    parser.add_argument('--watch', action='store_true',
+                        help='处理完成后继续监视源贴图，只重新生成发生变化的贴图组，按Ctrl+C退出')
+    parser.add_argument('--poll-interval', type=float, default=texture_watch.DEFAULT_POLL_INTERVAL,
+                        help=f'监视模式的轮询间隔（秒，默认{texture_watch.DEFAULT_POLL_INTERVAL}）')
+    parser.add_argument('--debounce', type=float, default=texture_watch.DEFAULT_DEBOUNCE_SECONDS,
+                        help=f'监视模式中最后一次保存后等待的时间（秒，默认{texture_watch.DEFAULT_DEBOUNCE_SECONDS}）')
+    parser.add_argument('--headless', action='store_true',
+                        help='无界面批处理：不弹窗，日志输出到stderr，stdout输出JSON汇总，有失败时退出码非0')
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('-v', '--verbose', action='store_true',
+                           help='输出每张贴图的读取、保存和每个输出的详细日志')
+    verbosity.add_argument('-q', '--quiet', action='store_true',
+                           help='只输出警告和错误，不显示进度')
+    parser.add_argument('--log-json', metavar='PATH',
+                        help='把每个贴图组的结构化记录追加写入JSON Lines文件')
+    args = parser.parse_args()
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    texture_log.configure(log_level, args.log_json)
+
+    if args.band_rows is not None and args.band_rows <= 0:
+        parser.error('--band-rows必须大于0')
+    if args.headless:
+        if args.watch:
+            parser.error('--watch不能与--headless同时使用')
+        if not args.directory:
+            parser.error('--headless需要至少指定一个目录')
+        sys.exit(main_headless(args))
+    if len(args.directory) > 1 and not args.watch:
+        parser.error('指定多个目录时需要使用--headless或--watch')
+
     print("=" * 50)
     print("贴图通道转换工具")
     print("=" * 50)
+
+    try:
+        spec = texture_rules.load_rule_spec(args.rules) if args.rules else get_default_spec()
+    except (OSError, texture_rules.RuleSpecError) as e:
+        print(f"读取通道打包规则失败: {str(e)}")
+        return
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
     
     # 检查是否通过命令行参数提供了目录
-    if len(sys.argv) > 1:
-        base_directory = sys.argv[1]
+    if args.directory:
+        base_directory = args.directory[0]
     else:
         # 弹窗让用户选择目录
         base_directory = select_directory()
@@ -738,10 +1041,26 @@ def main():
             print("未选择目录，程序退出。")
             return
     
+    if args.watch:
+        missing = [directory for directory in args.directory or [base_directory] if not os.path.isdir(directory)]
+        if missing:
+            print(f"目录不存在: {', '.join(missing)}")
+            return
+        watch_texture_channels(args.directory or [base_directory], writers=args.writers, spec=spec,
+                               group_threads=args.group_threads, max_megapixels=args.max_megapixels,
+                               use_stats=args.stats, include=args.include, exclude=args.exclude,
+                               interval=args.poll_interval, debounce=args.debounce, band_rows=args.band_rows)
+        return
+
     # 如果目录存在则执行转换
     if os.path.exists(base_directory):
         print(f"开始处理目录: {base_directory}")
-        generated_files = convert_texture_channels(base_directory)
+        summary = run_conversion(base_directory, jobs, force=args.force, writers=args.writers,
+                                 report_path=args.report, spec=spec, group_threads=args.group_threads,
+                                 max_megapixels=args.max_megapixels, use_stats=args.stats,
+                                 include=args.include, exclude=args.exclude, resume=args.resume,
+                                 band_rows=args.band_rows)
+        generated_files = summary['generated']
         print("\n" + "=" * 50)
         print("处理完成!")
         print(f"总共生成 {len(generated_files)} 个文件")
@@ -750,6 +1069,9 @@ def main():
         # 显示完成消息
         show_completion_message(generated_files)
     else:
+        import tkinter as tk
+        from tkinter import messagebox
+
         root = tk.Tk()
         root.withdraw()
         root.attributes('-topmost', True)
@@ -759,4 +1081,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()